@@ -4,7 +4,6 @@ Basic demo for the glucostats library
 Loads the example dataset, computes some metrics, and shows a simple plot.
 """
 
-import pandas as pd
 from glucostats.datasets import load_glucodata
 from glucostats.extract_statistics import ExtractGlucoStats
 from glucostats.visualization.signal_visualization import plot_glucose_time_series
@@ -13,13 +12,8 @@ from glucostats.visualization.heatmaps import plot_intrapatient_heatmap
 
 def main():
     # Load glucose data
-    df_data = load_glucodata()
+    df_data = load_glucodata(as_signals=True)
     print("Loaded data")
-
-    # Change datetime format and set index for multiple signals
-    df_data.index = df_data['id']
-    df_data = df_data[['time', 'glucose']]
-    df_data["time"] = pd.to_datetime(df_data["time"], errors="coerce")
     print(df_data.head())
 
     # Plot glucose signals with ids: '2_2015-05-23', '3_2015-05-23', '5_2015-05-23', '8_2015-05-23'
@@ -1,4 +1,13 @@
+from glucostats.arrays import compute
+
 __all__ = [
-    'extract_statistics'
+    'arrays',
+    'compute',
+    'extract_statistics',
+    'grid',
+    'incremental',
+    'ingestion',
+    'live',
+    'results',
+    'store'
 ]
-
@@ -0,0 +1,3 @@
+from glucostats.main import main
+
+main()
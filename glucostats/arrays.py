@@ -0,0 +1,313 @@
+import numpy as np
+from functools import cached_property
+from scipy.signal import find_peaks
+
+import glucostats.utils.constants as constants
+from glucostats.utils.format_verification import list_statistics_verification, in_range_verification
+from glucostats.stats.time_stats import ranges_labels
+from glucostats.stats.risks_stats import bg_risks, gri_labels, gri_index, grade_values
+from glucostats.stats.control_stats import control_values, m_values, a1c_from_mean
+from glucostats.stats.agp_stats import agp_percentiles, agp_columns, agp_profiles, agp_bin_verification
+from glucostats.stats.episodes_stats import episodes_statistics, episodes_params_verification
+
+default_configuration = {
+    'in_range_interval': [70, 180],
+    'time_units': 'm',
+    'ddof': 1,
+    'quartiles': [0.25, 0.5, 0.75],
+    'threshold': 0,
+    'where': 'above',
+    'a': 1.1,
+    'b': 2.0,
+    'c': 30,
+    'd': 30,
+    'ideal_bg': 120,
+    'agp_bin': 60,
+    'episode_min_duration': 15,
+    'episode_end_duration': 15
+}
+
+
+class _Signal:
+    """
+    Intermediate values of a single signal shared by the statistics of several subgroups. Each value is computed the
+    first time it is needed.
+    """
+    def __init__(self, times: np.ndarray, glucose: np.ndarray, config: dict):
+        self.times = times
+        self.glucose = glucose
+        self.config = config
+
+    @cached_property
+    def time_diff(self):
+        return np.diff(self.times)
+
+    @cached_property
+    def glucose_diff(self):
+        return np.abs(np.diff(self.glucose))
+
+    @cached_property
+    def labels(self):
+        return ranges_labels(self.glucose, self.config['in_range_interval'])
+
+    @cached_property
+    def time_in_ranges(self):
+        # The time of each sample is the time elapsed since the previous one, so the first sample does not count
+        return np.bincount(self.labels[1:], weights=self.time_diff, minlength=3)
+
+    @cached_property
+    def observations_in_ranges(self):
+        return np.bincount(self.labels, minlength=3)
+
+    @cached_property
+    def mean(self):
+        return self.glucose.mean()
+
+    @cached_property
+    def std(self):
+        return self.glucose.std(ddof=1)
+
+    @cached_property
+    def max_diff(self):
+        return self.glucose.max() - self.glucose.min()
+
+
+def _time_in_ranges(signal: _Signal) -> dict:
+    time_units = {'h': 3600, 'm': 60, 's': 1}[signal.config['time_units']]
+    t_br, t_ir, t_ar = signal.time_in_ranges / time_units
+    return {'t_ir': t_ir, 't_ar': t_ar, 't_br': t_br, 't_or': t_ar + t_br}
+
+
+def _percentage_time_in_ranges(signal: _Signal) -> dict:
+    pt_br, pt_ir, pt_ar = signal.time_in_ranges / signal.time_in_ranges.sum() * 100
+    return {'pt_ir': pt_ir, 'pt_ar': pt_ar, 'pt_br': pt_br, 'pt_or': pt_ar + pt_br}
+
+
+def _observations_in_ranges(signal: _Signal) -> dict:
+    n_br, n_ir, n_ar = signal.observations_in_ranges
+    return {'n_ir': n_ir, 'n_ar': n_ar, 'n_br': n_br, 'n_or': n_ar + n_br}
+
+
+def _percentage_observations_in_ranges(signal: _Signal) -> dict:
+    pn_br, pn_ir, pn_ar = signal.observations_in_ranges / len(signal.glucose) * 100
+    return {'pn_ir': pn_ir, 'pn_ar': pn_ar, 'pn_br': pn_br, 'pn_or': pn_ar + pn_br}
+
+
+def _mean_in_ranges(signal: _Signal) -> dict:
+    sums = np.bincount(signal.labels, weights=signal.glucose, minlength=3)
+    counts = signal.observations_in_ranges
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_br, mean_ir, mean_ar = sums / counts
+        mean_or = (sums[0] + sums[2]) / (counts[0] + counts[2])
+    return {'mean_ir': mean_ir, 'mean_ar': mean_ar, 'mean_br': mean_br, 'mean_or': mean_or}
+
+
+def _distribution(signal: _Signal) -> dict:
+    qs = list(dict.fromkeys(signal.config['quartiles'] + [0.25, 0.75]))
+    quartiles = dict(zip(qs, np.quantile(signal.glucose, qs)))
+    stats = {'max': signal.glucose.max(), 'min': signal.glucose.min(), 'max_diff': signal.max_diff,
+             'mean': signal.mean, 'std': signal.glucose.std(ddof=signal.config['ddof'])}
+    stats.update({f'quartile_{q}': quartile for q, quartile in quartiles.items()})
+    stats['iqr'] = quartiles[0.75] - quartiles[0.25]
+    return stats
+
+
+def _complexity(signal: _Signal) -> dict:
+    import neurokit2 as nk
+    from neurokit2.complexity import fractal_dfa
+    try:
+        dfa = fractal_dfa(signal.glucose, scale='default', overlap=True, integrate=True, order=1, show=False)[0]
+    except Exception:
+        dfa = np.nan
+    try:
+        entropy = nk.entropy_sample(signal.glucose, delay=1, dimension=2, tolerance='sd')[0]
+    except Exception:
+        entropy = np.nan
+    return {'entropy': entropy, 'dfa': dfa}
+
+
+def _auc(signal: _Signal) -> dict:
+    threshold = signal.config['threshold']
+    if signal.config['where'] == 'above':
+        auc_glucose = np.maximum(signal.glucose, threshold) - threshold
+    else:
+        auc_glucose = threshold - np.minimum(signal.glucose, threshold)
+    return {'auc': np.sum(signal.time_diff / 3600 * (auc_glucose[1:] + auc_glucose[:-1]) / 2)}
+
+
+def _g_indexes(signal: _Signal) -> dict:
+    risk_l, risk_h = bg_risks(signal.glucose)
+    lbgi, hbgi = risk_l.mean(), risk_h.mean()
+    return {'lbgi': lbgi, 'max_lbgi': risk_l.max(), 'hbgi': hbgi, 'max_hbgi': risk_h.max(), 'bgri': lbgi + hbgi}
+
+
+def _g_risks(signal: _Signal) -> dict:
+    time_in_gri_ranges = np.bincount(gri_labels(signal.glucose[1:]), weights=signal.time_diff, minlength=5)
+    vlow, low, _, high, vhigh = time_in_gri_ranges / time_in_gri_ranges.sum() * 100
+    return {'vlow': vlow, 'low': low, 'high': high, 'vhigh': vhigh, 'gri': gri_index(vlow, low, high, vhigh)}
+
+
+def _grade_stats(signal: _Signal) -> dict:
+    grades = grade_values(signal.glucose)
+    grade_sum = grades.sum()
+    glucose_mmol = signal.glucose / 18
+    stats = {'grade': grade_sum / len(grades)}
+    for name, mask in [('grade_hypo', glucose_mmol < 3.9), ('grade_eu', (3.9 <= glucose_mmol) & (glucose_mmol <= 7.8)),
+                       ('grade_hyper', glucose_mmol > 7.8)]:
+        stats[name] = grades[mask].sum() / grade_sum * 100 if grade_sum != 0 else 0.
+    return stats
+
+
+def _control_indexes(signal: _Signal) -> dict:
+    config = signal.config
+    hypo_values, hyper_values = control_values(signal.glucose, config['in_range_interval'], config['a'], config['b'])
+    hypo_index = hypo_values.sum() / (config['d'] * len(signal.glucose))
+    hyper_index = hyper_values.sum() / (config['c'] * len(signal.glucose))
+    return {'hyper_index': hyper_index, 'hypo_index': hypo_index, 'igc': hypo_index + hyper_index}
+
+
+def _a1c(signal: _Signal) -> dict:
+    e_a1c, gmi = a1c_from_mean(signal.mean)
+    return {'eA1C': e_a1c, 'gmi': gmi}
+
+
+def _qgc(signal: _Signal) -> dict:
+    m_value = m_values(signal.glucose, signal.config['ideal_bg']).mean() + signal.max_diff / 20
+    return {'m_value': m_value, 'j_index': 0.001 * ((signal.mean + signal.std) ** 2)}
+
+
+def _excursions(signal: _Signal) -> dict:
+    peaks, nadirs = find_peaks(signal.glucose)[0], find_peaks(-signal.glucose)[0]
+    if len(peaks) > len(nadirs):
+        nadirs = np.append(nadirs, len(signal.glucose) - 1)
+    elif len(peaks) < len(nadirs):
+        peaks = np.append(peaks, len(signal.glucose) - 1)
+    excursions = np.abs(signal.glucose[peaks] - signal.glucose[nadirs])
+    significant_excursions = excursions[excursions > signal.std]
+    return {'mage': significant_excursions.mean() if len(significant_excursions) > 0 else np.nan,
+            'ef': len(significant_excursions)}
+
+
+def _variability(signal: _Signal) -> dict:
+    total_time = signal.time_diff.sum()
+    dt = signal.glucose_diff.sum()
+    total_distance = np.sqrt((signal.time_diff / 60) ** 2 + signal.glucose_diff ** 2).sum()
+    return {'dt': dt, 'mag': dt / (total_time / 3600), 'gvp': (total_distance / (total_time / 60) - 1) * 100,
+            'cv': signal.std / signal.mean * 100}
+
+
+def _agp(signal: _Signal) -> dict:
+    agp_bin = signal.config['agp_bin']
+    minutes = (signal.times // 60 % 1440).astype('int64')
+    profiles = agp_profiles(np.zeros(len(minutes), dtype='int64'), minutes, signal.glucose, 1, agp_bin)[0]
+    return {column: value for stat, stat_profile in zip(agp_percentiles, profiles)
+            for column, value in zip(agp_columns(stat, agp_bin), stat_profile)}
+
+
+def _episodes(signal: _Signal) -> dict:
+    config = signal.config
+    stats = episodes_statistics(np.zeros(len(signal.times), dtype='int64'), signal.times, signal.glucose, 1,
+                                config['in_range_interval'], config['time_units'], config['episode_min_duration'],
+                                config['episode_end_duration'])
+    return {stat: values[0] for stat, values in stats.items()}
+
+
+subgroups_functions = {
+    'time_in_ranges': _time_in_ranges,
+    'percentage_time_in_ranges': _percentage_time_in_ranges,
+    'observations_in_ranges': _observations_in_ranges,
+    'percentage_observations_in_ranges': _percentage_observations_in_ranges,
+    'mean_in_ranges': _mean_in_ranges,
+    'distribution': _distribution,
+    'complexity': _complexity,
+    'auc': _auc,
+    'g_indexes': _g_indexes,
+    'g_risks': _g_risks,
+    'grade_stats': _grade_stats,
+    'control_indexes': _control_indexes,
+    'a1c': _a1c,
+    'qgc': _qgc,
+    'excursions': _excursions,
+    'variability': _variability,
+    'agp': _agp,
+    'episodes': _episodes
+}
+
+statistics_subgroups = {stat: subgroup for subgroups in constants.available_statistics.values()
+                        for subgroup, stats in subgroups.items() for stat in stats}
+
+
+def compute(timestamps: np.ndarray, glucose: np.ndarray, stats: list = constants.groups, **config) -> dict:
+    """
+    Calculates the statistics of a single signal from arrays, without building pandas objects. It is meant for low
+    latency computation of one signal at a time (e.g. at request time); to compute the statistics of many signals use
+    ExtractGlucoStats. The statistics are the same as the ones computed by ExtractGlucoStats.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+        Timestamps of the samples in chronological order, as datetime64 values or as seconds (int or float).
+
+    glucose : np.ndarray
+        Glucose levels in mg/dL of the samples.
+
+    stats : list, default constants.groups
+        A list containing the names of the statistics, subgroups of statistics or groups of statistics to compute.
+
+    **config
+        Configuration parameters of the statistics. See ExtractGlucoStats.configuration.
+
+    Returns
+    -------
+    statistics : dict
+        A dictionary where the keys are the names of the statistics and the values are the statistics. Quartiles are
+        named 'quartile_<q>' as in ExtractGlucoStats.
+    """
+    list_statistics_verification(stats)
+    unknown_parameters = set(config) - set(default_configuration)
+    if len(unknown_parameters) > 0:
+        raise TypeError(f'Unknown configuration parameters: {sorted(unknown_parameters)}.')
+    config = {**default_configuration, **config}
+    in_range_verification(config['in_range_interval'])
+    agp_bin_verification(config['agp_bin'])
+    episodes_params_verification(config['episode_min_duration'], config['episode_end_duration'])
+
+    timestamps, glucose = np.asarray(timestamps), np.asarray(glucose, dtype='float64')
+    if timestamps.ndim != 1 or timestamps.shape != glucose.shape:
+        raise ValueError('timestamps and glucose must be one dimensional arrays with the same length.')
+    if len(glucose) < 2:
+        raise ValueError('Glucose signals must have at least 2 samples.')
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        times = timestamps.astype('datetime64[ns]').astype('int64') / 1e9
+    elif np.issubdtype(timestamps.dtype, np.number):
+        times = timestamps.astype('float64')
+    else:
+        raise TypeError('timestamps must be datetime64 or numeric values in seconds.')
+    if not np.all(glucose >= 0):
+        raise ValueError('Glucose levels must be positive values.')
+
+    signal = _Signal(times, glucose, config)
+    names = []
+    for name in stats:
+        if name in constants.available_statistics:
+            names += list(constants.available_statistics[name].keys())
+        else:
+            names.append(name)
+
+    subgroups_results = {}
+    statistics = {}
+    for name in names:
+        subgroup = name if name in subgroups_functions else statistics_subgroups[name]
+        if subgroup not in subgroups_results:
+            subgroups_results[subgroup] = subgroups_functions[subgroup](signal)
+        if name == subgroup:
+            statistics.update(subgroups_results[subgroup])
+        elif name == 'quartiles':
+            statistics.update({f'quartile_{q}': subgroups_results[subgroup][f'quartile_{q}']
+                               for q in config['quartiles']})
+        elif name in agp_percentiles:
+            statistics.update({column: subgroups_results[subgroup][column]
+                               for column in agp_columns(name, config['agp_bin'])})
+        else:
+            statistics[name] = subgroups_results[subgroup][name]
+    return {stat: float(value) for stat, value in statistics.items()}
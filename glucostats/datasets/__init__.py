@@ -1 +1 @@
-from .loader import load_glucodata
+from .loader import load_glucodata, read_glucose_csv
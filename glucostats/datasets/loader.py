@@ -1,8 +1,148 @@
+import os
+import hashlib
+import numpy as np
 import pandas as pd
+from pathlib import Path
 import importlib.resources as pkg_resources
 
+from glucostats.utils.logs import get_logger
 
-def load_glucodata():
+logger = get_logger(__name__)
+
+
+def _cache_path(path: Path, cache_dir: Path = None) -> Path:
+    if cache_dir is None:
+        return path.with_name(f'.{path.name}.npz')
+    # Sources with the same name in different directories get different files in cache_dir
+    digest = hashlib.blake2b(str(path.resolve()).encode(), digest_size=8).hexdigest()
+    return Path(cache_dir) / f'{path.name}.{digest}.npz'
+
+
+def user_cache_dir() -> Path:
+    """
+    Directory of the cache of the user for glucostats ($XDG_CACHE_HOME/glucostats, ~/.cache/glucostats by default).
+    """
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'glucostats'
+
+
+def _cache_signature(path: Path, id_column: str, time_column: str, glucose_column: str, time_format: str) -> np.ndarray:
+    """
+    Identifies the version of the source file and the parsing parameters the cache was built with.
+    """
+    source = path.stat()
+    return np.array([str(source.st_mtime_ns), str(source.st_size), id_column, time_column, glucose_column,
+                     str(time_format)])
+
+
+def _load_cache(cache_path: Path, signature: np.ndarray, id_column: str, time_column: str,
+                glucose_column: str) -> pd.DataFrame or None:
+    try:
+        with np.load(cache_path) as cache:
+            if not np.array_equal(cache['signature'], signature):
+                return None
+            ids = cache['labels'].astype(object)[cache['codes']]
+            return pd.DataFrame({time_column: cache['times'].view('datetime64[ns]'), glucose_column: cache['glucose']},
+                                index=pd.Index(ids, name=id_column))
+    except (OSError, ValueError, KeyError) as error:
+        logger.warning(f'Cache {cache_path} could not be read and will be rebuilt: {error}')
+        return None
+
+
+def _save_cache(cache_path: Path, signature: np.ndarray, df_signals: pd.DataFrame):
+    column_name_timestamps, column_name_glucose = df_signals.columns
+    codes, labels = pd.factorize(df_signals.index)
+    tmp_path = cache_path.with_name(f'{cache_path.name}.tmp')
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, signature=signature, codes=codes.astype('int32'), labels=labels.to_numpy().astype(str),
+                     times=df_signals[column_name_timestamps].to_numpy().view('int64'),
+                     glucose=df_signals[column_name_glucose].to_numpy())
+        os.replace(tmp_path, cache_path)
+    except OSError as error:
+        logger.warning(f'Cache {cache_path} could not be written: {error}')
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_glucose_csv(path: str or os.PathLike, id_column: str = 'id', time_column: str = 'time',
+                     glucose_column: str = 'glucose', time_format: str = None, cache: bool = True,
+                     cache_dir: str or os.PathLike = None) -> pd.DataFrame:
+    """
+    Reads a CSV file with one row per sample and builds the signals dataframe expected by ExtractGlucoStats. The ids
+    are read as strings, the glucose levels as float64 and the timestamps are parsed with time_format.
+
+    If cache is True, the parsed signals are saved in a binary sidecar file next to the source ('.<name>.npz') or in
+    cache_dir, which is read instead of parsing the CSV again in later loads. The cache is rebuilt when the modification
+    time or the size of the source change, or when it was built with other columns or time_format. Signals with
+    timezone-aware timestamps are not cached.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        Path of the CSV file.
+
+    id_column : str, default 'id'
+        Name of the column with the ids of the signals.
+
+    time_column : str, default 'time'
+        Name of the column with the timestamps of the samples.
+
+    glucose_column : str, default 'glucose'
+        Name of the column with the glucose levels of the samples.
+
+    time_format : str, default None
+        strftime format of the timestamps. If None, it is inferred.
+
+    cache : bool, default True
+        Whether to use the sidecar cache.
+
+    cache_dir : str | os.PathLike, default None
+        Directory where the sidecar file is saved, e.g. when the directory of the source is not writable. If None, the
+        sidecar file is saved next to the source.
+
+    Return
+    ------
+    df_signals : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals and the columns are the timestamps and
+        the glucose levels.
+    """
+    path = Path(path)
+    signature = _cache_signature(path, id_column, time_column, glucose_column, time_format)
+    cache_path = _cache_path(path, cache_dir)
+    if cache and cache_path.exists():
+        df_signals = _load_cache(cache_path, signature, id_column, time_column, glucose_column)
+        if df_signals is not None:
+            logger.debug(f'{path} loaded from cache.')
+            return df_signals
+
+    df = pd.read_csv(path, usecols=[id_column, time_column, glucose_column],
+                     dtype={id_column: str, time_column: str, glucose_column: 'float64'})
+    df_signals = pd.DataFrame({time_column: pd.to_datetime(df[time_column], format=time_format).to_numpy(),
+                               glucose_column: df[glucose_column].to_numpy()},
+                              index=pd.Index(df[id_column].to_numpy(), name=id_column))
+
+    if cache and df_signals[time_column].dt.tz is None:
+        _save_cache(cache_path, signature, df_signals)
+    return df_signals
+
+
+def load_glucodata(as_signals: bool = False, cache_dir: str or os.PathLike = None) -> pd.DataFrame:
+    """
+    Loads the example glucose data.
+
+    Parameters
+    ----------
+    as_signals : bool, default False
+        If False, the raw table is returned with 'id', 'time' and 'glucose' columns. If True, the signals dataframe
+        expected by ExtractGlucoStats is returned, with the ids as index and the timestamps parsed, using the sidecar
+        cache of read_glucose_csv.
+
+    cache_dir : str | os.PathLike, default None
+        Directory of the sidecar cache when as_signals is True. If None, the cache directory of the user (see
+        user_cache_dir), so the installed package is never modified.
+    """
+    if as_signals:
+        with pkg_resources.as_file(pkg_resources.files("glucostats.datasets.data") / "glucodata.csv") as path:
+            return read_glucose_csv(path, cache_dir=user_cache_dir() if cache_dir is None else cache_dir)
     with pkg_resources.open_text("glucostats.datasets.data", "glucodata.csv") as f:
         return pd.read_csv(f)
-
@@ -1,38 +1,32 @@
+import os
+import copy
 import time
+import asyncio
+import numpy as np
 import pandas as pd
-from colorlog import ColoredFormatter
-import logging
 from tqdm import tqdm
 from multiprocessing import Pool
-from typing import Tuple
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Tuple, Iterator, AsyncIterator
 
-from glucostats.utils.format_verification import list_statistics_verification, windows_params_verification
+from glucostats.utils.format_verification import (list_statistics_verification, windows_params_verification,
+                                                  signals_quality_check, glucose_data_verification)
 from glucostats.utils.batching import batching
-from glucostats.utils.windowing import calculate_division_timestamps, create_windows
+from glucostats.utils.checkpointing import batch_key, load_checkpoint, save_checkpoint
+from glucostats.utils.caching import open_cache, max_size_verification
+from glucostats.utils.compacting import compact_signals, expand_signals
+from glucostats.store import SignalStore, StoreBatch, StoreBatches
+from glucostats.results import write_results, ResultsStore
+from glucostats.utils.windowing import calculate_division_timestamps, create_encoded_windows, decode_window_ids
+from glucostats.utils.logs import get_logger
 import glucostats.utils.constants as constants
 from glucostats.stats import (time_stats, observations_stats, descriptive_stats, risks_stats, variability_stats,
-                              control_stats)
+                              control_stats, agp_stats, episodes_stats, ranges_sweep)
 
 from sklearn.base import BaseEstimator, TransformerMixin
 
-logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-
-# Definir el formato con colores
-formatter = ColoredFormatter(
-    "%(log_color)s%(levelname)s:%(reset)s %(message)s",
-    log_colors={
-        "DEBUG": "cyan",
-        "INFO": "green",
-        "WARNING": "yellow",
-        "ERROR": "red",
-        "CRITICAL": "bold_red",
-    },
-)
-
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
+logger = get_logger(__name__)
 
 
 class ExtractGlucoStats(BaseEstimator, TransformerMixin):
@@ -95,10 +89,47 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
 
     n_workers: int, default 0
         Number of cpus to use for multiprocessing. Enables distributed processing by parllalel computation.
+
+    checkpoint_dir: str, default None
+        If None, no checkpointing is done. If is a path, the statistics and time ranges of every completed batch are
+        saved in this directory, keyed by the contents of the batch and the configuration. Running transform again
+        with the same signals and configuration loads the completed batches and only computes the missing ones.
+
+    **errors : 'raise' or 'collect', default 'raise'**
+
+        What to do with signals that have a wrong format or whose statistics cannot be computed.
+
+        * 'raise': the first error found is raised and the extraction is aborted.
+        * 'collect': signals with wrong format are discarded before batching, and if the statistics of a batch cannot
+          be computed, the signals of the batch are computed one by one to discard only the failing ones. The
+          discarded signals and the reason are stored in the errors_report attribute.
+
+    compact: bool, default False
+        If True, the glucose levels are stored as int16 when they are all integers (e.g. in mg/dL), which is lossless,
+        and as float32 otherwise, and object timestamps are converted to datetime64 before batching. This reduces the
+        memory used by the batches and the data sent to the workers. The statistics are always computed in float64.
+        It has no effect on signals read from a SignalStore.
+
+    results_store: ResultsStore, default None
+        If None, the results are only kept in memory. If is a ResultsStore, the statistics and time ranges of every
+        batch are also written in the store as soon as they are computed, so they can be queried by patient and time
+        range later (e.g. by the heatmaps) without loading all the results.
+
+    cache_dir: str, default None
+        If None, no caching is done. If is a path, the statistics and time ranges of every signal are stored in this
+        directory, keyed by a hash of the timestamps and glucose levels of the signal, the windowing parameters and the
+        configuration parameters used by the statistics in list_statistics. Signals found in the cache are not
+        computed again. The cache can be shared by several processes and runs.
+
+    cache_max_size: int, default None
+        Maximum size in bytes of the cache. When exceeded, the least recently used signals are removed from the cache.
+        If None, the cache is not bounded.
     """
     def __init__(self, list_statistics: list, windowing: bool = False, windowing_method: str = 'number',
                  windowing_param=4,  windowing_start: str = 'tail', windowing_overlap: bool = False,
-                 batch_size: int = None, n_workers: int = 0):
+                 batch_size: int = None, n_workers: int = 0, checkpoint_dir: str = None, errors: str = 'raise',
+                 compact: bool = False, results_store: ResultsStore = None, cache_dir: str = None,
+                 cache_max_size: int = None):
 
         self.list_statistics = list_statistics_verification(list_statistics)
 
@@ -123,6 +154,30 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
                 raise ValueError('n_workers must be positive integer.')
         self.n_workers = n_workers
 
+        if not isinstance(checkpoint_dir, (str, os.PathLike)) and checkpoint_dir is not None:
+            raise TypeError('checkpoint_dir must be a path or None. If None, no checkpointing is done.')
+        self.checkpoint_dir = checkpoint_dir
+
+        if errors not in ['raise', 'collect']:
+            raise ValueError('errors must be either "raise" or "collect".')
+        self.errors = errors
+        self.errors_report = None
+        self.id_labels = None
+
+        if not isinstance(compact, bool):
+            raise TypeError('compact must be a boolean.')
+        self.compact = compact
+
+        if not isinstance(results_store, ResultsStore) and results_store is not None:
+            raise TypeError('results_store must be a ResultsStore or None.')
+        self.results_store = results_store
+
+        if not isinstance(cache_dir, (str, os.PathLike)) and cache_dir is not None:
+            raise TypeError('cache_dir must be a path or None. If None, no caching is done.')
+        self.cache_dir = cache_dir
+        max_size_verification(cache_max_size)
+        self.cache_max_size = cache_max_size
+
         self.stats_computed = False
         self.signals_time_ranges = None
         self.statistics = None
@@ -138,14 +193,19 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             'b': 2.0,
             'c': 30,
             'd': 30,
-            'ideal_bg': 120
+            'ideal_bg': 120,
+            'agp_bin': 60,
+            'episode_min_duration': 15,
+            'episode_end_duration': 15
         }
 
         self.data = None
 
     def configuration(self, in_range_interval: list = [70, 180], time_units: str = 'm', ddof: int = 1,
                       quartiles: list = [0.25, 0.5, 0.75], threshold: int or float = 0, where: str = 'above',
-                      a: float = 1.1, b: float = 2.0, c: float = 30, d: float = 30, ideal_bg: int or float = 120):
+                      a: float = 1.1, b: float = 2.0, c: float = 30, d: float = 30, ideal_bg: int or float = 120,
+                      agp_bin: int = 60, episode_min_duration: int or float = 15,
+                      episode_end_duration: int or float = 15):
         """
         Change configuration parameters for glucose statistics.
 
@@ -155,7 +215,11 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             Interval defining whether glucose levels are within range or not. This parameter is useful for every
             statistic dependent of the ranges as time in ranges, observations in ranges or mean in ranges and for the
             calculation of glucose control indexes. The parameter must be a list with the lower and upper limit, default
-            is [70, 180] in mg/dL.
+            is [70, 180] in mg/dL. It can also be a list of intervals (e.g. [[70, 180], [63, 140], [54, 250]]) to
+            compute the statistics of time_in_ranges, percentage_time_in_ranges, observations_in_ranges,
+            percentage_observations_in_ranges, mean_in_ranges and control_indexes for all of them in one pass, with a
+            column per statistic and interval ('t_ir_70-180', 't_ir_63-140', ...). The rest of statistics depending on
+            the ranges use the first interval.
 
         time_units : str, default 'm'
             Time units to calculate time in range. Can be 'h' (hours), 'm' (minutes) or 's' (seconds). Default 'm'.
@@ -186,7 +250,21 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
 
         ideal_bg : int | float, default=120
             The glucose level ideal value. Use for m-value calculation. Default 120.
+
+        agp_bin : int, default 60
+            Width in minutes of the time of day bins of the Ambulatory Glucose Profile (agp statistics). Must divide a
+            day, e.g. 15 or 60. Default 60.
+
+        episode_min_duration : int | float, default 15
+            Minimum duration in minutes of the hypoglycemic and hyperglycemic episodes (episodes statistics).
+            Default 15.
+
+        episode_end_duration : int | float, default 15
+            Minimum time in minutes out of the range of an episode for it to end, shorter recoveries are part of the
+            episode. Default 15.
         """
+        agp_stats.agp_bin_verification(agp_bin)
+        episodes_stats.episodes_params_verification(episode_min_duration, episode_end_duration)
         self.stats_configuration = {
             'in_range_interval': in_range_interval,
             'time_units': time_units,
@@ -198,12 +276,16 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             'b': b,
             'c': c,
             'd': d,
-            'ideal_bg': ideal_bg
+            'ideal_bg': ideal_bg,
+            'agp_bin': agp_bin,
+            'episode_min_duration': episode_min_duration,
+            'episode_end_duration': episode_end_duration
         }
 
         return self
 
-    def statistics_computation(self, batch: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def statistics_computation(self, batch: pd.DataFrame,
+                               id_labels: pd.Series = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Windowing and statistics in list_statistics extraction from a batch of signals.
 
@@ -215,6 +297,10 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             just one column containing the glucose levels values. Can be a piece of df_signals or the complete
             df_signals.
 
+        id_labels : pd.Series, default None
+            Labels of the signals of a batch with encoded ids, indexed by their codes (see _prepare_batches). They are
+            used to identify the windows in the error messages.
+
         Return
         ------
         stats : pd.DataFrame
@@ -225,13 +311,29 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             A pd.DataFrame where the index is the unique identifier of the signals or windows of the signals and the
             columns are the start and end timestamps of the signals or the windows of the signals.
         """
+        batch = expand_signals(batch)
         if self.windowing:
             division_timestamps = calculate_division_timestamps(batch, self.windowing_method, self.windowing_param,
                                                                 self.windowing_start)
-            batch, signals_start_and_end = create_windows(batch, division_timestamps, self.windowing_start,
-                                                          self.windowing_overlap)
+            batch, signals_start_and_end = create_encoded_windows(batch, division_timestamps, self.windowing_start,
+                                                                  self.windowing_overlap)
+            signals_ids = division_timestamps.index.astype(str)
+            # Windows are verified before the statistics, so the errors show the ids of the windows instead of their
+            # encoded ids
+            windows_len = batch.groupby(level=0, sort=False).size()
+            if (windows_len < 2).any():
+                signals_codes, n_windows = decode_window_ids(windows_len.index[windows_len < 2])
+                labels = division_timestamps.index[signals_codes]
+                labels = labels if id_labels is None else id_labels.loc[labels]
+                windows_ids = list(pd.Index(labels).astype(str) + '|' + pd.Index(n_windows).astype(str))
+                raise ValueError(f'Glucose signals must have at least 2 samples. {windows_ids} signals have fewer '
+                                 f'samples.')
+            signals_codes, n_windows = decode_window_ids(signals_start_and_end.index)
+            signals_start_and_end.index = signals_ids[signals_codes] + '|' + pd.Index(n_windows).astype(str)
         else:
-            signals_start_and_end = 'error' # TODO check best descriptor
+            column_name_timestamps, column_name_glucose = batch.columns
+            signals_timestamps = batch.groupby(level=0, sort=False)[column_name_timestamps]
+            signals_start_and_end = pd.DataFrame({'start': signals_timestamps.min(), 'end': signals_timestamps.max()})
 
         dict_functions = {
             'time_in_ranges': lambda params: time_stats.time_in_ranges(batch, params['in_range_interval'], params['time_units']),
@@ -250,12 +352,35 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             'qgc': lambda params: control_stats.qgc_index(batch, params['ideal_bg']),
             'excursions': lambda params: variability_stats.signal_excursions(batch),
             'variability': lambda params: variability_stats.glucose_variability(batch),
+            'agp': lambda params: agp_stats.agp(batch, params['agp_bin']),
+            'episodes': lambda params: episodes_stats.glycemic_episodes(batch, params['in_range_interval'],
+                                                                        params['time_units'],
+                                                                        params['episode_min_duration'],
+                                                                        params['episode_end_duration']),
         }
 
+        params = self.stats_configuration
+        intervals = None
+        if ranges_sweep.is_intervals_list(params['in_range_interval']):
+            # The subgroups depending on the ranges are computed for every interval from a single histogram of the
+            # batch, and the rest of statistics using the ranges (episodes) use the first interval
+            intervals = ranges_sweep.intervals_verification(params['in_range_interval'])
+            params = dict(params, in_range_interval=intervals[0])
+            histogram = []
+
+            def sweep(subgroup):
+                if len(histogram) == 0:
+                    histogram.append(ranges_sweep.RangesHistogram(batch, intervals))
+                return histogram[0].statistics([subgroup], params['time_units'], params['a'], params['b'],
+                                               params['c'], params['d'])
+
+            for subgroup in ranges_sweep.sweep_subgroups:
+                dict_functions[subgroup] = lambda params, subgroup=subgroup: sweep(subgroup)
+
         stats = pd.DataFrame()
         for stat_name in self.list_statistics:
             if stat_name in constants.subgroups:
-                stats = pd.concat([stats, dict_functions[stat_name](self.stats_configuration)], axis=1)
+                stats = pd.concat([stats, dict_functions[stat_name](params)], axis=1)
             else:
                 for group, subgroups in constants.available_statistics.items():
                     for subgroup, subgroup_stats in subgroups.items():
@@ -263,24 +388,328 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
                             subgroup_of_stat_name = subgroup
                 if stat_name == 'quartiles':
                     stat_name = list(map(lambda x: f'quartile_{x}', self.stats_configuration[stat_name]))
-                stats = pd.concat([stats, dict_functions[subgroup_of_stat_name](self.stats_configuration)[stat_name]],
-                                  axis=1)
+                elif stat_name in agp_stats.agp_percentiles:
+                    stat_name = agp_stats.agp_columns(stat_name, params['agp_bin'])
+                elif intervals is not None and subgroup_of_stat_name in ranges_sweep.sweep_subgroups:
+                    stat_name = ranges_sweep.sweep_columns(stat_name, intervals)
+                stats = pd.concat([stats, dict_functions[subgroup_of_stat_name](params)[stat_name]], axis=1)
 
         if self.windowing:
-            stats.index = stats.index.str.split('|', expand=True)
-            stats.index.names = ['unique_id', 'window']
+            signals_codes, n_windows = decode_window_ids(stats.index)
+            stats.index = pd.MultiIndex.from_arrays([signals_ids[signals_codes], pd.Index(n_windows).astype(str)],
+                                                    names=['unique_id', 'window'])
             stats = stats.reset_index().set_index('unique_id')
             stats = stats.pivot_table(index=stats.index, columns='window', aggfunc='first')
             stats.columns = ['{}|{}'.format(col[0], col[1]) for col in stats.columns]
 
         return stats, signals_start_and_end
 
+    def isolated_computation(self, batch: pd.DataFrame,
+                             id_labels: pd.Series = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Same as statistics_computation, but when errors='collect' a failure in the batch does not abort the extraction:
+        the signals of the batch are computed one by one and the failing ones are reported.
+
+        Return
+        ------
+        stats, signals_start_and_end : pd.DataFrame
+            Same as the output of statistics_computation, without the failing signals.
+
+        errors_report : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the failing signals and the columns are the stage
+            where the signal failed and the error message.
+        """
+        errors_report = pd.DataFrame(columns=['stage', 'error'])
+        if self.errors == 'raise':
+            return *self.statistics_computation(batch, id_labels), errors_report
+
+        try:
+            return *self.statistics_computation(batch, id_labels), errors_report
+        except Exception:
+            pass
+
+        stats, signals_start_and_end, errors = [], [], {}
+        for signal_id, signal in batch.groupby(level=0, sort=False):
+            try:
+                signal_stats, signal_start_and_end = self.statistics_computation(signal, id_labels)
+                stats.append(signal_stats)
+                signals_start_and_end.append(signal_start_and_end)
+            except Exception as error:
+                errors[signal_id] = ['computation', f'{type(error).__name__}: {error}']
+        if len(errors) > 0:
+            errors_report = pd.DataFrame.from_dict(errors, orient='index', columns=['stage', 'error'])
+        stats = pd.concat(stats) if len(stats) > 0 else pd.DataFrame()
+        signals_start_and_end = pd.concat(signals_start_and_end) if len(signals_start_and_end) > 0 else pd.DataFrame()
+
+        return stats, signals_start_and_end, errors_report
+
+    def relevant_configuration(self) -> dict:
+        """
+        Returns the parameters of stats_configuration used by the statistics in list_statistics.
+        """
+        subgroups_selected = set()
+        for stat_name in self.list_statistics:
+            for group, subgroups in constants.available_statistics.items():
+                for subgroup, subgroup_stats in subgroups.items():
+                    if stat_name == subgroup or stat_name in subgroup_stats:
+                        subgroups_selected.add(subgroup)
+        parameters = sorted(set(sum([constants.subgroups_configuration[subgroup]
+                                     for subgroup in subgroups_selected], [])))
+        return {param: self.stats_configuration[param] for param in parameters}
+
+    def results_parameters(self) -> dict:
+        """
+        Returns all the parameters that affect the statistics and time ranges computed for a signal.
+        """
+        return {
+            'list_statistics': sorted(self.list_statistics),
+            'windowing': [self.windowing, self.windowing_method, self.windowing_param, self.windowing_start,
+                          self.windowing_overlap],
+            'stats_configuration': self.relevant_configuration()
+        }
+
+    def cached_computation(self, batch: pd.DataFrame,
+                           id_labels: pd.Series = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Same as isolated_computation, but if cache_dir is set the signals of the batch found in the cache are read
+        from it and only the rest of the signals are computed and stored in the cache.
+        """
+        if self.cache_dir is None:
+            return self.isolated_computation(batch, id_labels)
+
+        cache = open_cache(os.fspath(self.cache_dir), self.cache_max_size)
+        keys = cache.signals_keys(batch, self.results_parameters())
+        entries = {signal_id: cache.get(key) for signal_id, key in keys.items()}
+        missing_ids = [signal_id for signal_id, entry in entries.items() if entry is None]
+        logger.debug(f'{len(entries) - len(missing_ids)} signals read from cache.')
+
+        errors_report = pd.DataFrame(columns=['stage', 'error'])
+        if len(missing_ids) > 0:
+            stats, signals_start_and_end, errors_report = self.isolated_computation(
+                batch[batch.index.isin(missing_ids)], id_labels)
+            if self.windowing:
+                ranges_ids = signals_start_and_end.index.str.rsplit('|', n=1).str[0]
+                ranges_suffixes = '|' + signals_start_and_end.index.str.rsplit('|', n=1).str[1]
+            else:
+                ranges_ids = signals_start_and_end.index.astype(str)
+                ranges_suffixes = pd.Index([''] * len(signals_start_and_end))
+            # Windowed statistics are indexed by the ids of the signals as strings
+            signals_ids = {str(signal_id): signal_id for signal_id in keys.index}
+            for stats_id in stats.index:
+                signal_id = signals_ids[str(stats_id)]
+                is_signal = ranges_ids == str(signal_id)
+                signal_start_and_end = signals_start_and_end[is_signal].set_axis(ranges_suffixes[is_signal])
+                entries[signal_id] = (stats.loc[[stats_id]], signal_start_and_end)
+                cache.put(keys[signal_id], entries[signal_id])
+            cache.evict()
+
+        stats, signals_start_and_end = [], []
+        for signal_id, entry in entries.items():
+            if entry is None:
+                continue
+            signal_stats, signal_start_and_end = entry
+            stats.append(signal_stats.set_axis([signal_id]))
+            if self.windowing:
+                signal_start_and_end = signal_start_and_end.set_axis(f'{signal_id}' + signal_start_and_end.index)
+            else:
+                signal_start_and_end = signal_start_and_end.set_axis([signal_id])
+            signals_start_and_end.append(signal_start_and_end)
+        stats = pd.concat(stats) if len(stats) > 0 else pd.DataFrame()
+        signals_start_and_end = pd.concat(signals_start_and_end) if len(signals_start_and_end) > 0 else pd.DataFrame()
+        stats.index.name = 'unique_id' if self.windowing else batch.index.name
+        signals_start_and_end.index.name = None if self.windowing else batch.index.name
+
+        return stats, signals_start_and_end, errors_report
+
+    def batch_computation(self, batch: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Same as cached_computation, but if checkpoint_dir is set the results of the batch are loaded from the
+        checkpoint directory when the batch was already completed, and saved there once computed otherwise.
+        """
+        if isinstance(batch, StoreBatch):
+            batch = batch.load()
+        # Labels of the signals of a batch with encoded ids, in order of appearance (see _prepare_batches)
+        labels = batch.attrs.pop('id_labels', None)
+        id_labels = None
+        if labels is not None:
+            local_codes, codes = pd.factorize(batch.index)
+            id_labels = pd.Series(labels, index=codes)
+        if self.checkpoint_dir is None:
+            return self.cached_computation(batch, id_labels)
+
+        parameters = self.results_parameters()
+        parameters['errors'] = self.errors
+        if labels is None:
+            key = batch_key(batch, parameters)
+            results = load_checkpoint(self.checkpoint_dir, key)
+            if results is None:
+                results = self.cached_computation(batch, id_labels)
+                save_checkpoint(self.checkpoint_dir, key, results)
+            else:
+                logger.debug(f'Batch {key} loaded from checkpoint.')
+            return results
+
+        # The codes of the signals depend on the rest of the signals of the extraction, so the key is calculated with
+        # their labels and the results are saved with the positions of the signals in the batch instead of their codes
+        key = batch_key(batch, parameters, labels.take(local_codes))
+        results = load_checkpoint(self.checkpoint_dir, key)
+        if results is None:
+            results = self.cached_computation(batch, id_labels)
+            positions = self._map_ids(results, lambda ids: pd.Index(codes.get_indexer(ids)))
+            save_checkpoint(self.checkpoint_dir, key, positions)
+        else:
+            logger.debug(f'Batch {key} loaded from checkpoint.')
+            results = self._map_ids(results, lambda positions: codes.take(np.asarray(positions, dtype='int64')))
+        return results
+
     def fit(self, X, y=None):
         """
         Function just created for making ExtractGlucoStats compatible in scikit-learn pipelines.
         """
         return self
 
+    def _prepare_batches(self, X: pd.DataFrame or SignalStore or StoreBatches) -> list:
+        """
+        Discards the signals with wrong format when errors='collect' and divides the remaining ones in batches.
+        """
+        if isinstance(X, (SignalStore, StoreBatches)):
+            # Signals of a store were verified when appended, and its batches are read from disk by the workers
+            batches = X.batches(self.batch_size) if isinstance(X, SignalStore) else X
+            offsets = batches.store.offsets
+            logger.info(f'Number of signals: {len(batches.positions)}.')
+            logger.info(f'Number of samples: {(offsets[batches.positions + 1] - offsets[batches.positions]).sum()}.')
+            self.errors_report = pd.DataFrame(columns=['stage', 'error'])
+            self.id_labels = batches.store.labels
+            return batches
+
+        logger.info(f'Number of signals: {X.index.get_level_values(0).nunique()}.')
+        logger.info(f'Number of samples: {X.shape[0]}.')
+
+        self.errors_report = pd.DataFrame(columns=['stage', 'error'])
+        rows = None
+        if self.errors == 'collect':
+            signals_errors = signals_quality_check(X)
+            if len(signals_errors) > 0:
+                logger.warning(f'{len(signals_errors)} signals discarded for having wrong format.')
+                self.errors_report = pd.DataFrame({'stage': 'verification', 'error': signals_errors})
+                rows = ~X.index.isin(signals_errors.index)
+            if X.empty or (rows is not None and not rows.any()):
+                return []
+        else:
+            # Signals are verified before their ids are encoded, so the errors show their labels
+            X = glucose_data_verification(X)
+
+        if self.compact:
+            # Signals are compacted while the signals with wrong format are discarded, without copying them first
+            X = compact_signals(X, rows)
+            logger.debug(f'Compact signals: {X.memory_usage(index=False).sum() / 2 ** 20:.1f} MB.')
+        elif rows is not None:
+            X = X[rows]
+
+        # Ids are encoded as int32 codes, which are lighter to group, send to the workers and store than the
+        # original labels. Labels are restored in the results by _decode_ids
+        codes, self.id_labels = pd.factorize(X.index)
+        if isinstance(self.id_labels, pd.CategoricalIndex):
+            # Categorical ids (e.g. from split_signals_by_period) are returned as plain labels
+            self.id_labels = pd.Index(self.id_labels.to_numpy())
+        # The index is replaced in a shallow copy, so the samples are not copied
+        X = X.copy(deep=False)
+        X.index = pd.Index(codes.astype('int32'), name=X.index.name)
+
+        start = time.time()
+        batches = batching(X, self.batch_size)
+        logger.debug(f'Batching: {time.time() - start:.3f}s.')
+        # The labels of the signals are sent to the workers with each batch, for the checkpoint keys and the errors
+        for batch in batches:
+            batch.attrs['id_labels'] = self.id_labels.take(pd.unique(batch.index.to_numpy()))
+        return batches
+
+    def _map_ids(self, results: tuple, ids) -> tuple:
+        """
+        Replaces the integer ids of the signals in the results of a batch with the ones returned by ids for them. The
+        frames of results are not modified.
+        """
+        stats, signals_start_and_end, errors_report = [frame.copy(deep=False) for frame in results]
+        if self.windowing:
+            # Windowed statistics are sorted by the new ids of the signals, as when they are computed with them, and
+            # the windows keep the order of the signals in the batch
+            stats.index = pd.Index(ids(stats.index.astype('int64')).astype(str), name=stats.index.name)
+            stats = stats.sort_index()
+            ranges_ids = signals_start_and_end.index.str.rsplit('|', n=1)
+            signals_labels = ids(ranges_ids.str[0].astype('int64')).astype(str)
+            signals_start_and_end.index = signals_labels + '|' + ranges_ids.str[1]
+        else:
+            stats.index = pd.Index(ids(stats.index), name=stats.index.name)
+            signals_start_and_end.index = pd.Index(ids(signals_start_and_end.index),
+                                                   name=signals_start_and_end.index.name)
+        errors_report.index = ids(errors_report.index)
+        return stats, signals_start_and_end, errors_report
+
+    def _decode_ids(self, results: tuple) -> tuple:
+        """
+        Restores the original labels of the signals in the results of a batch computed with encoded ids.
+        """
+        return self._map_ids(results, lambda codes: self.id_labels.take(np.asarray(codes, dtype='int64')))
+
+    def _worker(self):
+        """
+        Copy of the extractor sent to the workers, without the data and results of previous extractions.
+        """
+        worker = copy.copy(self)
+        worker.data = worker.statistics = worker.signals_time_ranges = worker.id_labels = None
+        worker.results_store = None
+        return worker
+
+    def _finish_batch(self, results: tuple) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Decodes the ids of the results of a batch, collects its errors and writes it in the results store.
+        """
+        stats, signals_start_and_end, errors_report = self._decode_ids(results)
+        self._collect_errors(errors_report)
+        if self.results_store is not None:
+            self.results_store.write(stats, signals_start_and_end)
+        return stats, signals_start_and_end
+
+    def transform_batches(self, X: pd.DataFrame) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Generator version of transform. Batches are sent to the worker pool (if n_workers > 0) and the statistics and
+        time ranges of each batch are yielded as soon as they are computed, in the same order as the batches, so they
+        can be written to disk incrementally without holding the statistics of the whole cohort in memory.
+
+        Parameters
+        ----------
+        X : pd.DataFrame | SignalStore
+            A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a
+            string, and it has two columns: the first column must contain the timestamps in datetime format of the
+            samples and the second column must contain the glucose levels in mg/dL of the samples. Can also be a
+            SignalStore (or the batches of some of its signals returned by SignalStore.batches), whose batches are read
+            from disk when they are computed.
+
+        Return
+        ------
+        batch_results : iterator of (pd.DataFrame, pd.DataFrame)
+            For each batch, the statistics extracted and the start and end timestamps of the signals or windows, with
+            the same format as the output of statistics_computation.
+        """
+        batches = self._prepare_batches(X)
+
+        if self.n_workers > 0:
+            logger.info(f'Distributed processing: cpus={self.n_workers}')
+            with Pool(self.n_workers) as pool:
+                for results in tqdm(pool.imap(self._worker().batch_computation, batches), total=len(batches),
+                                    desc="Statistics extraction", unit="batches", ncols=80):
+                    yield self._finish_batch(results)
+        else:
+            logger.info(f'No distributed processing')
+            for batch in tqdm(batches, desc="Statistics extraction", unit="batches", ncols=80):
+                yield self._finish_batch(self.batch_computation(batch))
+
+    def _collect_errors(self, errors_report: pd.DataFrame):
+        if not errors_report.empty:
+            logger.warning(f'{len(errors_report)} signals failed during statistics computation.')
+            self.errors_report = pd.concat([self.errors_report, errors_report]) \
+                if not self.errors_report.empty else errors_report
+
     def transform(self, X: pd.DataFrame) -> pd.DataFrame:
         """
         Main method for computing statistics encapsulating batching, multiprocessing, windowing and statistics
@@ -291,7 +720,7 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
         X : pd.DataFrame MultiIndex
             A pd.DataFrame MultiIndex, where the first level (level 0) of the index is the unique identifier of the
             signals, the second level (level 1) of the index is the timestamps of each sample of the signals and with
-            just one column containing the glucose levels values.
+            just one column containing the glucose levels values. Can also be a SignalStore, see transform_batches.
 
         Return
         ------
@@ -299,35 +728,24 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
             A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
             statistics extracted from df_signals.
         """
-        logger.info(f'Number of signals: {X.index.get_level_values(0).nunique()}.')
-        logger.info(f'Number of samples: {X.shape[0]}.')
-
         self.data = X
         start = time.time()
-        batches = batching(X, self.batch_size)
-        end = time.time()
-        print('Batching:', end - start)
+        statistics_df = self._store_results(list(self.transform_batches(X)))
+        logger.info(f'Statistics extraction time: {time.time() - start:.3f}s.')
+        return statistics_df
 
-        if self.n_workers > 0:
-            logger.info(f'Distributed processing: cpus={self.n_workers}')
-            start = time.time()
-            with Pool(self.n_workers) as pool:
-                results = list(tqdm(pool.imap(self.statistics_computation, batches),
-                                    total=len(batches), desc="Statistics extraction", unit="batches", ncols=80))
-            statistics_df = pd.concat([batch[0] for batch in results])
-            signals_start_and_end = pd.concat([batch[1] for batch in results])
-            end = time.time()
-            logger.info('Extract statistics with cpus:'.format(end - start))
-        else:
-            logger.info(f'No distributed processing')
-            statistics_df, signals_start_and_end = pd.DataFrame(), pd.DataFrame()
-            start = time.time()
-            for batch in tqdm(batches, desc="Statistics extraction", unit="batches", ncols=80):
-                statistics, starts_and_ends = self.statistics_computation(batch)
-                statistics_df = pd.concat([statistics_df, statistics])
-                signals_start_and_end = pd.concat([signals_start_and_end, starts_and_ends])
-            end = time.time()
-            logger.info('Extract statistics with no cpus:', end - start)
+    def to_parquet(self, path: str or os.PathLike, split_signals: bool = False):
+        """
+        Writes the statistics and time ranges of the last extraction in a Parquet dataset partitioned by patient and
+        date, with one row per signal or window. See glucostats.results.write_results and read_results.
+        """
+        if not self.stats_computed:
+            raise ValueError('Statistics must be computed with transform before writing them.')
+        write_results(self.statistics, self.signals_time_ranges, path, split_signals)
+
+    def _store_results(self, results: list) -> pd.DataFrame:
+        statistics_df = pd.concat([batch[0] for batch in results]) if len(results) > 0 else pd.DataFrame()
+        signals_start_and_end = pd.concat([batch[1] for batch in results]) if len(results) > 0 else pd.DataFrame()
 
         self.statistics = statistics_df
         self.signals_time_ranges = signals_start_and_end
@@ -335,5 +753,84 @@ class ExtractGlucoStats(BaseEstimator, TransformerMixin):
 
         return statistics_df
 
+    async def atransform_batches(self, X: pd.DataFrame, executor: Executor = None,
+                                 max_concurrency: int = None) -> AsyncIterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Asynchronous version of transform_batches for asyncio applications. Batches are computed in an executor, so
+        the event loop is not blocked, and the statistics and time ranges of each batch are yielded in the same order
+        as the batches. At most max_concurrency batches are submitted at the same time.
+
+        If the iteration is cancelled or closed before the end, the batches not started yet are cancelled.
+
+        Parameters
+        ----------
+        X : pd.DataFrame | SignalStore
+            A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a
+            string, and it has two columns: the first column must contain the timestamps in datetime format of the
+            samples and the second column must contain the glucose levels in mg/dL of the samples. Can also be a
+            SignalStore (or the batches of some of its signals returned by SignalStore.batches), whose batches are read
+            from disk when they are computed.
+
+        executor : concurrent.futures.Executor, default None
+            Executor where the batches are computed. If None, a process pool with n_workers processes is used, or a
+            single thread if n_workers is 0. Executors given are not shut down.
+
+        max_concurrency : int, default None
+            Maximum number of batches submitted to the executor at the same time. If None, n_workers (or 1 if
+            n_workers is 0).
+
+        Return
+        ------
+        batch_results : async iterator of (pd.DataFrame, pd.DataFrame)
+            For each batch, the statistics extracted and the start and end timestamps of the signals or windows, with
+            the same format as the output of statistics_computation.
+        """
+        if max_concurrency is None:
+            max_concurrency = max(self.n_workers, 1)
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            raise ValueError('max_concurrency must be an integer greater than or equal to 1.')
+
+        loop = asyncio.get_running_loop()
+        batches = await loop.run_in_executor(None, self._prepare_batches, X)
+        if len(batches) == 0:
+            return
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(self.n_workers) if self.n_workers > 0 else ThreadPoolExecutor(1)
+
+        worker = self._worker()
+        pending = deque()
+        next_batch = 0
+        try:
+            while next_batch < len(batches) or len(pending) > 0:
+                while next_batch < len(batches) and len(pending) < max_concurrency:
+                    pending.append(loop.run_in_executor(executor, worker.batch_computation, batches[next_batch]))
+                    next_batch += 1
+                yield self._finish_batch(await pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    async def atransform(self, X: pd.DataFrame, executor: Executor = None, max_concurrency: int = None) -> pd.DataFrame:
+        """
+        Asynchronous version of transform. See atransform_batches for the parameters. Cancelling the coroutine cancels
+        the batches not started yet.
+
+        Return
+        ------
+        statistics_df : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
+            statistics extracted from df_signals.
+        """
+        self.data = X
+        start = time.time()
+        results = [batch async for batch in self.atransform_batches(X, executor, max_concurrency)]
+        statistics_df = self._store_results(results)
+        logger.info(f'Statistics extraction time: {time.time() - start:.3f}s.')
+        return statistics_df
+
     def visualization(self, method, patients):
         pass
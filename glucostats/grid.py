@@ -0,0 +1,512 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import cached_property
+
+import glucostats.utils.constants as constants
+from glucostats.arrays import default_configuration, statistics_subgroups
+from glucostats.utils.format_verification import (glucose_data_verification, list_statistics_verification,
+                                                  in_range_verification)
+from glucostats.stats.time_stats import ranges_labels
+from glucostats.stats.risks_stats import bg_risks, gri_labels, gri_index, grade_values
+from glucostats.stats.control_stats import control_values, m_values, a1c_from_mean
+from glucostats.stats.agp_stats import agp_percentiles, agp_columns, agp_profiles, agp_bin_verification
+from glucostats.stats.episodes_stats import episodes_statistics, episodes_params_verification
+
+# Statistics whose computation depends on the order of the samples (peaks, fractal analysis...) and are not reductions
+unsupported_subgroups = ['complexity', 'excursions']
+
+
+class _GridChunk:
+    """
+    Intermediate values of a chunk of rows of a GlucoseGrid shared by the statistics of several subgroups, as _Signal
+    in glucostats.arrays. Each value is computed the first time it is needed and every value is an array with one
+    element per row (signal) or one element per slot.
+    """
+    def __init__(self, values: np.ndarray, starts: np.ndarray, freq: pd.Timedelta, tz: str or None, config: dict):
+        self.values = values
+        self.starts = starts
+        self.freq = freq
+        self.tz = tz
+        self.slot_seconds = freq.total_seconds()
+        self.config = config
+
+    @cached_property
+    def minutes(self):
+        # Minute of the day of each slot, in local time if the signals were time zone aware
+        times = self.starts.astype('int64')[:, None] + np.arange(self.values.shape[1]) * self.freq.value
+        if self.tz is None:
+            return times // 60_000_000_000 % 1440
+        local_times = pd.DatetimeIndex(times.ravel()).tz_localize('UTC').tz_convert(self.tz)
+        return (local_times.hour * 60 + local_times.minute).to_numpy().reshape(times.shape)
+
+    @cached_property
+    def valid(self):
+        return ~np.isnan(self.values)
+
+    @cached_property
+    def n_valid(self):
+        return self.valid.sum(axis=1)
+
+    @cached_property
+    def weighted(self):
+        # Valid slots that count for the time weighted statistics: the first valid slot of each row does not count, as
+        # the first sample of a signal in glucostats.arrays
+        weighted = self.valid.copy()
+        rows = np.flatnonzero(self.n_valid > 0)
+        weighted[rows, self.valid[rows].argmax(axis=1)] = False
+        return weighted
+
+    @cached_property
+    def pairs(self):
+        # Consecutive slots that are both valid, the only pairs of samples whose differences are used
+        return self.valid[:, 1:] & self.valid[:, :-1]
+
+    @cached_property
+    def glucose_diff(self):
+        return np.where(self.pairs, np.abs(np.diff(self.values, axis=1)), 0)
+
+    @cached_property
+    def labels(self):
+        return ranges_labels(self.values, self.config['in_range_interval'])
+
+    @cached_property
+    def time_in_ranges(self):
+        return np.stack([((self.labels == label) & self.weighted).sum(axis=1) for label in range(3)]) \
+            * self.slot_seconds
+
+    @cached_property
+    def observations_in_ranges(self):
+        return np.stack([((self.labels == label) & self.valid).sum(axis=1) for label in range(3)])
+
+    @cached_property
+    def sum(self):
+        return np.where(self.valid, self.values, 0).sum(axis=1)
+
+    @cached_property
+    def mean(self):
+        return self.sum / self.n_valid
+
+    def std(self, ddof: int) -> np.ndarray:
+        squares = np.where(self.valid, self.values - self.mean[:, None], 0) ** 2
+        return np.sqrt(squares.sum(axis=1) / (self.n_valid - ddof))
+
+    @cached_property
+    def max(self):
+        return np.where(self.n_valid > 0, np.where(self.valid, self.values, -np.inf).max(axis=1), np.nan)
+
+    @cached_property
+    def min(self):
+        return np.where(self.n_valid > 0, np.where(self.valid, self.values, np.inf).min(axis=1), np.nan)
+
+    @cached_property
+    def max_diff(self):
+        return self.max - self.min
+
+    def quantiles(self, qs: list) -> np.ndarray:
+        # Linear interpolation between the sorted valid values of each row (invalid slots are sorted last), as
+        # np.quantile but without sorting each row separately
+        sorted_values = np.sort(self.values, axis=1)
+        rows = np.arange(len(sorted_values))
+        last = np.maximum(self.n_valid - 1, 0)
+        quantiles = []
+        for q in qs:
+            position = q * last
+            lower = np.floor(position).astype('int64')
+            upper = np.minimum(lower + 1, last)
+            lower_values, upper_values = sorted_values[rows, lower], sorted_values[rows, upper]
+            quantiles.append(lower_values + (upper_values - lower_values) * (position - lower))
+        return np.stack(quantiles)
+
+
+def _time_in_ranges(chunk: _GridChunk) -> dict:
+    time_units = {'h': 3600, 'm': 60, 's': 1}[chunk.config['time_units']]
+    t_br, t_ir, t_ar = chunk.time_in_ranges / time_units
+    return {'t_ir': t_ir, 't_ar': t_ar, 't_br': t_br, 't_or': t_ar + t_br}
+
+
+def _percentage_time_in_ranges(chunk: _GridChunk) -> dict:
+    pt_br, pt_ir, pt_ar = chunk.time_in_ranges / chunk.time_in_ranges.sum(axis=0) * 100
+    return {'pt_ir': pt_ir, 'pt_ar': pt_ar, 'pt_br': pt_br, 'pt_or': pt_ar + pt_br}
+
+
+def _observations_in_ranges(chunk: _GridChunk) -> dict:
+    n_br, n_ir, n_ar = chunk.observations_in_ranges
+    return {'n_ir': n_ir, 'n_ar': n_ar, 'n_br': n_br, 'n_or': n_ar + n_br}
+
+
+def _percentage_observations_in_ranges(chunk: _GridChunk) -> dict:
+    pn_br, pn_ir, pn_ar = chunk.observations_in_ranges / chunk.n_valid * 100
+    return {'pn_ir': pn_ir, 'pn_ar': pn_ar, 'pn_br': pn_br, 'pn_or': pn_ar + pn_br}
+
+
+def _mean_in_ranges(chunk: _GridChunk) -> dict:
+    values = np.where(chunk.valid, chunk.values, 0)
+    sums = np.stack([np.where(chunk.labels == label, values, 0).sum(axis=1) for label in range(3)])
+    counts = chunk.observations_in_ranges
+    mean_br, mean_ir, mean_ar = sums / counts
+    mean_or = (sums[0] + sums[2]) / (counts[0] + counts[2])
+    return {'mean_ir': mean_ir, 'mean_ar': mean_ar, 'mean_br': mean_br, 'mean_or': mean_or}
+
+
+def _distribution(chunk: _GridChunk) -> dict:
+    qs = list(dict.fromkeys(chunk.config['quartiles'] + [0.25, 0.75]))
+    quartiles = dict(zip(qs, chunk.quantiles(qs)))
+    stats = {'max': chunk.max, 'min': chunk.min, 'max_diff': chunk.max_diff, 'mean': chunk.mean,
+             'std': chunk.std(chunk.config['ddof'])}
+    stats.update({f'quartile_{q}': quartile for q, quartile in quartiles.items()})
+    stats['iqr'] = quartiles[0.75] - quartiles[0.25]
+    return stats
+
+
+def _auc(chunk: _GridChunk) -> dict:
+    threshold = chunk.config['threshold']
+    if chunk.config['where'] == 'above':
+        auc_glucose = np.maximum(chunk.values, threshold) - threshold
+    else:
+        auc_glucose = threshold - np.minimum(chunk.values, threshold)
+    trapezoids = np.where(chunk.pairs, (auc_glucose[:, 1:] + auc_glucose[:, :-1]) / 2, 0)
+    return {'auc': trapezoids.sum(axis=1) * chunk.slot_seconds / 3600}
+
+
+def _g_indexes(chunk: _GridChunk) -> dict:
+    risk_l, risk_h = bg_risks(chunk.values)
+    lbgi = np.where(chunk.valid, risk_l, 0).sum(axis=1) / chunk.n_valid
+    hbgi = np.where(chunk.valid, risk_h, 0).sum(axis=1) / chunk.n_valid
+    max_lbgi = np.where(chunk.n_valid > 0, np.where(chunk.valid, risk_l, -np.inf).max(axis=1), np.nan)
+    max_hbgi = np.where(chunk.n_valid > 0, np.where(chunk.valid, risk_h, -np.inf).max(axis=1), np.nan)
+    return {'lbgi': lbgi, 'max_lbgi': max_lbgi, 'hbgi': hbgi, 'max_hbgi': max_hbgi, 'bgri': lbgi + hbgi}
+
+
+def _g_risks(chunk: _GridChunk) -> dict:
+    labels = gri_labels(chunk.values)
+    counts = np.stack([((labels == label) & chunk.weighted).sum(axis=1) for label in range(5)])
+    vlow, low, _, high, vhigh = counts / counts.sum(axis=0) * 100
+    return {'vlow': vlow, 'low': low, 'high': high, 'vhigh': vhigh, 'gri': gri_index(vlow, low, high, vhigh)}
+
+
+def _grade_stats(chunk: _GridChunk) -> dict:
+    grades = np.where(chunk.valid, grade_values(chunk.values), 0)
+    grade_sum = grades.sum(axis=1)
+    glucose_mmol = chunk.values / 18
+    stats = {'grade': grade_sum / chunk.n_valid}
+    for name, mask in [('grade_hypo', glucose_mmol < 3.9), ('grade_eu', (3.9 <= glucose_mmol) & (glucose_mmol <= 7.8)),
+                       ('grade_hyper', glucose_mmol > 7.8)]:
+        stats[name] = np.where(grade_sum != 0, np.where(mask, grades, 0).sum(axis=1) / grade_sum * 100, 0.)
+    return stats
+
+
+def _control_indexes(chunk: _GridChunk) -> dict:
+    config = chunk.config
+    hypo_values, hyper_values = control_values(chunk.values, config['in_range_interval'], config['a'], config['b'])
+    hypo_index = np.where(chunk.valid, hypo_values, 0).sum(axis=1) / (config['d'] * chunk.n_valid)
+    hyper_index = np.where(chunk.valid, hyper_values, 0).sum(axis=1) / (config['c'] * chunk.n_valid)
+    return {'hyper_index': hyper_index, 'hypo_index': hypo_index, 'igc': hypo_index + hyper_index}
+
+
+def _a1c(chunk: _GridChunk) -> dict:
+    e_a1c, gmi = a1c_from_mean(chunk.mean)
+    return {'eA1C': e_a1c, 'gmi': gmi}
+
+
+def _qgc(chunk: _GridChunk) -> dict:
+    m = np.where(chunk.valid, m_values(chunk.values, chunk.config['ideal_bg']), 0).sum(axis=1) / chunk.n_valid
+    return {'m_value': m + chunk.max_diff / 20, 'j_index': 0.001 * ((chunk.mean + chunk.std(1)) ** 2)}
+
+
+def _variability(chunk: _GridChunk) -> dict:
+    total_time = chunk.pairs.sum(axis=1) * chunk.slot_seconds
+    dt = chunk.glucose_diff.sum(axis=1)
+    distances = np.where(chunk.pairs, np.sqrt((chunk.slot_seconds / 60) ** 2 + chunk.glucose_diff ** 2), 0)
+    return {'dt': dt, 'mag': dt / (total_time / 3600), 'gvp': (distances.sum(axis=1) / (total_time / 60) - 1) * 100,
+            'cv': chunk.std(1) / chunk.mean * 100}
+
+
+def _agp(chunk: _GridChunk) -> dict:
+    agp_bin = chunk.config['agp_bin']
+    rows, slots = np.nonzero(chunk.valid)
+    profiles = agp_profiles(rows, chunk.minutes[rows, slots], chunk.values[rows, slots], len(chunk.values), agp_bin)
+    return {column: profiles[:, i, n] for i, stat in enumerate(agp_percentiles)
+            for n, column in enumerate(agp_columns(stat, agp_bin))}
+
+
+def _episodes(chunk: _GridChunk) -> dict:
+    config = chunk.config
+    rows, slots = np.nonzero(chunk.valid)
+    return episodes_statistics(rows, slots * chunk.slot_seconds, chunk.values[rows, slots], len(chunk.values),
+                               config['in_range_interval'], config['time_units'], config['episode_min_duration'],
+                               config['episode_end_duration'])
+
+
+subgroups_functions = {
+    'time_in_ranges': _time_in_ranges,
+    'percentage_time_in_ranges': _percentage_time_in_ranges,
+    'observations_in_ranges': _observations_in_ranges,
+    'percentage_observations_in_ranges': _percentage_observations_in_ranges,
+    'mean_in_ranges': _mean_in_ranges,
+    'distribution': _distribution,
+    'auc': _auc,
+    'g_indexes': _g_indexes,
+    'g_risks': _g_risks,
+    'grade_stats': _grade_stats,
+    'control_indexes': _control_indexes,
+    'a1c': _a1c,
+    'qgc': _qgc,
+    'variability': _variability,
+    'agp': _agp,
+    'episodes': _episodes
+}
+
+
+class GlucoseGrid:
+    """
+    Cohort of glucose signals sampled on a regular grid (e.g. the 5 or 15 minutes grid of most CGM devices), stored as
+    a 2D array with a row per signal and a column per time slot. Slots without a sample are NaN. Since every signal has
+    the same time between slots, the statistics of all the signals are computed at once as reductions along the rows
+    of the array (see GlucoseGrid.statistics), instead of grouping the samples by signal, and the time weighted
+    statistics (time in ranges, auc, glycemia risks...) become counts of slots.
+
+    The j-th slot of the i-th signal is at starts[i] + j * freq. Each signal starts at the slot of its first sample, so
+    the number of columns is the number of slots of the longest signal.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        2D float64 array (signals x slots) with the glucose levels in mg/dL of the slots, NaN in the slots without a
+        sample.
+
+    ids : pd.Index | list
+        Ids of the signals (rows).
+
+    starts : np.ndarray
+        datetime64[ns] timestamps of the first slot of each signal.
+
+    freq : str | pd.Timedelta
+        Time between slots, e.g. '5min'.
+
+    tz : str, default None
+        Time zone of the timestamps of the signals, if they were time zone aware.
+    """
+    def __init__(self, values: np.ndarray, ids: pd.Index or list, starts: np.ndarray, freq: str or pd.Timedelta,
+                 tz: str = None):
+        values = np.asarray(values, dtype='float64')
+        if values.ndim != 2:
+            raise ValueError('values must be a 2D array with a row per signal and a column per time slot.')
+        if len(ids) != len(values) or len(starts) != len(values):
+            raise ValueError('ids and starts must have one element per row of values.')
+        freq = pd.Timedelta(freq)
+        if freq <= pd.Timedelta(0):
+            raise ValueError('freq must be a positive time interval.')
+        self.values = values
+        self.ids = pd.Index(ids)
+        self.starts = np.asarray(starts, dtype='datetime64[ns]')
+        self.freq = freq
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """
+        Boolean array with the same shape as values, True in the slots with a sample.
+        """
+        return ~np.isnan(self.values)
+
+    @classmethod
+    def from_signals(cls, df_signals: pd.DataFrame, freq: str or pd.Timedelta = '5min', method: str = 'snap',
+                     max_gap: str or pd.Timedelta = None) -> 'GlucoseGrid':
+        """
+        Places the samples of the signals on a regular grid of slots aligned with the clock (e.g. at :00, :05, :10...
+        for '5min').
+
+        Parameters
+        ----------
+        df_signals : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals and it has two columns: the
+            timestamps and the glucose levels in mg/dL of the samples.
+
+        freq : str | pd.Timedelta, default '5min'
+            Time between slots, usually the sampling period of the devices.
+
+        method : str, default 'snap'
+            'snap' to move each sample to its nearest slot (if several samples fall in the same slot the last one is
+            kept), or 'interpolate' to linearly interpolate the glucose levels at the times of the slots.
+
+        max_gap : str | pd.Timedelta, default None
+            With method='interpolate', slots between two samples further apart than max_gap are left empty instead of
+            interpolated. If None, it is twice freq.
+
+        Returns
+        -------
+        grid : GlucoseGrid
+            Grid with the signals in their order of appearance in df_signals.
+        """
+        glucose_data_verification(df_signals, min_samples=1)
+        if method not in ['snap', 'interpolate']:
+            raise ValueError('method must be "snap" or "interpolate".')
+        freq = pd.Timedelta(freq)
+        if freq <= pd.Timedelta(0):
+            raise ValueError('freq must be a positive time interval.')
+        max_gap = 2 * freq if max_gap is None else pd.Timedelta(max_gap)
+
+        timestamps = df_signals[df_signals.columns[0]]
+        tz = str(timestamps.dt.tz) if timestamps.dt.tz is not None else None
+        codes, ids = pd.factorize(df_signals.index)
+        times = timestamps.to_numpy().astype('datetime64[ns]').astype('int64') if tz is None \
+            else timestamps.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('int64')
+        glucose = df_signals[df_signals.columns[1]].to_numpy(dtype='float64')
+        if len(ids) == 0:
+            return cls(np.zeros((0, 0)), pd.Index([], name=df_signals.index.name), np.zeros(0, 'datetime64[ns]'),
+                       freq, tz)
+        order = np.lexsort((times, codes))
+        codes, times, glucose = codes[order], times[order], glucose[order]
+
+        step = freq.value
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        firsts = np.concatenate([[0], boundaries])
+        lasts = np.concatenate([boundaries - 1, [len(codes) - 1]])
+        starts = times[firsts] // step * step
+
+        if method == 'snap':
+            slots = (times - starts[codes] + step // 2) // step
+            n_slots = int(slots.max()) + 1
+            values = np.full((len(ids), n_slots), np.nan)
+            # Samples are sorted by slot, so the last sample of each slot is the one before the next slot
+            flat = codes * n_slots + slots
+            last_in_slot = np.append(flat[1:] != flat[:-1], True)
+            values.flat[flat[last_in_slot]] = glucose[last_in_slot]
+        else:
+            signals_slots = (times[lasts] - starts) // step + 1
+            n_slots = int(signals_slots.max())
+            values = np.full((len(ids), n_slots), np.nan)
+            slots_codes = np.repeat(np.arange(len(ids)), signals_slots)
+            slots = np.arange(len(slots_codes)) - np.repeat(np.cumsum(signals_slots) - signals_slots, signals_slots)
+            slots_times = starts[slots_codes] + slots * step
+
+            # The next sample of a slot is the first sample of its signal at or after it, i.e. the first one whose last
+            # slot (the slot at or before it) is not before the slot. Samples are sorted by signal and last slot
+            samples_slots = (times - starts[codes]) // step
+            next_samples = np.searchsorted(codes * n_slots + samples_slots, slots_codes * n_slots + slots)
+            next_samples = np.minimum(next_samples, lasts[slots_codes])
+            previous_samples = np.maximum(next_samples - 1, firsts[slots_codes])
+
+            next_times, previous_times = times[next_samples], times[previous_samples]
+            exact = next_times == slots_times
+            covered = (next_times - previous_times <= max_gap.value) & (previous_times <= slots_times)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                interpolated = glucose[previous_samples] + (glucose[next_samples] - glucose[previous_samples]) \
+                    * (slots_times - previous_times) / (next_times - previous_times)
+            values[slots_codes, slots] = np.where(exact, glucose[next_samples], np.where(covered, interpolated, np.nan))
+
+        return cls(values, pd.Index(ids, name=df_signals.index.name), starts.astype('datetime64[ns]'), freq, tz)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Converts the grid back to the format of ExtractGlucoStats: a pd.DataFrame indexed by signal id with 'time' and
+        'glucose' columns, with a sample per slot with a glucose level.
+        """
+        rows, slots = np.nonzero(self.mask)
+        times = pd.DatetimeIndex(self.starts[rows] + slots * np.timedelta64(self.freq.value, 'ns'))
+        if self.tz is not None:
+            times = times.tz_localize('UTC').tz_convert(self.tz)
+        return pd.DataFrame({'time': times, 'glucose': self.values[rows, slots]},
+                            index=self.ids[rows].rename(self.ids.name))
+
+    def save(self, path: str or os.PathLike):
+        """
+        Saves the grid in a NumPy .npz file.
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, values=self.values, ids=self.ids.to_numpy().astype(str), starts=self.starts,
+                     freq=np.int64(self.freq.value), tz=np.array('' if self.tz is None else self.tz))
+
+    @classmethod
+    def load(cls, path: str or os.PathLike) -> 'GlucoseGrid':
+        """
+        Loads a grid saved with GlucoseGrid.save. Ids are loaded as strings.
+        """
+        with np.load(path) as data:
+            tz = str(data['tz'])
+            return cls(data['values'], data['ids'], data['starts'], pd.Timedelta(int(data['freq'])), tz or None)
+
+    def statistics(self, stats: list = constants.groups, chunk_size: int = 1024, **config) -> pd.DataFrame:
+        """
+        Calculates the statistics of all the signals of the grid as reductions along the rows of the array, a chunk of
+        chunk_size rows at a time to bound the memory of the intermediate arrays.
+
+        The statistics are the ones of glucostats.arrays.compute (and ExtractGlucoStats) applied to the samples of the
+        slots of each signal. For signals without empty slots the results are the same; when a signal has empty slots,
+        the time weighted statistics count the time of the valid slots only (the gaps are not counted as time in any
+        range) and the differences between samples (auc, variability) are only taken between consecutive valid slots.
+        Episodes are detected on the valid slots, and the time of the first slot after a gap includes the gap.
+        The statistics of the complexity and excursions subgroups depend on the order of the samples and are not
+        supported: they are left out of the groups requested, and requesting them by name raises a ValueError.
+
+        Parameters
+        ----------
+        stats : list, default constants.groups
+            A list containing the names of the statistics, subgroups of statistics or groups of statistics to compute.
+
+        chunk_size : int, default 1024
+            Number of signals whose statistics are computed at once.
+
+        **config
+            Configuration parameters of the statistics. See ExtractGlucoStats.configuration.
+
+        Returns
+        -------
+        statistics : pd.DataFrame
+            A pd.DataFrame where the index is the id of the signals and the columns are the statistics, as
+            ExtractGlucoStats.transform without windowing. Signals with less than 2 valid slots have NaN statistics.
+        """
+        list_statistics_verification(stats)
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError('chunk_size must be positive integer.')
+        unknown_parameters = set(config) - set(default_configuration)
+        if len(unknown_parameters) > 0:
+            raise TypeError(f'Unknown configuration parameters: {sorted(unknown_parameters)}.')
+        config = {**default_configuration, **config}
+        in_range_verification(config['in_range_interval'])
+        agp_bin_verification(config['agp_bin'])
+        episodes_params_verification(config['episode_min_duration'], config['episode_end_duration'])
+
+        names = []
+        for name in stats:
+            if name in constants.available_statistics:
+                # The subgroups not supported are left out of the groups requested
+                names += [subgroup for subgroup in constants.available_statistics[name]
+                          if subgroup not in unsupported_subgroups]
+            else:
+                names.append(name)
+        unsupported = [name for name in names if name in unsupported_subgroups
+                       or statistics_subgroups.get(name) in unsupported_subgroups]
+        if len(unsupported) > 0:
+            raise ValueError(f'{unsupported} statistics cannot be computed on a grid, use ExtractGlucoStats instead.')
+
+        columns = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start in range(0, len(self), chunk_size):
+                values = self.values[start:start + chunk_size]
+                # Statistics are NaN for signals with less than 2 valid slots, as they are not valid signals
+                values = np.where((~np.isnan(values)).sum(axis=1, keepdims=True) >= 2, values, np.nan)
+                chunk = _GridChunk(values, self.starts[start:start + chunk_size], self.freq, self.tz, config)
+                subgroups_results = {}
+                for name in names:
+                    subgroup = name if name in subgroups_functions else statistics_subgroups[name]
+                    if subgroup not in subgroups_results:
+                        subgroups_results[subgroup] = subgroups_functions[subgroup](chunk)
+                    if name == subgroup:
+                        chunk_stats = subgroups_results[subgroup]
+                    elif name == 'quartiles':
+                        chunk_stats = {f'quartile_{q}': subgroups_results[subgroup][f'quartile_{q}']
+                                       for q in config['quartiles']}
+                    elif name in agp_percentiles:
+                        chunk_stats = {column: subgroups_results[subgroup][column]
+                                       for column in agp_columns(name, config['agp_bin'])}
+                    else:
+                        chunk_stats = {name: subgroups_results[subgroup][name]}
+                    for stat, stat_values in chunk_stats.items():
+                        columns.setdefault(stat, []).append(np.asarray(stat_values, dtype='float64'))
+
+        return pd.DataFrame({stat: np.concatenate(chunks) for stat, chunks in columns.items()}, index=self.ids)
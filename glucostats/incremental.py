@@ -0,0 +1,358 @@
+import json
+import numpy as np
+import pandas as pd
+
+import glucostats.utils.constants as constants
+from glucostats.utils.format_verification import (list_statistics_verification, glucose_data_verification,
+                                                  in_range_verification)
+from glucostats.stats.time_stats import ranges_labels
+from glucostats.stats.risks_stats import bg_risks, gri_labels, gri_index, grade_values
+from glucostats.stats.control_stats import control_values, m_values, a1c_from_mean
+from glucostats.stats.agp_stats import agp_bin_verification
+from glucostats.stats.episodes_stats import episodes_params_verification
+
+accumulators_columns = ['n', 'mean', 'm2', 'min', 'max', 'first_time', 'last_time', 'last_glucose',
+                        'n_br', 'n_ir', 'n_ar', 'sum_br', 'sum_ir', 'sum_ar', 't_br', 't_ir', 't_ar',
+                        't_vlow', 't_low', 't_high', 't_vhigh', 'risk_l_sum', 'risk_h_sum', 'risk_l_max', 'risk_h_max',
+                        'grade_sum', 'grade_hypo_sum', 'grade_eu_sum', 'grade_hyper_sum', 'hypo_sum', 'hyper_sum',
+                        'm_value_sum', 'abs_diff_sum', 'distance_sum', 'auc_sum']
+
+
+class IncrementalGlucoStats:
+    """
+    Incremental computation of statistics for signals that grow over time. Instead of computing the statistics from
+    the full history of the signals every time new samples arrive, a set of accumulators (counts, sums, sums of
+    squares, time in ranges, risk sums, minimums and maximums, last sample...) is kept for every signal and only the new
+    samples are folded into them with partial_fit. The statistics obtained are the same as the ones computed by
+    ExtractGlucoStats on the full history.
+
+    Only the decomposable statistics (constants.decomposable_statistics) can be computed from the accumulators.
+    Quantiles, iqr, entropy, dfa, mage and ef depend on the whole signal, so they are recomputed from the full history
+    of the signals, which must be given to statistics when any of them is in list_statistics.
+
+    The accumulators can be saved and loaded with save and load (or to_dict and from_dict) to persist them between
+    runs.
+
+    Parameters
+    ----------
+    list_statistics : list
+        A list containing the names of the statistics, subgroups of statistics or groups  of statistics to extract. See
+        more details in getting started section.
+    """
+    def __init__(self, list_statistics: list):
+        self.list_statistics = list_statistics_verification(list_statistics)
+        self.stats_configuration = {
+            'in_range_interval': [70, 180],
+            'time_units': 'm',
+            'ddof': 1,
+            'quartiles': [0.25, 0.5, 0.75],
+            'threshold': 0,
+            'where': 'above',
+            'a': 1.1,
+            'b': 2.0,
+            'c': 30,
+            'd': 30,
+            'ideal_bg': 120,
+            'agp_bin': 60,
+            'episode_min_duration': 15,
+            'episode_end_duration': 15
+        }
+        self.accumulators = pd.DataFrame(columns=accumulators_columns, dtype='float64')
+
+    def configuration(self, in_range_interval: list = [70, 180], time_units: str = 'm', ddof: int = 1,
+                      quartiles: list = [0.25, 0.5, 0.75], threshold: int or float = 0, where: str = 'above',
+                      a: float = 1.1, b: float = 2.0, c: float = 30, d: float = 30, ideal_bg: int or float = 120,
+                      agp_bin: int = 60, episode_min_duration: int or float = 15,
+                      episode_end_duration: int or float = 15):
+        """
+        Change configuration parameters for glucose statistics. See ExtractGlucoStats.configuration. As the
+        accumulators depend on the configuration, it can only be changed before folding samples.
+        """
+        if not self.accumulators.empty:
+            raise ValueError('Configuration cannot be changed once samples have been folded.')
+        in_range_verification(in_range_interval)
+        if time_units not in ['h', 'm', 's']:
+            raise ValueError("time must be 'h', 'm' or 's'")
+        if where != 'above' and where != 'below':
+            raise ValueError('where must be either "above" or "below"')
+        agp_bin_verification(agp_bin)
+        episodes_params_verification(episode_min_duration, episode_end_duration)
+        self.stats_configuration = {
+            'in_range_interval': in_range_interval,
+            'time_units': time_units,
+            'ddof': ddof,
+            'quartiles': quartiles,
+            'threshold': threshold,
+            'where': where,
+            'a': a,
+            'b': b,
+            'c': c,
+            'd': d,
+            'ideal_bg': ideal_bg,
+            'agp_bin': agp_bin,
+            'episode_min_duration': episode_min_duration,
+            'episode_end_duration': episode_end_duration
+        }
+        return self
+
+    def partial_fit(self, X: pd.DataFrame, y=None):
+        """
+        Folds new samples into the accumulators of their signals. Signals not seen before are added.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a
+            string, and it has two columns: the first column must contain the timestamps in datetime format of the
+            samples and the second column must contain the glucose levels in mg/dL of the samples. Only the new
+            samples of each signal must be given, in chronological order and later than the samples already folded.
+        """
+        X = glucose_data_verification(X, min_samples=1)
+        if X.empty:
+            return self
+        column_name_timestamps, column_name_glucose = X.columns
+        config = self.stats_configuration
+
+        times = pd.to_datetime(X[column_name_timestamps]).to_numpy(dtype='datetime64[ns]').astype('int64')
+        glucose = X[column_name_glucose].to_numpy(dtype='float64')
+        ids = X.index
+
+        previous = self.accumulators.reindex(ids.unique())
+        is_first = ~pd.Series(ids).duplicated().to_numpy()
+        previous_time = pd.Series(times).groupby(ids).shift(1).to_numpy()
+        previous_glucose = pd.Series(glucose).groupby(ids).shift(1).to_numpy()
+        previous_time[is_first] = previous.loc[ids[is_first], 'last_time'].to_numpy()
+        previous_glucose[is_first] = previous.loc[ids[is_first], 'last_glucose'].to_numpy()
+        if np.any(times <= previous_time):
+            raise ValueError('Samples must be in chronological order and later than the samples already folded.')
+
+        time_diff = (times - previous_time) / 1e9
+        glucose_diff = np.abs(glucose - previous_glucose)
+        if config['where'] == 'above':
+            auc_glucose = np.maximum(glucose, config['threshold']) - config['threshold']
+            previous_auc_glucose = np.maximum(previous_glucose, config['threshold']) - config['threshold']
+        else:
+            auc_glucose = config['threshold'] - np.minimum(glucose, config['threshold'])
+            previous_auc_glucose = config['threshold'] - np.minimum(previous_glucose, config['threshold'])
+
+        labels = ranges_labels(glucose, config['in_range_interval'])
+        gri_ranges = gri_labels(glucose)
+        risk_l, risk_h = bg_risks(glucose)
+        grades = grade_values(glucose)
+        hypo_values, hyper_values = control_values(glucose, config['in_range_interval'], config['a'], config['b'])
+        signals_time_diff = np.nan_to_num(time_diff)
+
+        samples = pd.DataFrame({
+            'n': 1., 'sum': glucose, 'min': glucose, 'max': glucose, 'first_time': times, 'last_time': times,
+            'last_glucose': glucose,
+            'n_br': labels == 0, 'n_ir': labels == 1, 'n_ar': labels == 2,
+            'sum_br': np.where(labels == 0, glucose, 0), 'sum_ir': np.where(labels == 1, glucose, 0),
+            'sum_ar': np.where(labels == 2, glucose, 0),
+            't_br': np.where(labels == 0, signals_time_diff, 0), 't_ir': np.where(labels == 1, signals_time_diff, 0),
+            't_ar': np.where(labels == 2, signals_time_diff, 0),
+            't_vlow': np.where(gri_ranges == 0, signals_time_diff, 0),
+            't_low': np.where(gri_ranges == 1, signals_time_diff, 0),
+            't_high': np.where(gri_ranges == 3, signals_time_diff, 0),
+            't_vhigh': np.where(gri_ranges == 4, signals_time_diff, 0),
+            'risk_l_sum': risk_l, 'risk_h_sum': risk_h, 'risk_l_max': risk_l, 'risk_h_max': risk_h,
+            'grade_sum': grades, 'grade_hypo_sum': np.where(glucose / 18 < 3.9, grades, 0),
+            'grade_eu_sum': np.where((3.9 <= glucose / 18) & (glucose / 18 <= 7.8), grades, 0),
+            'grade_hyper_sum': np.where(glucose / 18 > 7.8, grades, 0),
+            'hypo_sum': hypo_values, 'hyper_sum': hyper_values,
+            'm_value_sum': m_values(glucose, config['ideal_bg']),
+            'abs_diff_sum': np.nan_to_num(glucose_diff),
+            'distance_sum': np.nan_to_num(np.sqrt((time_diff / 60) ** 2 + glucose_diff ** 2)),
+            'auc_sum': np.nan_to_num(time_diff / 3600 * (auc_glucose + previous_auc_glucose) / 2)
+        }, index=ids)
+        grouped = samples.groupby(level=0, sort=False)
+        new = grouped.sum()
+        new['min'] = grouped['min'].min()
+        new[['max', 'risk_l_max', 'risk_h_max']] = grouped[['max', 'risk_l_max', 'risk_h_max']].max()
+        new['first_time'] = grouped['first_time'].first()
+        new[['last_time', 'last_glucose']] = grouped[['last_time', 'last_glucose']].last()
+        new['mean'] = new['sum'] / new['n']
+        new['m2'] = grouped['sum'].var(ddof=0).fillna(0) * new['n']
+
+        previous = previous.fillna({column: 0 for column in accumulators_columns
+                                    if column not in ['min', 'max', 'risk_l_max', 'risk_h_max', 'first_time']})
+        updated = previous + new[accumulators_columns].fillna(0)
+        updated['min'] = np.fmin(previous['min'], new['min'])
+        updated['max'] = np.fmax(previous['max'], new['max'])
+        updated['risk_l_max'] = np.fmax(previous['risk_l_max'], new['risk_l_max'])
+        updated['risk_h_max'] = np.fmax(previous['risk_h_max'], new['risk_h_max'])
+        updated['first_time'] = previous['first_time'].fillna(new['first_time'])
+        updated[['last_time', 'last_glucose']] = new[['last_time', 'last_glucose']]
+        delta = new['mean'] - previous['mean']
+        updated['mean'] = previous['mean'] + delta * new['n'] / updated['n']
+        updated['m2'] = previous['m2'] + new['m2'] + delta ** 2 * previous['n'] * new['n'] / updated['n']
+
+        new_ids = updated.index.difference(self.accumulators.index, sort=False)
+        accumulators = pd.concat([self.accumulators, updated.loc[new_ids]]) if len(self.accumulators) > 0 \
+            else updated.loc[new_ids]
+        accumulators.loc[updated.index] = updated
+        self.accumulators = accumulators[accumulators_columns]
+
+        return self
+
+    def update(self, X: pd.DataFrame):
+        """
+        Alias of partial_fit.
+        """
+        return self.partial_fit(X)
+
+    def decomposable_statistics(self) -> pd.DataFrame:
+        """
+        Calculates every decomposable statistic from the accumulators.
+
+        Return
+        ------
+        statistics_df : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
+            decomposable statistics.
+        """
+        acc = self.accumulators
+        config = self.stats_configuration
+        time_units = {'h': 3600, 'm': 60, 's': 1}[config['time_units']]
+        total_time = acc['t_br'] + acc['t_ir'] + acc['t_ar']
+        n_total = acc['n_br'] + acc['n_ir'] + acc['n_ar']
+        std = np.sqrt(acc['m2'] / (acc['n'] - 1))
+
+        stats = pd.DataFrame(index=acc.index)
+        for r in ['ir', 'ar', 'br']:
+            stats[f't_{r}'] = acc[f't_{r}'] / time_units
+        stats['t_or'] = stats['t_ar'] + stats['t_br']
+        for r in ['ir', 'ar', 'br']:
+            stats[f'pt_{r}'] = acc[f't_{r}'] / total_time * 100
+        stats['pt_or'] = (acc['t_ar'] + acc['t_br']) / total_time * 100
+        for r in ['ir', 'ar', 'br']:
+            stats[f'n_{r}'] = acc[f'n_{r}']
+        stats['n_or'] = acc['n_ar'] + acc['n_br']
+        for r in ['ir', 'ar', 'br']:
+            stats[f'pn_{r}'] = acc[f'n_{r}'] / n_total * 100
+        stats['pn_or'] = stats['n_or'] / n_total * 100
+        for r in ['ir', 'ar', 'br']:
+            stats[f'mean_{r}'] = acc[f'sum_{r}'] / acc[f'n_{r}'].replace(0, np.nan)
+        stats['mean_or'] = (acc['sum_ar'] + acc['sum_br']) / stats['n_or'].replace(0, np.nan)
+
+        stats['max'] = acc['max']
+        stats['min'] = acc['min']
+        stats['max_diff'] = acc['max'] - acc['min']
+        stats['mean'] = acc['mean']
+        stats['std'] = np.sqrt(acc['m2'] / (acc['n'] - config['ddof']))
+        stats['auc'] = acc['auc_sum']
+
+        stats['lbgi'] = acc['risk_l_sum'] / acc['n']
+        stats['max_lbgi'] = acc['risk_l_max']
+        stats['hbgi'] = acc['risk_h_sum'] / acc['n']
+        stats['max_hbgi'] = acc['risk_h_max']
+        stats['bgri'] = stats['lbgi'] + stats['hbgi']
+        for r in ['vlow', 'low', 'high', 'vhigh']:
+            stats[r] = acc[f't_{r}'] / total_time * 100
+        stats['gri'] = gri_index(stats['vlow'], stats['low'], stats['high'], stats['vhigh'])
+        stats['grade'] = acc['grade_sum'] / acc['n']
+        for r in ['hypo', 'eu', 'hyper']:
+            stats[f'grade_{r}'] = (acc[f'grade_{r}_sum'] / acc['grade_sum'] * 100).fillna(0)
+
+        stats['hypo_index'] = acc['hypo_sum'] / (config['d'] * acc['n'])
+        stats['hyper_index'] = acc['hyper_sum'] / (config['c'] * acc['n'])
+        stats['igc'] = stats['hypo_index'] + stats['hyper_index']
+        stats['eA1C'], stats['gmi'] = a1c_from_mean(acc['mean'])
+        stats['m_value'] = acc['m_value_sum'] / acc['n'] + stats['max_diff'] / 20
+        stats['j_index'] = 0.001 * ((acc['mean'] + std) ** 2)
+
+        stats['dt'] = acc['abs_diff_sum']
+        stats['mag'] = acc['abs_diff_sum'] / (total_time / 3600)
+        stats['gvp'] = (acc['distance_sum'] / (total_time / 60) - 1) * 100
+        stats['cv'] = std / acc['mean'] * 100
+
+        return stats
+
+    def statistics(self, X: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Calculates the statistics in list_statistics for every signal folded.
+
+        Decomposable statistics are computed from the accumulators. The rest of statistics (quantiles, iqr, entropy,
+        dfa, mage and ef) cannot be updated incrementally, so as a fallback they are recomputed with ExtractGlucoStats
+        from the full history of the signals, which must be given in X when any of them is in list_statistics.
+
+        Parameters
+        ----------
+        X : pd.DataFrame, default None
+            Full history of the signals, with the same format as in partial_fit. Only needed when list_statistics
+            contains statistics that are not decomposable.
+
+        Return
+        ------
+        statistics_df : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals and the columns are the statistics
+            in list_statistics.
+        """
+        decomposable_stats, non_decomposable_stats = [], []
+        for name in self.list_statistics:
+            for stat in expand_statistics(name):
+                if stat in constants.decomposable_statistics:
+                    decomposable_stats.append(stat)
+                else:
+                    non_decomposable_stats.append(stat)
+
+        statistics_df = self.decomposable_statistics()[decomposable_stats]
+        if len(non_decomposable_stats) > 0:
+            if X is None:
+                raise ValueError(f'{non_decomposable_stats} cannot be computed incrementally. The full history of the '
+                                 f'signals must be given to recompute them.')
+            from glucostats.extract_statistics import ExtractGlucoStats
+            stats_extraction = ExtractGlucoStats(non_decomposable_stats)
+            stats_extraction.stats_configuration = dict(self.stats_configuration)
+            recomputed = stats_extraction.transform(X)
+            statistics_df = pd.concat([statistics_df, recomputed.reindex(statistics_df.index)], axis=1)
+
+        return statistics_df
+
+    def to_dict(self) -> dict:
+        """
+        Returns the configuration and the accumulators in a JSON serializable dictionary.
+        """
+        return {
+            'list_statistics': self.list_statistics,
+            'stats_configuration': self.stats_configuration,
+            'accumulators': self.accumulators.to_dict(orient='split')
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        """
+        Creates an IncrementalGlucoStats from the output of to_dict.
+        """
+        incremental = cls(state['list_statistics'])
+        incremental.stats_configuration = {**incremental.stats_configuration, **state['stats_configuration']}
+        accumulators = state['accumulators']
+        incremental.accumulators = pd.DataFrame(accumulators['data'], index=accumulators['index'],
+                                                columns=accumulators['columns'], dtype='float64')
+        return incremental
+
+    def save(self, path: str):
+        """
+        Saves the configuration and the accumulators in a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Loads an IncrementalGlucoStats saved with save.
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def expand_statistics(name: str) -> list:
+    """
+    Returns the names of the statistics of a group, subgroup or statistic name.
+    """
+    if name in constants.available_statistics:
+        return sum(constants.available_statistics[name].values(), [])
+    for subgroups in constants.available_statistics.values():
+        if name in subgroups:
+            return subgroups[name]
+    return [name]
@@ -0,0 +1,209 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from functools import partial
+from multiprocessing import Pool
+from typing import Tuple, Callable
+
+from glucostats.grid import GlucoseGrid
+from glucostats.store import SignalStore
+from glucostats.utils.transform_units import mmol_to_mgdl
+from glucostats.utils.logs import get_logger
+
+logger = get_logger(__name__)
+
+# Parsed files are appended to a store in chunks of at least this number of samples
+append_samples = 2 ** 20
+
+
+def _parse_arrays(path: str, id_column: str, time_column: str, glucose_column: str, time_format: str,
+                  units: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    columns = [time_column, glucose_column] + ([id_column] if id_column is not None else [])
+    if Path(path).suffix in ['.parquet', '.pq']:
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        dtype = {glucose_column: 'float64'}
+        if id_column is not None:
+            dtype[id_column] = str
+        df = pd.read_csv(path, usecols=columns, dtype=dtype)
+
+    timestamps = pd.to_datetime(df[time_column], format=time_format)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    times = timestamps.to_numpy(dtype='datetime64[ns]')
+    glucose = df[glucose_column].to_numpy(dtype='float64')
+    ids = df[id_column].to_numpy() if id_column is not None else np.full(len(df), Path(path).stem, dtype=object)
+
+    valid = ~np.isnat(times) & ~np.isnan(glucose)
+    if not valid.all():
+        ids, times, glucose = ids[valid], times[valid], glucose[valid]
+    if units == 'auto':
+        units = 'mmol' if len(glucose) > 0 and np.median(glucose) < 30 else 'mgdl'
+    if units == 'mmol':
+        glucose = glucose * mmol_to_mgdl
+    return ids, times, glucose
+
+
+def _arrays_frame(arrays: list) -> pd.DataFrame:
+    if len(arrays) == 0:
+        return pd.DataFrame({'time': np.zeros(0, dtype='datetime64[ns]'), 'glucose': np.zeros(0)},
+                            index=pd.Index([], dtype=object, name='id'))
+    ids, times, glucose = (np.concatenate(column) for column in zip(*arrays))
+    return pd.DataFrame({'time': times, 'glucose': glucose}, index=pd.Index(ids, name='id'))
+
+
+def parse_file(path: str, id_column: str = 'id', time_column: str = 'time', glucose_column: str = 'glucose',
+               time_format: str = None, units: str = 'mgdl', transform: Callable = None) -> pd.DataFrame:
+    """
+    Reads a CSV or Parquet file and builds the signals dataframe expected by ExtractGlucoStats, with 'time' and
+    'glucose' columns and the ids as index. Rows without timestamp or glucose level are discarded, timezone-aware
+    timestamps are converted to UTC and glucose levels are converted to mg/dL. See ingest for the parameters.
+    """
+    df_signals = _arrays_frame([_parse_arrays(path, id_column, time_column, glucose_column, time_format, units)])
+    if transform is not None:
+        df_signals = transform(df_signals)
+    return df_signals
+
+
+def _parse_file_arrays(path: str, transform: Callable = None, **kwargs) -> Tuple[str, tuple or None, str or None]:
+    """
+    Parses a file in a worker and returns its ids, timestamps and glucose levels as arrays (cheaper to send back than a
+    pd.DataFrame), or the error found.
+    """
+    try:
+        if transform is None:
+            return path, _parse_arrays(path, **kwargs), None
+        df_signals = parse_file(path, transform=transform, **kwargs)
+    except Exception as error:
+        return path, None, f'{type(error).__name__}: {error}'
+    return path, (df_signals.index.to_numpy(), df_signals['time'].to_numpy(), df_signals['glucose'].to_numpy()), None
+
+
+def ingest(paths: list, store: SignalStore or str or os.PathLike = None, id_column: str or None = 'id',
+           time_column: str = 'time', glucose_column: str = 'glucose', time_format: str = None, units: str = 'mgdl',
+           transform: Callable = None, n_workers: int = 0,
+           grid: str or pd.Timedelta = None) -> Tuple[pd.DataFrame or SignalStore or GlucoseGrid, pd.DataFrame]:
+    """
+    Parses many CSV or Parquet files (e.g. one export per patient) in a process pool and combines their signals into
+    a single pd.DataFrame or appends them to a SignalStore. Files are parsed by the workers and sent back as arrays,
+    and the columns of all the files are concatenated once at the end (or appended to the store in chunks), instead of
+    concatenating one pd.DataFrame per file. Files that cannot be parsed are reported without aborting the ingestion.
+
+    Parameters
+    ----------
+    paths : list
+        Paths of the CSV or Parquet files.
+
+    store : SignalStore | str | os.PathLike, default None
+        If None, the signals are returned in a pd.DataFrame. If it is a SignalStore or the path of a store, the signals
+        are appended to the store. Files with ids already in the store are reported as errors.
+
+    id_column : str | None, default 'id'
+        Name of the column with the ids of the signals. If None, the name of each file (without extension) is the id of
+        its samples, so the names of the files must be unique.
+
+    time_column : str, default 'time'
+        Name of the column with the timestamps of the samples.
+
+    glucose_column : str, default 'glucose'
+        Name of the column with the glucose levels of the samples.
+
+    time_format : str, default None
+        strftime format of the timestamps. If None, it is inferred.
+
+    units : str, default 'mgdl'
+        Units of the glucose levels of the files: 'mgdl', 'mmol' (converted to mg/dL) or 'auto', which takes a file as
+        mmol/L when the median of its glucose levels is below 30.
+
+    transform : callable, default None
+        Function applied by the workers to the signals of each file, e.g. functools.partial(split_signals_by_day,
+        tz='Europe/Madrid'). Must be picklable if n_workers > 0.
+
+    n_workers : int, default 0
+        Number of processes parsing files. If 0, files are parsed in the main process.
+
+    grid : str | pd.Timedelta, default None
+        If given (e.g. '5min'), the signals are snapped onto a regular grid with this time between slots and returned
+        as a GlucoseGrid (see glucostats.grid). Only allowed if store is None.
+
+    Returns
+    -------
+    signals : pd.DataFrame | SignalStore | GlucoseGrid
+        A pd.DataFrame with the ids of the signals as index and 'time' and 'glucose' columns, the store or the grid.
+
+    errors_report : pd.DataFrame
+        A pd.DataFrame where the index is the path of the files that could not be ingested, with 'stage' and 'error'
+        columns as ExtractGlucoStats.errors_report.
+    """
+    if units not in ['mgdl', 'mmol', 'auto']:
+        raise ValueError('units must be "mgdl", "mmol" or "auto".')
+    if not isinstance(n_workers, int) or n_workers < 0:
+        raise ValueError('n_workers must be positive integer.')
+    if grid is not None and store is not None:
+        raise ValueError('Signals can only be snapped onto a grid if they are not appended to a store.')
+    if store is not None and not isinstance(store, SignalStore):
+        store = SignalStore(store)
+
+    parse = partial(_parse_file_arrays, id_column=id_column, time_column=time_column, glucose_column=glucose_column,
+                    time_format=time_format, units=units, transform=transform)
+    paths = [str(path) for path in paths]
+    if id_column is None:
+        # Files with the same name in different directories would be merged or reported as repeated signals
+        names = pd.Series([Path(path).stem for path in paths])
+        repeated = [path for path, repeated_name in zip(paths, names.duplicated(keep=False)) if repeated_name]
+        if len(repeated) > 0:
+            raise ValueError(f'Files {repeated[:5]} have the same name, which is the id of their signals when '
+                             f'id_column is None.')
+    start = time.time()
+    errors = {}
+    arrays, pending_paths, n_pending = [], [], 0
+
+    def flush():
+        try:
+            store.append(_arrays_frame(arrays))
+        except Exception:
+            # A file of the chunk cannot be appended (e.g. it has wrong or repeated signals), files are appended one by
+            # one to find it
+            for file_path, file_arrays in zip(pending_paths, arrays):
+                try:
+                    store.append(_arrays_frame([file_arrays]))
+                except Exception as error:
+                    errors[file_path] = ['store', f'{type(error).__name__}: {error}']
+        arrays.clear()
+        pending_paths.clear()
+
+    def results():
+        if n_workers > 0:
+            with Pool(n_workers) as pool:
+                yield from pool.imap(parse, paths, chunksize=max(1, len(paths) // (4 * n_workers)))
+        else:
+            yield from map(parse, paths)
+
+    for path, file_arrays, error in results():
+        if error is not None:
+            errors[path] = ['parsing', error]
+            continue
+        arrays.append(file_arrays)
+        pending_paths.append(path)
+        n_pending += len(file_arrays[0])
+        if store is not None and n_pending >= append_samples:
+            flush()
+            n_pending = 0
+
+    if store is not None:
+        if len(arrays) > 0:
+            flush()
+        signals = store
+    else:
+        signals = _arrays_frame(arrays)
+        if grid is not None:
+            signals = GlucoseGrid.from_signals(signals, grid)
+
+    if len(errors) > 0:
+        logger.warning(f'{len(errors)} of {len(paths)} files could not be ingested.')
+    logger.info(f'Ingestion of {len(paths)} files: {time.time() - start:.3f}s.')
+    errors_report = pd.DataFrame.from_dict(errors, orient='index', columns=['stage', 'error']) if len(errors) > 0 \
+        else pd.DataFrame(columns=['stage', 'error'])
+    return signals, errors_report
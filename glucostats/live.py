@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+from glucostats.utils.format_verification import in_range_verification
+from glucostats.stats.time_stats import ranges_labels
+from glucostats.stats.risks_stats import bg_risks, gri_labels, gri_index
+
+live_statistics = ['t_ir', 't_ar', 't_br', 't_or', 'pt_ir', 'pt_ar', 'pt_br', 'pt_or', 'lbgi', 'hbgi', 'bgri', 'mean',
+                   'cv', 'vlow', 'low', 'high', 'vhigh', 'gri']
+
+# Columns of the accumulators array
+N, SUM, SUM_SQ, RISK_L, RISK_H, T_BR, T_IR, T_AR, T_VLOW, T_LOW, T_NORMAL, T_HIGH, T_VHIGH = range(13)
+
+
+class LiveGlucoStats:
+    """
+    Real-time statistics over a rolling time window (24 hours by default) for many patients receiving one glucose
+    reading at a time. For each patient the samples of the window are kept in a fixed-size ring buffer, and rolling
+    accumulators (count, sum, sum of squares, risk sums and time in ranges) are updated in O(1) each time a reading is
+    pushed: the contributions of the new reading are added and the contributions of the readings that leave the window
+    are subtracted. The statistics are computed with the same formulas and range criteria as time_stats, risks_stats
+    and control_stats, so they are equal to the ones computed by ExtractGlucoStats on the samples of the window.
+
+    Statistics available: t_ir, t_ar, t_br, t_or, pt_ir, pt_ar, pt_br, pt_or, lbgi, hbgi, bgri, mean, cv, vlow, low,
+    high, vhigh and gri.
+
+    Parameters
+    ----------
+    window : timedelta, default timedelta(hours=24)
+        Duration of the rolling window. Readings older than the last reading of the patient minus window are
+        discarded.
+
+    capacity : int, default 300
+        Maximum number of readings kept per patient. If the window contains more readings than capacity, the oldest
+        ones are discarded. Must be at least the number of readings expected in the window (288 for a reading every 5
+        minutes in 24 hours).
+
+    in_range_interval : list of int|float, default [70, 180]
+        Interval defining whether glucose levels are within range or not.
+
+    time_units : str, default 'm'
+        Time units of the time in ranges. Can be 'h' (hours), 'm' (minutes) or 's' (seconds).
+    """
+    def __init__(self, window: timedelta = timedelta(hours=24), capacity: int = 300,
+                 in_range_interval: list = [70, 180], time_units: str = 'm'):
+        if not isinstance(window, timedelta):
+            raise TypeError('window must be a timedelta.')
+        if window <= timedelta(0):
+            raise ValueError('window must be a positive timedelta.')
+        if not isinstance(capacity, int) or capacity < 2:
+            raise ValueError('capacity must be an integer greater than 1.')
+        in_range_verification(in_range_interval)
+        if time_units not in ['h', 'm', 's']:
+            raise ValueError("time must be 'h', 'm' or 's'")
+
+        self.window = window.total_seconds()
+        self.capacity = capacity
+        self.in_range_interval = in_range_interval
+        self.time_units = time_units
+
+        self.patients = {}
+        self._times = np.zeros((0, capacity), dtype='float64')
+        self._glucose = np.zeros((0, capacity), dtype='float64')
+        self._time_diffs = np.zeros((0, capacity), dtype='float64')
+        self._heads = np.zeros(0, dtype='int64')
+        self._counts = np.zeros(0, dtype='int64')
+        self._accumulators = np.zeros((0, 13), dtype='float64')
+
+    def _add_patient(self, patient) -> int:
+        row = len(self.patients)
+        if row == len(self._heads):
+            new_size = max(2 * row, 16)
+            self._times = np.resize(self._times, (new_size, self.capacity))
+            self._glucose = np.resize(self._glucose, (new_size, self.capacity))
+            self._time_diffs = np.resize(self._time_diffs, (new_size, self.capacity))
+            self._heads = np.resize(self._heads, new_size)
+            self._counts = np.resize(self._counts, new_size)
+            self._accumulators = np.resize(self._accumulators, (new_size, 13))
+        self._heads[row] = 0
+        self._counts[row] = 0
+        self._accumulators[row] = 0
+        self.patients[patient] = row
+        return row
+
+    def _add_time(self, acc: np.ndarray, glucose: float, time_diff: float, sign: int):
+        acc[T_BR + int(ranges_labels(glucose, self.in_range_interval))] += sign * time_diff
+        acc[T_VLOW + int(gri_labels(glucose))] += sign * time_diff
+
+    def _evict_oldest(self, row: int):
+        acc = self._accumulators[row]
+        head = self._heads[row]
+        glucose, time_diff = self._glucose[row, head], self._time_diffs[row, head]
+        risk_l, risk_h = bg_risks(glucose)
+        acc[N] -= 1
+        acc[SUM] -= glucose
+        acc[SUM_SQ] -= glucose ** 2
+        acc[RISK_L] -= risk_l
+        acc[RISK_H] -= risk_h
+        self._add_time(acc, glucose, time_diff, -1)
+
+        head = (head + 1) % self.capacity
+        self._heads[row] = head
+        self._counts[row] -= 1
+        if self._counts[row] > 0:
+            # The new oldest reading has no previous reading in the window, so its time is not counted
+            self._add_time(acc, self._glucose[row, head], self._time_diffs[row, head], -1)
+            self._time_diffs[row, head] = 0.
+
+    def push(self, patient, timestamp, glucose: int or float) -> dict:
+        """
+        Adds a new reading of a patient and updates the statistics of its rolling window.
+
+        Parameters
+        ----------
+        patient : int | str
+            Identifier of the patient. New patients are added automatically.
+
+        timestamp : datetime | pd.Timestamp | np.datetime64 | int | float
+            Timestamp of the reading, or seconds since epoch. Must be later than the last reading of the patient.
+
+        glucose : int | float
+            Glucose level of the reading in mg/dL.
+
+        Returns
+        -------
+        statistics : dict
+            Statistics of the rolling window of the patient after adding the reading.
+        """
+        if isinstance(timestamp, (int, float)):
+            time = float(timestamp)
+        else:
+            time = pd.Timestamp(timestamp).value / 1e9
+        glucose = float(glucose)
+        if not glucose >= 0:
+            raise ValueError('Glucose levels must be positive values.')
+
+        row = self.patients.get(patient)
+        if row is None:
+            row = self._add_patient(patient)
+        count = self._counts[row]
+
+        time_diff = 0.
+        if count > 0:
+            last_time = self._times[row, (self._heads[row] + count - 1) % self.capacity]
+            if time <= last_time:
+                raise ValueError(f'Readings of patient {patient} must be pushed in chronological order.')
+            time_diff = time - last_time
+            if count == self.capacity:
+                self._evict_oldest(row)
+                count -= 1
+                time_diff = time_diff if count > 0 else 0.
+
+        position = (self._heads[row] + count) % self.capacity
+        self._times[row, position] = time
+        self._glucose[row, position] = glucose
+        self._time_diffs[row, position] = time_diff
+        self._counts[row] += 1
+
+        acc = self._accumulators[row]
+        risk_l, risk_h = bg_risks(glucose)
+        acc[N] += 1
+        acc[SUM] += glucose
+        acc[SUM_SQ] += glucose ** 2
+        acc[RISK_L] += risk_l
+        acc[RISK_H] += risk_h
+        self._add_time(acc, glucose, time_diff, 1)
+
+        while self._times[row, self._heads[row]] <= time - self.window:
+            self._evict_oldest(row)
+
+        return self.statistics(patient)
+
+    def _statistics(self, acc: np.ndarray) -> dict:
+        acc = acc.T
+        time_units = {'h': 3600, 'm': 60, 's': 1}[self.time_units]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_time = acc[T_BR] + acc[T_IR] + acc[T_AR]
+            mean = acc[SUM] / acc[N]
+            std = np.sqrt(np.maximum(acc[SUM_SQ] - acc[N] * mean ** 2, 0) / (acc[N] - 1))
+            stats = {
+                't_ir': acc[T_IR] / time_units,
+                't_ar': acc[T_AR] / time_units,
+                't_br': acc[T_BR] / time_units,
+                't_or': (acc[T_AR] + acc[T_BR]) / time_units,
+                'pt_ir': acc[T_IR] / total_time * 100,
+                'pt_ar': acc[T_AR] / total_time * 100,
+                'pt_br': acc[T_BR] / total_time * 100,
+                'pt_or': (acc[T_AR] + acc[T_BR]) / total_time * 100,
+                'lbgi': acc[RISK_L] / acc[N],
+                'hbgi': acc[RISK_H] / acc[N],
+                'bgri': (acc[RISK_L] + acc[RISK_H]) / acc[N],
+                'mean': mean,
+                'cv': std / mean * 100,
+                'vlow': acc[T_VLOW] / total_time * 100,
+                'low': acc[T_LOW] / total_time * 100,
+                'high': acc[T_HIGH] / total_time * 100,
+                'vhigh': acc[T_VHIGH] / total_time * 100
+            }
+            stats['gri'] = gri_index(stats['vlow'], stats['low'], stats['high'], stats['vhigh'])
+        return stats
+
+    def statistics(self, patient) -> dict:
+        """
+        Returns the statistics of the rolling window of a patient.
+        """
+        if patient not in self.patients:
+            raise KeyError(f'patient {patient} has no readings.')
+        return {stat: float(value) for stat, value in self._statistics(self._accumulators[self.patients[patient]])
+                .items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the statistics of the rolling windows of every patient.
+
+        Returns
+        -------
+        statistics_df : pd.DataFrame
+            A pd.DataFrame where the index is the identifier of the patients and the columns are the statistics.
+        """
+        stats = self._statistics(self._accumulators[:len(self.patients)])
+        return pd.DataFrame(stats, index=list(self.patients.keys()))[live_statistics]
@@ -1,74 +1,344 @@
 import argparse
+import cProfile
+import glob
+import io
+import logging
+import pstats
+import sys
+import time
 import pandas as pd
+from datetime import datetime
+from functools import partial
 from pathlib import Path
+
+from glucostats.datasets.loader import read_glucose_csv
 from glucostats.extract_statistics import ExtractGlucoStats
-from glucostats.visualization.signal_visualization import plot_glucose_time_series
-from glucostats.visualization.heatmaps import plot_interpatient_heatmap, plot_intrapatient_heatmap
-from datetime import date
+from glucostats.results import write_results, read_results
+from glucostats.store import SignalStore
+from glucostats.utils.split_in_days import split_signals_by_period
 
-"""
-          <a href="#">
-            <img src="_images/logo_reduced.png" class="logo" alt="Logo">
-          </a>
-"""
+logger = logging.getLogger(__name__)
 
 
-def parse_arguments(parser):
-    parser.add_argument('--n_cpus', default=0, type=int)
-    parser.add_argument('--batching', default=1, type=int)
+def parse_windowing_param(windowing_method: str, windowing_param: str):
+    """
+    Transform the string given in the command line into the windowing_param expected by ExtractGlucoStats.
 
-    return parser.parse_args()
+    * 'number': an integer, e.g. '4'.
+    * 'static': days, hours, minutes and seconds separated by commas, e.g. '0,6,0,0'.
+    * 'dynamic': window sizes with 'static' format separated by semicolons, e.g. '0,6,0,0;0,12,0,0'.
+    * 'personalized': ISO timestamps separated by commas, e.g. '2015-05-23T06:00,2015-05-23T12:00'.
+    """
+    if windowing_method == 'number':
+        return int(windowing_param)
+    elif windowing_method == 'static':
+        return [int(x) for x in windowing_param.split(',')]
+    elif windowing_method == 'dynamic':
+        return [[int(x) for x in size.split(',')] for size in windowing_param.split(';')]
+    else:
+        return [datetime.fromisoformat(x) for x in windowing_param.split(',')]
 
 
-if __name__ == '__main__':
+def expand_inputs(inputs: list) -> list:
+    """
+    Expand the glob patterns given as inputs. Paths without wildcards are kept even if they do not exist, so reading
+    them raises a meaningful error.
+    """
+    paths = []
+    for pattern in inputs:
+        matches = sorted(glob.glob(pattern))
+        paths += matches if len(matches) > 0 else [pattern]
+    return list(dict.fromkeys(paths))
 
-    args_parser = argparse.ArgumentParser(description='Main for nocturnal hypo')
-    args = parse_arguments(args_parser)
 
-    PATH_PROJECT_DIR = Path(__file__).resolve().parents[1]
-    PATH_PROJECT_DATA = Path.joinpath(PATH_PROJECT_DIR, 'data')
-    PATH_PROJECT_REPORTS_intra = Path.joinpath(PATH_PROJECT_DIR, 'reports','intra')
-    PATH_PROJECT_REPORTS_inter = Path.joinpath(PATH_PROJECT_DIR, 'reports', 'inter')
-    PATH_PROJECT_REPORTS_cgm = Path.joinpath(PATH_PROJECT_DIR, 'reports', 'cgm')
-    PATH_PROJECT_REPORTS_cgm2= Path.joinpath(PATH_PROJECT_DIR, 'reports', 'cgm2')
+def read_signals(paths: list, id_column: str, time_column: str, glucose_column: str,
+                 time_format: str = None, cache: bool = False) -> pd.DataFrame:
+    """
+    Read CSV or Parquet files and build the signals dataframe expected by ExtractGlucoStats, where the index is the
+    unique identifier of the signals and the columns are the timestamps and the glucose levels. If cache is True, CSV
+    files are read through the sidecar cache of read_glucose_csv.
+    """
+    columns = [id_column, time_column, glucose_column]
+    dfs = []
+    for path in paths:
+        if Path(path).suffix in ['.parquet', '.pq']:
+            df = pd.read_parquet(path, columns=columns)
+            df[time_column] = pd.to_datetime(df[time_column], format=time_format)
+            df = df.set_index(id_column)[[time_column, glucose_column]]
+        else:
+            df = read_glucose_csv(path, id_column, time_column, glucose_column, time_format, cache)
+        dfs.append(df)
+    return pd.concat(dfs) if len(dfs) > 1 else dfs[0]
+
+
+def processed_ids(output_dir: Path, output_format: str) -> set:
+    """
+    Ids of the signals whose statistics were already written in output_dir by a previous run.
+    """
+    if output_format == 'dataset':
+        if not (output_dir / 'results').exists():
+            return set()
+        return set(read_results(output_dir / 'results', stats=[])['id'])
+    ids = set()
+    for part in sorted(output_dir.glob(f'stats-*.{output_format}')):
+        if output_format == 'parquet':
+            ids.update(pd.read_parquet(part, columns=[]).index.astype(str))
+        else:
+            ids.update(pd.read_csv(part, usecols=[0], dtype=str).iloc[:, 0])
+    return ids
+
+
+def write_part(df: pd.DataFrame, path: Path, output_format: str):
+    """
+    Write a part file atomically, so an interrupted run never leaves half written parts behind.
+    """
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    if output_format == 'parquet':
+        df.to_parquet(tmp_path)
+    else:
+        df.to_csv(tmp_path, index_label='id')
+    tmp_path.replace(path)
+
+
+def extract(args):
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.time()
+    paths = expand_inputs(args.inputs)
+    from_store = len(paths) == 1 and (Path(paths[0]) / 'meta.json').exists()
+    if from_store:
+        if args.split_by_day or args.split_period is not None:
+            raise ValueError('Signals read from a signal store cannot be split.')
+        df_signals = SignalStore(paths[0])
+    else:
+        df_signals = read_signals(paths, args.id_column, args.time_column, args.glucose_column, args.time_format,
+                                  args.read_cache)
+        if args.split_by_day or args.split_period is not None:
+            df_signals = split_signals_by_period(df_signals, args.split_period or '1D', args.split_start,
+                                                 args.utc_offset, args.tz)
+    logger.info(f'Reading inputs: {time.time() - start:.3f}s.')
+
+    n_part = 0
+    if args.resume:
+        done = processed_ids(output_dir, args.format)
+        if from_store:
+            df_signals = df_signals.batches(args.batch_size, [signal_id for signal_id in df_signals.ids
+                                                              if str(signal_id) not in done])
+        else:
+            df_signals = df_signals[~df_signals.index.astype(str).isin(done)]
+        n_part = max([int(part.stem.split('-')[-1]) + 1 for part in output_dir.glob('*-*.*')], default=0)
+        logger.info(f'Resuming: {len(done)} signals already processed.')
+        if len(df_signals) == 0:
+            return
+    elif any(output_dir.glob('stats-*')) or (output_dir / 'results').exists():
+        raise FileExistsError(f'{output_dir} already contains results. Use --resume to continue a previous run.')
+
+    windowing = args.windowing_method is not None
+    windowing_method = args.windowing_method or 'number'
+    windowing_param = parse_windowing_param(windowing_method, args.windowing_param) if windowing else 4
+
+    stats_extraction = ExtractGlucoStats(args.stats, windowing, windowing_method, windowing_param,
+                                         args.windowing_start, args.windowing_overlap, args.batch_size,
+                                         args.n_workers, args.checkpoint_dir, args.errors, args.compact,
+                                         cache_dir=args.cache_dir, cache_max_size=args.cache_max_size)
+    stats_extraction.configuration(**configuration_arguments(args))
+
+    first_part = n_part
+    split_signals = not from_store and (args.split_by_day or args.split_period is not None)
+    for statistics, time_ranges in stats_extraction.transform_batches(df_signals):
+        if args.format == 'dataset':
+            write_results(statistics, time_ranges, output_dir / 'results', split_signals)
+        else:
+            write_part(statistics, output_dir / f'stats-{n_part:05d}.{args.format}', args.format)
+            write_part(time_ranges, output_dir / f'time_ranges-{n_part:05d}.{args.format}', args.format)
+        n_part += 1
+
+    if not stats_extraction.errors_report.empty:
+        errors_format = 'parquet' if args.format == 'dataset' else args.format
+        write_part(stats_extraction.errors_report, output_dir / f'errors-{first_part:05d}.{errors_format}',
+                   errors_format)
+
 
-    glucose_data_csv = pd.read_csv(Path.joinpath(PATH_PROJECT_DATA, 'glucose_data_in_days.csv'), index_col=0)
-    glucose_data_csv['time'] = pd.to_datetime(glucose_data_csv['time'])
-    glucose_data_csv_filtered = glucose_data_csv.groupby(level=0).filter(lambda x: len(x) > 1)
-    glucose_data_csv_filtered = glucose_data_csv_filtered[glucose_data_csv_filtered.index != '11_2015-08-25']
-    glucose_data_csv_filtered = glucose_data_csv_filtered[glucose_data_csv_filtered.index != '24_2015-08-31']
-    glucose_data_csv_filtered = glucose_data_csv_filtered[glucose_data_csv_filtered.index != '31_2015-05-22']
-    glucose_data_csv_filtered = glucose_data_csv_filtered[glucose_data_csv_filtered.index != '57_2015-07-05']
+def add_configuration_arguments(parser):
+    """
+    Add the configuration parameters of the statistics (see ExtractGlucoStats.configuration) to a subcommand.
+    """
+    parser.add_argument('--in-range-interval', nargs=2, type=float, action='append',
+                        help='Interval of the range, 70 180 by default. Given several times, the statistics '
+                             'depending on the ranges are computed for every interval.')
+    parser.add_argument('--time-units', default='m', choices=['h', 'm', 's'])
+    parser.add_argument('--ddof', default=1, type=int)
+    parser.add_argument('--quartiles', nargs='+', type=float, default=[0.25, 0.5, 0.75])
+    parser.add_argument('--threshold', default=0, type=float)
+    parser.add_argument('--where', default='above', choices=['above', 'below'])
+    parser.add_argument('--a', default=1.1, type=float)
+    parser.add_argument('--b', default=2.0, type=float)
+    parser.add_argument('--c', default=30, type=float)
+    parser.add_argument('--d', default=30, type=float)
+    parser.add_argument('--ideal-bg', default=120, type=float)
+    parser.add_argument('--agp-bin', default=60, type=int)
+    parser.add_argument('--episode-min-duration', default=15, type=float)
+    parser.add_argument('--episode-end-duration', default=15, type=float)
 
-    signals_ids = glucose_data_csv_filtered.index.unique()
-    glucose_data = glucose_data_csv_filtered.loc[signals_ids[0:1000]]
 
-    list_statistics = ['percentage_time_in_ranges', 'distribution', 'grade_stats', 'qgc',
-                       'variability']
+def configuration_arguments(args) -> dict:
+    """
+    Configuration parameters of the statistics given in the command line.
+    """
+    in_range_interval = args.in_range_interval if args.in_range_interval is not None else [[70, 180]]
+    if len(in_range_interval) == 1:
+        in_range_interval = in_range_interval[0]
+    return dict(in_range_interval=in_range_interval, time_units=args.time_units, ddof=args.ddof,
+                quartiles=args.quartiles, threshold=args.threshold, where=args.where, a=args.a, b=args.b, c=args.c,
+                d=args.d, ideal_bg=args.ideal_bg, agp_bin=args.agp_bin,
+                episode_min_duration=args.episode_min_duration, episode_end_duration=args.episode_end_duration)
 
-    batch_size = args.batching
-    n_cpus = args.n_cpus
 
-    windowing = True
-    windowing_method = 'number'
-    windowing_param = 10
-    windowing_start = 'head'
-    windowing_overlap = False
+def serve(args):
+    from glucostats.serve import StatsServer
 
-    stats_extraction = ExtractGlucoStats(list_statistics, windowing, windowing_method, windowing_param,
-                                         windowing_start, windowing_overlap, batch_size, n_cpus)
+    server = StatsServer(args.stats, args.host, args.port, args.n_workers, args.max_batch_signals, args.max_wait_ms,
+                         configuration_arguments(args), args.cache_dir, args.cache_max_size)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
 
-    stats_extraction = stats_extraction.configuration(threshold=100)
-    statistics = stats_extraction.transform(glucose_data)
-    time_ranges = stats_extraction.signals_time_ranges
 
-    PATH_PROJECT_REPORTS_intra = Path.joinpath(PATH_PROJECT_DIR, 'reports', 'intra_mag')
-    plot_intrapatient_heatmap(statistics, time_ranges, '2', 'mean', [date(2015, 5, 23), date(2015, 6, 10)], saving_path = PATH_PROJECT_REPORTS_intra)
+def store(args):
+    from glucostats.ingestion import ingest
 
+    transform = partial(split_signals_by_period, period='1D', tz=args.tz) if args.split_by_day else None
+    signal_store, errors_report = ingest(expand_inputs(args.inputs), args.output,
+                                         None if args.id_from_filename else args.id_column, args.time_column,
+                                         args.glucose_column, args.time_format, args.units, transform, args.n_workers)
+    logger.info(f'Signal store with {len(signal_store)} signals and {signal_store.n_samples} samples.')
+    for path, error in errors_report['error'].items():
+        logger.warning(f'{path}: {error}')
 
 
-    plot_interpatient_heatmap(statistics, time_ranges, ['2', '3', '5', '7'], 'mean', [date(2015, 5, 23), date(2015, 5, 30)], saving_path = PATH_PROJECT_REPORTS_inter)
-    plot_interpatient_heatmap(statistics, time_ranges, ['2', '3', '5', '7'], 'mean',
-                              [date(2015, 5, 23), date(2015, 5, 30)], saving_path=PATH_PROJECT_REPORTS_inter)
-    plot_glucose_time_series(glucose_data, ['2_2015-05-23','3_2015-05-23','5_2015-05-23','7_2015-05-23'], hyper_threshold=180, saving_path=PATH_PROJECT_REPORTS_cgm)
-    plot_glucose_time_series(glucose_data, ['2_2015-05-23'], hyper_threshold=180, saving_path=PATH_PROJECT_REPORTS_cgm2)
+def parse_arguments(parser):
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_extract = subparsers.add_parser('extract', help='Extract statistics from CSV or Parquet files.')
+    parser_extract.add_argument('inputs', nargs='+', help='Input CSV or Parquet files or a signal store directory. '
+                                                          'Glob patterns are expanded.')
+    parser_extract.add_argument('-o', '--output', required=True,
+                                help='Output directory where stats and time ranges are written batch by batch.')
+    parser_extract.add_argument('--format', default='csv', choices=['csv', 'parquet', 'dataset'],
+                                help="With 'dataset', the statistics and time ranges of each signal or window are "
+                                     "written in one row of a Parquet dataset partitioned by patient and date, in "
+                                     "the results directory of the output, which can be read with "
+                                     "glucostats.results.read_results.")
+    parser_extract.add_argument('--stats', nargs='+', required=True,
+                                help='Statistics, subgroups or groups of statistics to extract.')
+    parser_extract.add_argument('--id-column', default='id')
+    parser_extract.add_argument('--time-column', default='time')
+    parser_extract.add_argument('--glucose-column', default='glucose')
+    parser_extract.add_argument('--time-format', default=None, help='strftime format of the timestamps.')
+    parser_extract.add_argument('--read-cache', action='store_true',
+                                help='Save the parsed CSV inputs in binary sidecar files next to them, which are read '
+                                     'instead of the CSV files in later runs while the inputs are not modified.')
+    parser_extract.add_argument('--split-by-day', action='store_true', help='Split signals of patients in days.')
+    parser_extract.add_argument('--split-period', default=None,
+                                help="Split signals of patients in periods of this duration, e.g. '7D' or '12h'.")
+    parser_extract.add_argument('--split-start', default='0h',
+                                help="Start of the split periods from local midnight, e.g. '6h'.")
+    parser_extract.add_argument('--utc-offset', default=None, type=float,
+                                help='Hours added to the timestamps to obtain the local time used to split signals.')
+    parser_extract.add_argument('--tz', default=None,
+                                help="Time zone used to split signals, e.g. 'Europe/Madrid'. Naive timestamps are "
+                                     "assumed to be in UTC.")
+
+    parser_extract.add_argument('--windowing-method', default=None, choices=['number', 'static', 'dynamic',
+                                                                             'personalized'],
+                                help='Enables windowing with the method given.')
+    parser_extract.add_argument('--windowing-param', default='4', help=parse_windowing_param.__doc__)
+    parser_extract.add_argument('--windowing-start', default='tail', choices=['head', 'tail'])
+    parser_extract.add_argument('--windowing-overlap', action='store_true')
+
+    add_configuration_arguments(parser_extract)
+
+    parser_extract.add_argument('--batch-size', default=None, type=int)
+    parser_extract.add_argument('--n-workers', default=0, type=int)
+    parser_extract.add_argument('--errors', default='raise', choices=['raise', 'collect'],
+                                help="With 'collect', signals with wrong format or failing statistics are discarded "
+                                     "and reported in errors files instead of aborting the run.")
+    parser_extract.add_argument('--compact', action='store_true',
+                                help='Store glucose levels as int16 (or float32 if they are not integers) to reduce '
+                                     'memory usage. Statistics are still computed in float64.')
+    parser_extract.add_argument('--checkpoint-dir', default=None,
+                                help='Directory where completed batches are saved, so a rerun only computes the '
+                                     'missing ones.')
+    parser_extract.add_argument('--cache-dir', default=None,
+                                help='Directory of the results cache shared between runs. Signals already computed '
+                                     'with the same configuration are read from it.')
+    parser_extract.add_argument('--cache-max-size', default=None, type=int,
+                                help='Maximum size of the results cache in bytes.')
+    parser_extract.add_argument('--resume', action='store_true',
+                                help='Skip signals already written in the output directory by a previous run.')
+    parser_extract.add_argument('--profile', nargs='?', const='-', default=None,
+                                help='Profile the run with cProfile. Stats are written to the path given or printed '
+                                     'if no path is given. Only the main process is profiled.')
+    parser_extract.set_defaults(func=extract)
+
+    parser_serve = subparsers.add_parser('serve', help='Serve statistics computation over HTTP on localhost.')
+    parser_serve.add_argument('--stats', nargs='+', required=True,
+                              help='Default statistics, subgroups or groups of statistics to compute.')
+    parser_serve.add_argument('--host', default='127.0.0.1')
+    parser_serve.add_argument('--port', default=8000, type=int)
+    parser_serve.add_argument('--n-workers', default=0, type=int)
+    parser_serve.add_argument('--max-batch-signals', default=256, type=int,
+                              help='Maximum number of signals of the micro-batches.')
+    parser_serve.add_argument('--max-wait-ms', default=5, type=float,
+                              help='Maximum time a request waits for other requests to fill its micro-batch.')
+    parser_serve.add_argument('--cache-dir', default=None)
+    parser_serve.add_argument('--cache-max-size', default=None, type=int)
+    add_configuration_arguments(parser_serve)
+    parser_serve.set_defaults(func=serve)
+
+    parser_store = subparsers.add_parser('store', help='Append the signals of CSV or Parquet files to a signal store, '
+                                                       'which can be used as input of extract.')
+    parser_store.add_argument('inputs', nargs='+', help='Input CSV or Parquet files. Glob patterns are expanded.')
+    parser_store.add_argument('-o', '--output', required=True, help='Directory of the signal store.')
+    parser_store.add_argument('--id-column', default='id')
+    parser_store.add_argument('--id-from-filename', action='store_true',
+                              help='Use the name of each file as the id of its samples (one file per patient).')
+    parser_store.add_argument('--time-column', default='time')
+    parser_store.add_argument('--glucose-column', default='glucose')
+    parser_store.add_argument('--time-format', default=None, help='strftime format of the timestamps.')
+    parser_store.add_argument('--units', default='mgdl', choices=['mgdl', 'mmol', 'auto'],
+                              help="Units of the glucose levels of the files, converted to mg/dL. With 'auto', files "
+                                   "whose median glucose level is below 30 are taken as mmol/L.")
+    parser_store.add_argument('--split-by-day', action='store_true', help='Split signals of patients in days.')
+    parser_store.add_argument('--tz', default=None,
+                              help="Time zone used to split signals, e.g. 'Europe/Madrid'. Naive timestamps are "
+                                   "assumed to be in UTC.")
+    parser_store.add_argument('--n-workers', default=0, type=int, help='Number of processes parsing files.')
+    parser_store.set_defaults(func=store)
+
+    return parser.parse_args()
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog='glucostats',
+                                          description='Statistics extraction from continuous glucose monitoring data.')
+    args = parse_arguments(args_parser)
+
+    if getattr(args, 'profile', None) is None:
+        args.func(args)
+        return
+
+    profiler = cProfile.Profile()
+    profiler.runcall(args.func, args)
+    if args.profile == '-':
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(30)
+        sys.stderr.write(output.getvalue())
+    else:
+        profiler.dump_stats(args.profile)
+
+
+if __name__ == '__main__':
+    main()
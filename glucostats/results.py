@@ -0,0 +1,303 @@
+import os
+import uuid
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ImportError('pyarrow must be installed to write and read Parquet results.')
+    return pa, ds
+
+
+def results_table(statistics: pd.DataFrame, signals_time_ranges: pd.DataFrame,
+                  split_signals: bool = False) -> pd.DataFrame:
+    """
+    Combines the statistics and time ranges computed by ExtractGlucoStats in a long table with one row per signal, or
+    per window of a signal when windowing is used, instead of one wide 'stat|window' row per signal.
+
+    Parameters
+    ----------
+    statistics : pd.DataFrame
+        Statistics computed by ExtractGlucoStats (statistics attribute or output of transform).
+
+    signals_time_ranges : pd.DataFrame
+        Start and end timestamps of the signals or windows (signals_time_ranges attribute of ExtractGlucoStats).
+
+    split_signals : bool, default False
+        Whether the ids of the signals were built by split_signals_by_day or split_signals_by_period ('<id>_<period
+        start>'). If True, the patient of each signal is the id before the last '_', otherwise it is the whole id.
+
+    Return
+    ------
+    table : pd.DataFrame
+        A pd.DataFrame with the columns 'id', 'window' (only with windowing), 'start', 'end', 'patient', 'date' (date of
+        start) and the statistics.
+    """
+    windowed = len(statistics.columns) > 0 and statistics.columns.astype(str).str.contains('|', regex=False).all()
+    if windowed:
+        stat_names, windows = zip(*statistics.columns.str.rsplit('|', n=1))
+        wide = statistics.set_axis(pd.MultiIndex.from_arrays([list(stat_names), np.array(windows, dtype='int64')]),
+                                   axis=1)
+        table = wide.stack(level=1, future_stack=True)
+        table.index = table.index.set_names(['id', 'window'])
+        table.columns.name = None
+        ranges_ids = signals_time_ranges.index.str.rsplit('|', n=1)
+        time_ranges = signals_time_ranges.set_axis(pd.MultiIndex.from_arrays(
+            [ranges_ids.str[0], ranges_ids.str[1].astype('int64')], names=['id', 'window']))
+        table.index = table.index.set_levels(table.index.levels[0].astype(str), level=0)
+    else:
+        table = statistics.set_axis(statistics.index.astype(str).rename('id'))
+        time_ranges = signals_time_ranges.set_axis(signals_time_ranges.index.astype(str).rename('id'))
+
+    # Windows that do not exist for a signal (no time range) are dropped
+    table = time_ranges[['start', 'end']].join(table, how='inner').reset_index()
+    ids = table['id'].astype(str)
+    table.insert(table.columns.get_loc('end') + 1, 'patient', ids.str.rsplit('_', n=1).str[0] if split_signals
+                 else ids)
+    table.insert(table.columns.get_loc('patient') + 1, 'date', pd.to_datetime(table['start']).dt.date)
+    return table
+
+
+def write_results(statistics: pd.DataFrame, signals_time_ranges: pd.DataFrame, path: str or os.PathLike,
+                  split_signals: bool = False):
+    """
+    Writes the statistics and time ranges computed by ExtractGlucoStats in a Parquet dataset partitioned by patient
+    and date ('<path>/patient=<patient>/date=<date>/part-*.parquet'), with the format of results_table. Writing to an
+    existing dataset adds new files, so the results of several batches or runs can be written in the same dataset.
+    See results_table for the parameters.
+    """
+    pa, ds = _import_pyarrow()
+    table = pa.Table.from_pandas(results_table(statistics, signals_time_ranges, split_signals), preserve_index=False)
+    ds.write_dataset(table, path, format='parquet', partitioning=_partitioning(),
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+
+
+def _partitioning():
+    pa, ds = _import_pyarrow()
+    return ds.partitioning(pa.schema([('patient', pa.string()), ('date', pa.date32())]), flavor='hive')
+
+
+def read_results(path: str or os.PathLike, patients: list = None, start: date or datetime or str = None,
+                 end: date or datetime or str = None, stats: list = None) -> pd.DataFrame:
+    """
+    Reads the results written by write_results. The filters are pushed down to the dataset: only the files of the
+    patients and dates requested are opened and only the statistics requested are read from them.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        Path of the dataset.
+
+    patients : list, default None
+        Patients to read. If None, all the patients are read.
+
+    start : date | datetime | str, default None
+        First date to read (dates of the starts of the signals or windows). If None, there is no lower bound.
+
+    end : date | datetime | str, default None
+        Last date to read, included. If None, there is no upper bound.
+
+    stats : list, default None
+        Names of the statistics to read. If None, all the statistics are read.
+
+    Return
+    ------
+    table : pd.DataFrame
+        A pd.DataFrame with the format of results_table, sorted by id (and window).
+    """
+    pa, ds = _import_pyarrow()
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning())
+
+    row_filter = None
+    conditions = []
+    if patients is not None:
+        conditions.append(ds.field('patient').isin([str(patient) for patient in patients]))
+    if start is not None:
+        conditions.append(ds.field('date') >= pd.Timestamp(start).date())
+    if end is not None:
+        conditions.append(ds.field('date') <= pd.Timestamp(end).date())
+    for condition in conditions:
+        row_filter = condition if row_filter is None else row_filter & condition
+
+    key_columns = [column for column in ['id', 'window', 'start', 'end', 'patient', 'date']
+                   if column in dataset.schema.names]
+    if stats is not None:
+        missing = set(stats) - set(dataset.schema.names)
+        if len(missing) > 0:
+            raise ValueError(f'Statistics {sorted(missing)} are not in the results.')
+        columns = key_columns + list(stats)
+    else:
+        columns = key_columns + [column for column in dataset.schema.names if column not in key_columns]
+
+    table = dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+    table['date'] = pd.to_datetime(table['date']).dt.date
+    sort_columns = [column for column in ['id', 'window'] if column in table.columns]
+    return table.sort_values(sort_columns, kind='stable').reset_index(drop=True)
+
+
+class ResultsStore:
+    """
+    Local SQLite store of the statistics and time ranges computed by ExtractGlucoStats, with one row per signal or
+    window (see results_table) indexed by id, by (patient, day, window) and by (start, end), so queries like "stat X
+    for patients P between days D1 and D2" are answered with index lookups instead of scanning all the results.
+
+    ExtractGlucoStats writes the results of each batch in the store when it is given as results_store, and the
+    heatmaps of glucostats.visualization.heatmaps can use it as their data source.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        Path of the SQLite database. It is created if it does not exist.
+
+    split_signals : bool, default False
+        Whether the ids of the signals were built by split_signals_by_day or split_signals_by_period. See
+        results_table. Must be True to use the store in the heatmaps.
+    """
+    def __init__(self, path: str or os.PathLike, split_signals: bool = False):
+        import sqlite3
+
+        self.path = path
+        self.split_signals = split_signals
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (id TEXT NOT NULL, "window" INTEGER NOT NULL, '
+                                    'start INTEGER, "end" INTEGER, patient TEXT, day TEXT, PRIMARY KEY (id, "window"))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_patient_day ON results (patient, day, "window")')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_start_end ON results (start, "end")')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)')
+        row = self.connection.execute("SELECT value FROM metadata WHERE key = 'windowed'").fetchone()
+        self.windowed = None if row is None else row[0] == '1'
+
+    def close(self):
+        self.connection.close()
+
+    def __getstate__(self):
+        # The connection cannot be pickled, stores sent to other processes open their own connection
+        return {'path': self.path, 'split_signals': self.split_signals}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['split_signals'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def stats(self) -> list:
+        """
+        Names of the statistics in the store.
+        """
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        return columns[6:]
+
+    def write(self, statistics: pd.DataFrame, signals_time_ranges: pd.DataFrame):
+        """
+        Writes the statistics and time ranges of some signals (e.g. a batch) in the store. Signals or windows already
+        in the store are replaced.
+        """
+        table = results_table(statistics, signals_time_ranges, self.split_signals)
+        if len(table) == 0:
+            return
+        windowed = 'window' in table.columns
+        if self.windowed is not None and windowed != self.windowed:
+            raise ValueError('Results with and without windowing cannot be stored together.')
+        if not windowed:
+            table.insert(1, 'window', -1)
+
+        table['start'] = pd.to_datetime(table['start']).to_numpy(dtype='datetime64[ns]').view('int64')
+        table['end'] = pd.to_datetime(table['end']).to_numpy(dtype='datetime64[ns]').view('int64')
+        table.insert(5, 'day', table.pop('date').astype(str))
+
+        with self.connection:
+            if self.windowed is None:
+                self.windowed = windowed
+                self.connection.execute("INSERT INTO metadata VALUES ('windowed', ?)", ['1' if windowed else '0'])
+            stored_stats = set(self.stats)
+            for stat in table.columns[6:]:
+                if stat not in stored_stats:
+                    self.connection.execute(f'ALTER TABLE results ADD COLUMN "{stat}" REAL')
+            columns = ', '.join(f'"{column}"' for column in table.columns)
+            placeholders = ', '.join('?' * len(table.columns))
+            self.connection.executemany(f'INSERT OR REPLACE INTO results ({columns}) VALUES ({placeholders})',
+                                        table.astype(object).where(table.notna(), None).itertuples(index=False))
+
+    def query(self, stats: list = None, patients: list = None, start: date or datetime or str = None,
+              end: date or datetime or str = None) -> pd.DataFrame:
+        """
+        Reads the statistics of the signals or windows of some patients whose start is between two days.
+
+        Parameters
+        ----------
+        stats : list, default None
+            Names of the statistics to read. If None, all the statistics are read.
+
+        patients : list, default None
+            Patients to read. If None, all the patients are read.
+
+        start : date | datetime | str, default None
+            First day to read. If None, there is no lower bound.
+
+        end : date | datetime | str, default None
+            Last day to read, included. If None, there is no upper bound.
+
+        Return
+        ------
+        table : pd.DataFrame
+            A pd.DataFrame with the format of results_table, sorted by id (and window).
+        """
+        stats = self.stats if stats is None else list(stats)
+        missing = set(stats) - set(self.stats)
+        if len(missing) > 0:
+            raise ValueError(f'Statistics {sorted(missing)} are not in the results store.')
+
+        conditions, parameters = [], []
+        if patients is not None:
+            conditions.append(f'patient IN ({", ".join("?" * len(patients))})')
+            parameters += [str(patient) for patient in patients]
+        if start is not None:
+            conditions.append('day >= ?')
+            parameters.append(str(pd.Timestamp(start).date()))
+        if end is not None:
+            conditions.append('day <= ?')
+            parameters.append(str(pd.Timestamp(end).date()))
+        where = f' WHERE {" AND ".join(conditions)}' if len(conditions) > 0 else ''
+        columns = ', '.join(['id', '"window"', 'start', '"end"', 'patient', 'day'] + [f'"{stat}"' for stat in stats])
+        table = pd.read_sql_query(f'SELECT {columns} FROM results{where} ORDER BY id, "window"', self.connection,
+                                  params=parameters)
+
+        table['start'] = pd.to_datetime(table['start'].astype('int64'))
+        table['end'] = pd.to_datetime(table['end'].astype('int64'))
+        table['day'] = pd.to_datetime(table['day']).dt.date
+        table = table.rename(columns={'day': 'date'})
+        table[stats] = table[stats].astype('float64')
+        if not self.windowed:
+            table = table.drop(columns='window')
+        return table
+
+    def frames(self, stats: list = None, patients: list = None, start: date or datetime or str = None,
+               end: date or datetime or str = None) -> tuple:
+        """
+        Same as query, but the results are returned with the format of the statistics and signals_time_ranges
+        attributes of ExtractGlucoStats ('stat|window' columns and 'id|window' time ranges with windowing).
+        """
+        table = self.query(stats, patients, start, end)
+        stats = [column for column in table.columns if column not in ['id', 'window', 'start', 'end', 'patient',
+                                                                       'date']]
+        if self.windowed:
+            statistics = table.pivot(index='id', columns='window', values=stats)
+            statistics.columns = [f'{stat}|{window}' for stat, window in statistics.columns]
+            time_ranges = table[['start', 'end']].set_axis(table['id'] + '|' + table['window'].astype(str))
+        else:
+            statistics = table.set_index('id')[stats]
+            time_ranges = table.set_index('id')[['start', 'end']]
+        statistics.index.name = None
+        time_ranges.index.name = None
+        return statistics, time_ranges
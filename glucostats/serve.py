@@ -0,0 +1,354 @@
+import io
+import json
+import queue
+import threading
+import time
+import logging
+import numpy as np
+import pandas as pd
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from urllib.parse import urlparse, parse_qs
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.utils.format_verification import list_statistics_verification
+
+logger = logging.getLogger(__name__)
+
+arrow_content_types = ['application/vnd.apache.arrow.stream', 'application/vnd.apache.arrow.file']
+
+
+class _Request:
+    """
+    Signals of a request waiting to be computed in a micro-batch.
+    """
+    def __init__(self, signals: pd.DataFrame, list_statistics: list):
+        self.signals = signals
+        self.list_statistics = list_statistics
+        self.done = threading.Event()
+        self.statistics = None
+        self.errors = None
+        self.exception = None
+
+
+class StatsServer:
+    """
+    Local HTTP service computing statistics of the signals sent in the requests. A pool of workers is created once and
+    kept warm, and the signals of the requests received at the same time are coalesced into micro-batches, so many
+    small requests are computed together by the vectorized statistics instead of one by one.
+
+    Endpoints:
+
+    * POST /stats: computes the statistics of the signals in the body. The body can be JSON,
+      {"signals": [{"id": ..., "timestamps": [...], "glucose": [...]}, ...], "stats": [...]}, where timestamps are ISO
+      strings or seconds since epoch and "stats" is optional, or an Arrow IPC stream with id, time and glucose columns
+      (Content-Type application/vnd.apache.arrow.stream), in which case stats can be given in the query string
+      (/stats?stats=mean,cv). The response is {"statistics": {id: {stat: value}}, "errors": {id: error}}.
+    * GET /metrics: number of requests, signals and micro-batches, throughput and latency percentiles.
+    * GET /health: returns {"status": "ok"}.
+
+    Parameters
+    ----------
+    list_statistics : list
+        Default statistics, subgroups or groups of statistics computed when the requests do not specify them.
+
+    host : str, default '127.0.0.1'
+        Address where the service listens. By default only local connections are accepted.
+
+    port : int, default 8000
+        Port where the service listens. If 0, a free port is chosen (see the port attribute).
+
+    n_workers : int, default 0
+        Number of worker processes. If 0, micro-batches are computed in a thread of the service process.
+
+    max_batch_signals : int, default 256
+        Maximum number of signals of a micro-batch.
+
+    max_wait_ms : float, default 5
+        Maximum time in milliseconds that a request waits for other requests to fill its micro-batch.
+
+    configuration : dict, default None
+        Configuration parameters of the statistics. See ExtractGlucoStats.configuration.
+
+    cache_dir : str, default None
+        Directory of the results cache. See ExtractGlucoStats.
+
+    cache_max_size : int, default None
+        Maximum size of the results cache in bytes. See ExtractGlucoStats.
+    """
+    def __init__(self, list_statistics: list, host: str = '127.0.0.1', port: int = 8000, n_workers: int = 0,
+                 max_batch_signals: int = 256, max_wait_ms: float = 5, configuration: dict = None,
+                 cache_dir: str = None, cache_max_size: int = None):
+        self.list_statistics = list_statistics_verification(list_statistics)
+        if not isinstance(n_workers, int) or n_workers < 0:
+            raise ValueError('n_workers must be positive integer.')
+        if not isinstance(max_batch_signals, int) or max_batch_signals < 1:
+            raise ValueError('max_batch_signals must be an integer greater than or equal to 1.')
+        if max_wait_ms < 0:
+            raise ValueError('max_wait_ms must be a positive number.')
+        self.n_workers = n_workers
+        self.max_batch_signals = max_batch_signals
+        self.max_wait = max_wait_ms / 1000
+        self.configuration = configuration or {}
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+        ExtractGlucoStats(self.list_statistics, cache_dir=cache_dir, cache_max_size=cache_max_size,
+                          errors='collect').configuration(**self.configuration)
+
+        self.pool = Pool(n_workers) if n_workers > 0 else ThreadPool(1)
+        self.queue = queue.Queue()
+        self.metrics_lock = threading.Lock()
+        self.started = time.time()
+        self.latencies = deque(maxlen=10000)
+        self.counters = {'requests': 0, 'signals': 0, 'batches': 0, 'batched_signals': 0, 'errors': 0,
+                         'failed_requests': 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self.serving = False
+        self.closed = False
+        self.host, self.port = self.httpd.server_address[:2]
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def _extraction(self, list_statistics: list) -> ExtractGlucoStats:
+        extraction = ExtractGlucoStats(list_statistics, cache_dir=self.cache_dir, cache_max_size=self.cache_max_size,
+                                       errors='collect')
+        extraction.configuration(**self.configuration)
+        return extraction
+
+    def compute(self, signals: pd.DataFrame, list_statistics: list = None) -> (pd.DataFrame, pd.Series):
+        """
+        Computes the statistics of signals in the next micro-batch and waits for the results.
+
+        Return
+        ------
+        statistics_df, errors : pd.DataFrame, pd.Series
+            Statistics of the signals computed and errors of the signals that failed.
+        """
+        list_statistics = self.list_statistics if list_statistics is None \
+            else list_statistics_verification(list_statistics)
+        if signals.empty:
+            return pd.DataFrame(), pd.Series(dtype=object)
+        request = _Request(signals, list_statistics)
+        self.queue.put(request)
+        request.done.wait()
+        if request.exception is not None:
+            raise request.exception
+        return request.statistics, request.errors
+
+    def _dispatch(self):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            requests = [request]
+            n_signals = request.signals.index.nunique()
+            deadline = time.monotonic() + self.max_wait
+            while n_signals < self.max_batch_signals:
+                try:
+                    request = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                requests.append(request)
+                n_signals += request.signals.index.nunique()
+
+            groups = {}
+            for request in requests:
+                groups.setdefault(tuple(request.list_statistics), []).append(request)
+            for list_statistics, group in groups.items():
+                self._submit(list(list_statistics), group)
+
+    def _submit(self, list_statistics: list, requests: list):
+        # Ids are prefixed with the position of the request in the micro-batch, so equal ids of different requests
+        # do not collide
+        batch = pd.concat([request.signals.set_axis(f'{i}:' + request.signals.index.astype(str))
+                           for i, request in enumerate(requests)])
+        extraction = self._extraction(list_statistics)
+
+        def on_result(results):
+            try:
+                statistics_df, _, errors_report = results
+                statistics_ids = statistics_df.index.astype(str)
+                errors_ids = errors_report.index.astype(str)
+                for i, request in enumerate(requests):
+                    prefix = f'{i}:'
+                    in_request = statistics_ids.str.startswith(prefix)
+                    request.statistics = statistics_df[in_request]
+                    request.statistics.index = statistics_ids[in_request].str[len(prefix):]
+                    in_request = errors_ids.str.startswith(prefix)
+                    request.errors = errors_report['error'][in_request]
+                    request.errors.index = errors_ids[in_request].str[len(prefix):]
+                    request.done.set()
+            except Exception as e:
+                on_error(e)
+            with self.metrics_lock:
+                self.counters['batches'] += 1
+                self.counters['batched_signals'] += batch.index.nunique()
+
+        def on_error(exception):
+            for request in requests:
+                if not request.done.is_set():
+                    request.exception = exception
+                    request.done.set()
+
+        self.pool.apply_async(extraction.batch_computation, (batch,), callback=on_result, error_callback=on_error)
+
+    def record(self, latency: float, n_signals: int, n_errors: int, failed: bool = False):
+        with self.metrics_lock:
+            self.latencies.append(latency)
+            self.counters['requests'] += 1
+            self.counters['signals'] += n_signals
+            self.counters['errors'] += n_errors
+            self.counters['failed_requests'] += failed
+
+    def metrics(self) -> dict:
+        """
+        Returns the throughput and latency metrics of the service.
+        """
+        with self.metrics_lock:
+            counters = dict(self.counters)
+            latencies = np.array(self.latencies) * 1000
+        uptime = time.time() - self.started
+        metrics = {
+            **counters,
+            'uptime_s': uptime,
+            'requests_per_s': counters['requests'] / uptime,
+            'signals_per_s': counters['signals'] / uptime,
+            'mean_batch_signals': counters['batched_signals'] / counters['batches'] if counters['batches'] else None,
+            'queued_requests': self.queue.qsize()
+        }
+        for name, q in [('latency_ms_p50', 50), ('latency_ms_p95', 95), ('latency_ms_p99', 99)]:
+            metrics[name] = float(np.percentile(latencies, q)) if len(latencies) > 0 else None
+        return metrics
+
+    def serve_forever(self):
+        """
+        Serves requests until close is called or the process is interrupted.
+        """
+        logger.info(f'Serving glucostats on http://{self.host}:{self.port}')
+        self.serving = True
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+
+    def start(self) -> 'StatsServer':
+        """
+        Serves requests in a background thread.
+        """
+        self.serving = True
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        """
+        Stops the service and the workers.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.serving:
+            self.httpd.shutdown()
+        self.httpd.server_close()
+        self.queue.put(None)
+        self.dispatcher.join()
+        self.pool.terminate()
+
+
+def read_json_signals(body: bytes) -> (pd.DataFrame, list):
+    """
+    Builds the signals dataframe from a JSON payload. Returns the signals and the statistics requested, or None.
+    """
+    payload = json.loads(body)
+    dfs = []
+    for signal in payload['signals']:
+        timestamps = pd.Series(signal['timestamps'])
+        timestamps = pd.to_datetime(timestamps, unit='s') if pd.api.types.is_numeric_dtype(timestamps) \
+            else pd.to_datetime(timestamps, format='ISO8601')
+        dfs.append(pd.DataFrame({'time': timestamps.to_numpy(),
+                                 'glucose': np.asarray(signal['glucose'], dtype='float64')},
+                                index=[str(signal['id'])] * len(timestamps)))
+    signals = pd.concat(dfs) if len(dfs) > 0 else pd.DataFrame(columns=['time', 'glucose'])
+    return signals, payload.get('stats')
+
+
+def read_arrow_signals(body: bytes) -> pd.DataFrame:
+    """
+    Builds the signals dataframe from an Arrow IPC stream or file with id, time and glucose columns.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError('pyarrow must be installed to receive Arrow payloads.')
+    try:
+        table = pa.ipc.open_stream(io.BytesIO(body)).read_all()
+    except pa.ArrowInvalid:
+        table = pa.ipc.open_file(io.BytesIO(body)).read_all()
+    df = table.to_pandas()
+    df['time'] = pd.to_datetime(df['time'])
+    return df.set_index(df['id'].astype(str))[['time', 'glucose']]
+
+
+def _json_response(statistics_df: pd.DataFrame, errors: pd.Series) -> dict:
+    statistics_df = statistics_df.astype(object).where(statistics_df.notna(), None)
+    return {'statistics': statistics_df.to_dict(orient='index'), 'errors': errors.to_dict()}
+
+
+def _handler(server: StatsServer):
+    class StatsRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, code: int, content: dict):
+            body = json.dumps(content).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/metrics':
+                self._send(200, server.metrics())
+            elif path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': f'{path} not found.'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/stats':
+                self._send(404, {'error': f'{url.path} not found.'})
+                return
+
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            content_type = self.headers.get('Content-Type', 'application/json').split(';')[0].strip()
+            try:
+                if content_type in arrow_content_types:
+                    signals = read_arrow_signals(body)
+                    list_statistics = parse_qs(url.query).get('stats', [None])[0]
+                    list_statistics = list_statistics.split(',') if list_statistics is not None else None
+                else:
+                    signals, list_statistics = read_json_signals(body)
+                statistics_df, errors = server.compute(signals, list_statistics)
+            except (ValueError, TypeError, KeyError) as e:
+                server.record(time.perf_counter() - start, 0, 0, failed=True)
+                self._send(400, {'error': str(e)})
+                return
+            except Exception as e:
+                server.record(time.perf_counter() - start, 0, 0, failed=True)
+                self._send(500, {'error': str(e)})
+                return
+
+            server.record(time.perf_counter() - start, len(statistics_df) + len(errors), len(errors))
+            self._send(200, _json_response(statistics_df, errors))
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return StatsRequestHandler
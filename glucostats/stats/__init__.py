@@ -1,7 +1,9 @@
 __all__ = [
+    'agp_stats',
     'risks_stats',
     'control_stats',
     'observations_stats',
+    'ranges_sweep',
     'descriptive_stats',
     'time_stats',
     'variability_stats'
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from glucostats.utils.format_verification import glucose_data_verification
+
+# Percentiles of the Ambulatory Glucose Profile and the names of their statistics
+agp_percentiles = {'agp_p5': 5, 'agp_p25': 25, 'agp_p50': 50, 'agp_p75': 75, 'agp_p95': 95}
+
+
+def agp_bin_verification(agp_bin):
+    """
+    Verifies that agp_bin is a number of minutes dividing a day.
+    """
+    if not isinstance(agp_bin, int) or isinstance(agp_bin, bool):
+        raise TypeError('agp_bin must be an integer number of minutes.')
+    if agp_bin <= 0 or 1440 % agp_bin != 0:
+        raise ValueError('agp_bin must be a positive number of minutes dividing a day (1440 minutes).')
+
+
+def agp_bins_labels(agp_bin: int = 60) -> list:
+    """
+    Labels of the time of day bins of the AGP, the time of day at which each bin starts ('HH:MM').
+    """
+    return [f'{minute // 60:02d}:{minute % 60:02d}' for minute in range(0, 1440, agp_bin)]
+
+
+def agp_columns(stat: str, agp_bin: int = 60) -> list:
+    """
+    Names of the columns of a statistic of the AGP, one per time of day bin ('<stat>_<HH:MM>').
+    """
+    return [f'{stat}_{label}' for label in agp_bins_labels(agp_bin)]
+
+
+def agp_profiles(codes: np.ndarray, minutes: np.ndarray, glucose: np.ndarray, n_signals: int,
+                 agp_bin: int = 60) -> np.ndarray:
+    """
+    Calculates the percentiles of the AGP of many signals at once. The samples of all the signals are sorted once by
+    signal, time of day bin and glucose level, so the samples of each (signal, bin) are contiguous and sorted, and the
+    percentiles of every (signal, bin) are read at their positions with linear interpolation as np.percentile.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        Integer code between 0 and n_signals - 1 of the signal of each sample.
+
+    minutes : np.ndarray
+        Minute of the day (between 0 and 1439) of each sample.
+
+    glucose : np.ndarray
+        Glucose level of each sample.
+
+    n_signals : int
+        Number of signals.
+
+    agp_bin : int, default 60
+        Width in minutes of the time of day bins.
+
+    Returns
+    -------
+    profiles : np.ndarray
+        Array with shape (n_signals, len(agp_percentiles), number of bins) with the percentiles of each signal and bin,
+        NaN in the bins without samples.
+    """
+    n_bins = 1440 // agp_bin
+    keys = np.asarray(codes, dtype='int64') * n_bins + np.asarray(minutes, dtype='int64') // agp_bin
+    glucose = np.asarray(glucose, dtype='float64')
+    sorted_glucose = glucose[np.lexsort((glucose, keys))]
+    counts = np.bincount(keys, minlength=n_signals * n_bins)
+    offsets = np.cumsum(counts) - counts
+    last = np.maximum(counts - 1, 0)
+
+    profiles = np.full((len(agp_percentiles), n_signals * n_bins), np.nan)
+    has_samples = counts > 0
+    for i, percentile in enumerate(agp_percentiles.values()):
+        position = percentile / 100 * last[has_samples]
+        lower = np.floor(position).astype('int64')
+        upper = np.minimum(lower + 1, last[has_samples])
+        lower_values = sorted_glucose[offsets[has_samples] + lower]
+        upper_values = sorted_glucose[offsets[has_samples] + upper]
+        profiles[i, has_samples] = lower_values + (upper_values - lower_values) * (position - lower)
+    return profiles.reshape(len(agp_percentiles), n_signals, n_bins).transpose(1, 0, 2)
+
+
+def agp(df: pd.DataFrame, agp_bin: int = 60) -> pd.DataFrame:
+    """
+    Calculates the Ambulatory Glucose Profile (AGP) of the signals: the percentiles of the glucose levels of all the
+    days of a signal by time of day, in bins of agp_bin minutes:
+        - 5th percentile (agp_p5).
+        - 25th percentile (agp_p25).
+        - Median (agp_p50).
+        - 75th percentile (agp_p75).
+        - 95th percentile (agp_p95).
+
+    The time of day of the samples is the one of their timestamps (local time if they are time zone aware). The AGP is
+    usually calculated from signals of 14 days, so signals should not be split by day.
+
+    Parameters
+    ----------
+    df : pd.DataFrame MultiIndex
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    agp_bin : int, default 60
+        Width in minutes of the time of day bins. Must divide a day, e.g. 5, 15, 30 or 60.
+
+    Returns
+    -------
+    agp_df : pd.DataFrame
+        A dataframe with ids of samples as index and a column per percentile and bin ('<stat>_<HH:MM>', where HH:MM is
+        the start of the bin), NaN in the bins without samples.
+    """
+    df = glucose_data_verification(df)
+    agp_bin_verification(agp_bin)
+    column_name_timestamps, column_name_glucose = df.columns
+
+    codes, signals_ids = pd.factorize(df.index)
+    timestamps = df[column_name_timestamps].dt
+    minutes = (timestamps.hour * 60 + timestamps.minute).to_numpy()
+    profiles = agp_profiles(codes, minutes, df[column_name_glucose].to_numpy(), len(signals_ids), agp_bin)
+
+    columns = sum([agp_columns(stat, agp_bin) for stat in agp_percentiles], [])
+    return pd.DataFrame(profiles.reshape(len(signals_ids), -1), index=pd.Index(signals_ids, name=df.index.name),
+                        columns=columns)
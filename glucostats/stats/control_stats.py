@@ -3,6 +3,31 @@ import pandas as pd
 from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
 
 
+def control_values(glucose: np.ndarray, in_range_interval: list = [70, 180], a: int or float = 1.1,
+                   b: int or float = 2.0) -> (np.ndarray, np.ndarray):
+    """
+    Calculates the hypoglycemic and hyperglycemic contributions of each glucose level to the hypoglycemic and
+    hyperglycemic indexes: (lower limit - glucose) ** b below range and (glucose - upper limit) ** a above range, 0
+    otherwise.
+    """
+    lltr, ultr = in_range_interval[0], in_range_interval[1]
+    return np.maximum(lltr - glucose, 0) ** b, np.maximum(glucose - ultr, 0) ** a
+
+
+def m_values(glucose: np.ndarray, ideal_bg: int or float = 120) -> np.ndarray:
+    """
+    Calculates the M value of each glucose level, whose mean is used in the calculation of the M value of a signal.
+    """
+    return np.abs(10 * np.log10(glucose / ideal_bg)) ** 3
+
+
+def a1c_from_mean(mean):
+    """
+    Calculates the estimated A1C (eA1C) and the Glucose Management Indicator (gmi) from the mean glucose level.
+    """
+    return (mean + 46.7) / 28.7, 3.31 + 0.02392 * mean
+
+
 def g_control(df: pd.DataFrame, in_range_interval: list = [70, 180], a: int or float = 1.1, b: int or float = 2.0,
               c: int or float = 30, d: int or float = 30) -> pd.DataFrame:
     """
@@ -47,11 +72,10 @@ def g_control(df: pd.DataFrame, in_range_interval: list = [70, 180], a: int or f
     df_copy = df.copy()
     patients_observations = df_copy.groupby(level=0, sort=False)[column_name_glucose].count()
 
-    lltr, ultr = in_range_interval[0], in_range_interval[1]
-    low_values = df_copy[column_name_glucose].apply(
-        lambda x: (lltr - x) ** b if x < lltr else 0).groupby(level=0, sort=False)
-    high_values = df_copy[column_name_glucose].apply(
-        lambda x: (x - ultr) ** a if x > ultr else 0).groupby(level=0, sort=False)
+    low_values, high_values = control_values(df_copy[column_name_glucose].to_numpy(dtype='float64'),
+                                             in_range_interval, a, b)
+    low_values = pd.Series(low_values, index=df_copy.index).groupby(level=0, sort=False)
+    high_values = pd.Series(high_values, index=df_copy.index).groupby(level=0, sort=False)
 
     control_df = pd.DataFrame()
     control_df['hypo_index'] = low_values.sum() / (d * patients_observations)
@@ -85,9 +109,11 @@ def a1c_estimation(df: pd.DataFrame) -> pd.DataFrame:
     df_copy = df.copy()
     signals_mean = df_copy.groupby(level=0, sort=False)[column_name_glucose].mean()
 
+    eA1C, gmi = a1c_from_mean(signals_mean)
+
     a1c_df = pd.DataFrame()
-    a1c_df['gmi'] = 3.31 + 0.02392 * signals_mean
-    a1c_df['eA1C'] = (signals_mean + 46.7) / 28.7
+    a1c_df['gmi'] = gmi
+    a1c_df['eA1C'] = eA1C
 
     return a1c_df
 
@@ -120,9 +146,10 @@ def qgc_index(df: pd.DataFrame, ideal_bg: int or float = 120) -> pd.DataFrame:
     df_copy = df.copy()
     glucose_signals_values = df_copy.groupby(level=0, sort=False)[column_name_glucose]
 
-    m_values = df_copy[column_name_glucose].apply(lambda x: np.abs(10 * np.log10(x / ideal_bg)) ** 3)
+    signals_m_values = pd.Series(m_values(df_copy[column_name_glucose].to_numpy(dtype='float64'), ideal_bg),
+                                 index=df_copy.index)
     max_difference = glucose_signals_values.max() - glucose_signals_values.min()
-    mean_mvalues = m_values.groupby(level=0, sort=False).mean()
+    mean_mvalues = signals_m_values.groupby(level=0, sort=False).mean()
 
     qgc_df = pd.DataFrame()
     qgc_df['m_value'] = mean_mvalues + (max_difference / 20)
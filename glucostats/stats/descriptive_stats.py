@@ -3,6 +3,7 @@ import pandas as pd
 import neurokit2 as nk
 from neurokit2.complexity import fractal_dfa
 from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
+from glucostats.stats.time_stats import ranges_labels
 
 
 def mean_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180]) -> pd.DataFrame:
@@ -36,23 +37,9 @@ def mean_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180]) -> pd.
     df_copy = df.copy()
     glucose_signals = df_copy.groupby(level=0, sort=False)
 
-    if 0 not in in_range_interval:
-        ranges = [0] + in_range_interval
-    else:
-        ranges = in_range_interval
-    ranges = glucose_signals[column_name_glucose].max().apply(
-        lambda x: ranges + [x] if x > ranges[-1] else ranges + [ranges[-1] + 1.])
-    df_copy['ranges'] = glucose_signals.apply(
-        lambda signal: pd.cut(signal[column_name_glucose], bins=ranges.loc[signal.name])).values
-
-    time_ranges = pd.Series(df_copy['ranges'])
-    map_ranges = list(time_ranges.apply(
-        lambda interval:
-        'mean_br' if interval.right <= in_range_interval[0]
-        else 'mean_ar' if interval.left >= in_range_interval[1]
-        else 'mean_ir')
-    )
-    df_copy['ranges'] = map_ranges
+    ranges_names = np.array(['mean_br', 'mean_ir', 'mean_ar'])
+    df_copy['ranges'] = ranges_names[ranges_labels(df_copy[column_name_glucose].to_numpy(dtype='float64'),
+                                                   in_range_interval)]
 
     or_values = df_copy[df_copy['ranges'].isin(['mean_ar', 'mean_br'])]
     mean_or = or_values.groupby(level=0, sort=False)[column_name_glucose].mean()
@@ -163,7 +150,7 @@ def complexity(df: pd.DataFrame, scale='default', overlap: bool = True, integrat
     def try_dfa(x):
         try:
             return fractal_dfa(x, scale=scale, overlap=overlap, integrate=integrate, order=order, show=show)[0]
-        except:
+        except Exception:
             return np.nan
 
     def try_entropy(x, t_delay, dim, tol):
@@ -176,7 +163,7 @@ def complexity(df: pd.DataFrame, scale='default', overlap: bool = True, integrat
                 tol, _ = nk.complexity_tolerance(x, delay=t_delay, dimension=dim)
             entropy, _ = nk.entropy_sample(x, delay=t_delay, dimension=dim, tolerance=tol)
             return entropy
-        except:
+        except Exception:
             return np.nan
 
     complexity_df = pd.DataFrame(index=df_copy.index.unique())
@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
+from glucostats.stats.time_stats import ranges_labels
+
+# Range label (see ranges_labels) of the samples of each type of episode
+episodes_labels = {'hypo': 0, 'hyper': 2}
+
+
+def episodes_params_verification(min_duration, end_duration):
+    """
+    Verifies the minimum duration and the end duration of the episodes.
+    """
+    for param in [min_duration, end_duration]:
+        if not (isinstance(param, int) or isinstance(param, float)) or isinstance(param, bool):
+            raise TypeError('Episodes durations must be int or float minutes.')
+        if param < 0:
+            raise ValueError('Episodes durations must be positive minutes.')
+
+
+def detect_episodes(codes: np.ndarray, times: np.ndarray, labels: np.ndarray, label: int, min_duration: float = 15,
+                    end_duration: float = 15) -> dict:
+    """
+    Detects the episodes of many signals at once with a run-length encoding of the range labels of the samples of all
+    the signals concatenated. Runs of samples in the range of the episode are split at the boundaries between signals,
+    runs separated by less than end_duration minutes out of the range are merged into one episode, and the episodes
+    lasting less than min_duration minutes are discarded.
+
+    The time of each sample is the time elapsed since the previous sample of its signal, as in time_in_ranges, so the
+    duration of an episode goes from the previous sample to its last sample.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        Integer code of the signal of each sample. Samples must be sorted by signal and timestamp.
+
+    times : np.ndarray
+        Timestamps of the samples in seconds.
+
+    labels : np.ndarray
+        Range label of each sample (see ranges_labels).
+
+    label : int
+        Range label of the samples of the episodes, 0 for hypoglycemic episodes and 2 for hyperglycemic episodes.
+
+    min_duration : int | float, default 15
+        Minimum duration of the episodes in minutes.
+
+    end_duration : int | float, default 15
+        Minimum time in minutes out of the range of the episode for it to end.
+
+    Returns
+    -------
+    episodes : dict
+        Arrays with an element per episode: 'code' of its signal, 'start' and 'end' positions of its first and last
+        samples (end included), and 'duration' in seconds.
+    """
+    codes = np.asarray(codes)
+    times = np.asarray(times, dtype='float64')
+    new_signal = np.ones(len(codes), dtype=bool)
+    new_signal[1:] = codes[1:] != codes[:-1]
+    weights = np.where(new_signal, 0., np.diff(times, prepend=times[:1]))
+    in_range = np.asarray(labels) == label
+
+    # Run-length encoding of in_range, with runs split at the boundaries between signals
+    run_starts = np.flatnonzero(new_signal | np.append(True, in_range[1:] != in_range[:-1]))
+    run_ends = np.append(run_starts[1:], len(codes)) - 1
+    cumulative_weights = np.cumsum(weights)
+    runs_durations = cumulative_weights[run_ends] - cumulative_weights[run_starts] + weights[run_starts]
+    runs_in_range = in_range[run_starts]
+
+    # A run in range starts a new episode unless the run before it is a short recovery of the same signal that comes
+    # after another run in range
+    after_short_gap = np.zeros(len(run_starts), dtype=bool)
+    after_short_gap[2:] = ((runs_durations[1:-1] < end_duration * 60) & ~runs_in_range[1:-1]
+                           & (codes[run_starts[2:]] == codes[run_starts[:-2]]))
+    episodes_runs = np.flatnonzero(runs_in_range)
+    is_first_run = ~after_short_gap[episodes_runs]
+    is_last_run = np.append(is_first_run[1:], True)[:len(episodes_runs)]
+
+    starts, ends = run_starts[episodes_runs[is_first_run]], run_ends[episodes_runs[is_last_run]]
+    durations = cumulative_weights[ends] - cumulative_weights[starts] + weights[starts]
+    is_episode = durations >= min_duration * 60
+    return {'code': codes[starts[is_episode]], 'start': starts[is_episode], 'end': ends[is_episode],
+            'duration': durations[is_episode]}
+
+
+def _sorted_signals(df: pd.DataFrame) -> tuple:
+    """
+    Codes, timestamps in seconds and glucose levels of the samples sorted by signal and timestamp, with the order that
+    sorts them and the ids of the signals.
+    """
+    column_name_timestamps, column_name_glucose = df.columns
+    codes, signals_ids = pd.factorize(df.index)
+    times = df[column_name_timestamps].to_numpy(dtype='datetime64[ns]').astype('int64')
+    order = np.lexsort((times, codes))
+    glucose = df[column_name_glucose].to_numpy(dtype='float64')[order]
+    return codes[order], times[order] / 1e9, glucose, order, pd.Index(signals_ids, name=df.index.name)
+
+
+def _episodes_extremes(glucose: np.ndarray, starts: np.ndarray, ends: np.ndarray, ufunc) -> np.ndarray:
+    # Reduction of the glucose levels of the samples of every episode at once
+    if len(starts) == 0:
+        return np.zeros(0)
+    glucose = np.append(glucose, np.nan)
+    return ufunc.reduceat(glucose, np.column_stack([starts, ends + 1]).ravel())[::2]
+
+
+def episodes_table(df: pd.DataFrame, in_range_interval: list = [70, 180], min_duration: int or float = 15,
+                   end_duration: int or float = 15) -> pd.DataFrame:
+    """
+    Detects the hypoglycemic episodes (glucose levels below range, see ranges_labels) and the hyperglycemic episodes
+    (glucose levels above range) of the signals. An episode lasts at least min_duration minutes and ends when the
+    glucose levels are out of the range of the episode for at least end_duration minutes, so shorter recoveries are
+    part of the episode.
+
+    Parameters
+    ----------
+    df : pd.DataFrame MultiIndex
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    in_range_interval : list of int|float, default [70, 180]
+        Interval defining whether glucose levels are within range or not, as in time_in_ranges.
+
+    min_duration : int | float, default 15
+        Minimum duration of the episodes in minutes.
+
+    end_duration : int | float, default 15
+        Minimum time in minutes out of the range of an episode for it to end.
+
+    Returns
+    -------
+    episodes_df : pd.DataFrame
+        A dataframe with an episode per row, the ids of their signals as index and the columns: 'type' ('hypo' or
+        'hyper'), 'start_row' and 'end_row' (positions in df of the first and last samples of the episode), 'start' and
+        'end' (timestamps of those samples), 'duration' (minutes) and 'extreme' (lowest glucose level of hypoglycemic
+        episodes and highest glucose level of hyperglycemic episodes). Episodes are sorted by signal and start.
+    """
+    df = glucose_data_verification(df)
+    in_range_verification(in_range_interval)
+    episodes_params_verification(min_duration, end_duration)
+    codes, times, glucose, order, signals_ids = _sorted_signals(df)
+    labels = ranges_labels(glucose, in_range_interval)
+
+    tables = []
+    for episode_type, label in episodes_labels.items():
+        episodes = detect_episodes(codes, times, labels, label, min_duration, end_duration)
+        extremes = _episodes_extremes(glucose, episodes['start'], episodes['end'],
+                                      np.minimum if episode_type == 'hypo' else np.maximum)
+        tables.append(pd.DataFrame({'code': episodes['code'], 'position': episodes['start'], 'type': episode_type,
+                                    'start_row': order[episodes['start']], 'end_row': order[episodes['end']],
+                                    'duration': episodes['duration'] / 60, 'extreme': extremes}))
+    # Samples are sorted by signal and timestamp, so sorting by the position of their first samples sorts the episodes
+    episodes_df = pd.concat(tables, ignore_index=True).sort_values('position', kind='stable').drop(columns='position')
+    timestamps = df[df.columns[0]]
+    episodes_df.insert(4, 'start', timestamps.iloc[episodes_df['start_row']].to_numpy())
+    episodes_df.insert(5, 'end', timestamps.iloc[episodes_df['end_row']].to_numpy())
+    episodes_df.index = signals_ids[episodes_df.pop('code')]
+    return episodes_df
+
+
+def episodes_statistics(codes: np.ndarray, times: np.ndarray, glucose: np.ndarray, n_signals: int,
+                        in_range_interval: list = [70, 180], time_units: str = 'm', min_duration: int or float = 15,
+                        end_duration: int or float = 15) -> dict:
+    """
+    Calculates the statistics of the episodes of many signals at once from their samples sorted by signal and
+    timestamp (see detect_episodes). Returns a dictionary with an array per statistic with an element per signal.
+    """
+    units = {'h': 3600, 'm': 60, 's': 1}[time_units]
+    labels = ranges_labels(glucose, in_range_interval)
+    stats = {}
+    for episode_type, label in episodes_labels.items():
+        episodes = detect_episodes(codes, times, labels, label, min_duration, end_duration)
+        ufunc = np.minimum if episode_type == 'hypo' else np.maximum
+        n_episodes = np.bincount(episodes['code'], minlength=n_signals)
+        extremes = np.full(n_signals, np.inf if episode_type == 'hypo' else -np.inf)
+        ufunc.at(extremes, episodes['code'], _episodes_extremes(glucose, episodes['start'], episodes['end'], ufunc))
+        extremes[n_episodes == 0] = np.nan
+        stats[f'n_{episode_type}_ep'] = n_episodes.astype('float64')
+        stats[f't_{episode_type}_ep'] = np.bincount(episodes['code'], weights=episodes['duration'],
+                                                    minlength=n_signals) / units
+        stats[f'{"nadir" if episode_type == "hypo" else "peak"}_{episode_type}_ep'] = extremes
+    return stats
+
+
+def glycemic_episodes(df: pd.DataFrame, in_range_interval: list = [70, 180], time_units: str = 'm',
+                      min_duration: int or float = 15, end_duration: int or float = 15) -> pd.DataFrame:
+    """
+    Calculates the statistics of the hypoglycemic and hyperglycemic episodes (see episodes_table):
+        - Number of hypoglycemic episodes (n_hypo_ep).
+        - Time in hypoglycemic episodes (t_hypo_ep).
+        - Lowest glucose level of the hypoglycemic episodes (nadir_hypo_ep).
+        - Number of hyperglycemic episodes (n_hyper_ep).
+        - Time in hyperglycemic episodes (t_hyper_ep).
+        - Highest glucose level of the hyperglycemic episodes (peak_hyper_ep).
+
+    Parameters
+    ----------
+    df : pd.DataFrame MultiIndex
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    in_range_interval : list of int|float, default [70, 180]
+        Interval defining whether glucose levels are within range or not, as in time_in_ranges.
+
+    time_units : str, default 'm'
+        Time units of the time in episodes. Can be 'h' (hours), 'm' (minutes) or 's' (seconds).
+
+    min_duration : int | float, default 15
+        Minimum duration of the episodes in minutes.
+
+    end_duration : int | float, default 15
+        Minimum time in minutes out of the range of an episode for it to end.
+
+    Returns
+    -------
+    episodes_df : pd.DataFrame
+        A dataframe with ids of samples as index and the statistics of the episodes as columns. The nadir and the peak
+        are NaN for signals without episodes.
+    """
+    df = glucose_data_verification(df)
+    in_range_verification(in_range_interval)
+    if time_units not in ['h', 'm', 's']:
+        raise ValueError("time must be 'h', 'm' or 's'")
+    episodes_params_verification(min_duration, end_duration)
+    codes, times, glucose, _, signals_ids = _sorted_signals(df)
+    stats = episodes_statistics(codes, times, glucose, len(signals_ids), in_range_interval, time_units, min_duration,
+                                end_duration)
+    return pd.DataFrame(stats, index=signals_ids)
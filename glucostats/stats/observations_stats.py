@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd
 from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
+from glucostats.stats.time_stats import ranges_labels
 
 
 def observations_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180]) -> pd.DataFrame:
@@ -33,23 +35,9 @@ def observations_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180]
     df_copy = df.copy()
     glucose_signals = df_copy.groupby(level=0, sort=False)
 
-    if 0 not in in_range_interval:
-        ranges = [0] + in_range_interval
-    else:
-        ranges = in_range_interval
-    ranges = glucose_signals[column_name_glucose].max().apply(
-        lambda x: ranges + [x] if x > ranges[-1] else ranges + [ranges[-1] + 1.])
-    df_copy['ranges'] = glucose_signals.apply(
-        lambda signal: pd.cut(signal[column_name_glucose], bins=ranges.loc[signal.name])).values
-
-    time_ranges = pd.Series(df_copy['ranges'])
-    map_ranges = list(time_ranges.apply(
-        lambda interval:
-        'n_br' if interval.right <= in_range_interval[0]
-        else 'n_ar' if interval.left >= in_range_interval[1]
-        else 'n_ir')
-    )
-    df_copy['ranges'] = map_ranges
+    ranges_names = np.array(['n_br', 'n_ir', 'n_ar'])
+    df_copy['ranges'] = ranges_names[ranges_labels(df_copy[column_name_glucose].to_numpy(dtype='float64'),
+                                                   in_range_interval)]
 
     observation_sum = df_copy.groupby([df_copy.index, 'ranges'], sort=False)[column_name_glucose].count()
     observations_in_ranges_df = observation_sum.unstack(level='ranges').fillna(0)
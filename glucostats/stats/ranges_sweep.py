@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
+from glucostats.stats.control_stats import control_values
+
+# Subgroups of statistics that can be computed for several intervals at once, with the names of their statistics
+sweep_subgroups = {
+    'time_in_ranges': ['t_ir', 't_ar', 't_br', 't_or'],
+    'percentage_time_in_ranges': ['pt_ir', 'pt_ar', 'pt_br', 'pt_or'],
+    'observations_in_ranges': ['n_ir', 'n_ar', 'n_br', 'n_or'],
+    'percentage_observations_in_ranges': ['pn_ir', 'pn_ar', 'pn_br', 'pn_or'],
+    'mean_in_ranges': ['mean_ir', 'mean_ar', 'mean_br', 'mean_or'],
+    'control_indexes': ['hyper_index', 'hypo_index', 'igc'],
+}
+
+
+def is_intervals_list(in_range_interval) -> bool:
+    """
+    Whether in_range_interval is a list of intervals (e.g. [[70, 180], [63, 140]]) instead of a single interval.
+    """
+    return isinstance(in_range_interval, list) and len(in_range_interval) > 0 \
+        and all(isinstance(interval, list) for interval in in_range_interval)
+
+
+def intervals_verification(intervals: list) -> list:
+    """
+    Verifies a list of intervals (see in_range_verification) and returns it without repeated intervals.
+    """
+    if not is_intervals_list(intervals):
+        raise TypeError('intervals must be a list of intervals, e.g. [[70, 180], [63, 140]].')
+    for interval in intervals:
+        in_range_verification(interval)
+    return [list(interval) for interval in dict.fromkeys(tuple(interval) for interval in intervals)]
+
+
+def interval_suffix(interval: list) -> str:
+    """
+    Suffix of the names of the statistics of an interval, e.g. '70-180' for [70, 180].
+    """
+    return f'{interval[0]:g}-{interval[1]:g}'
+
+
+def sweep_columns(stat: str, intervals: list) -> list:
+    """
+    Names of the columns of a statistic for each interval ('<stat>_<lower>-<upper>').
+    """
+    return [f'{stat}_{interval_suffix(interval)}' for interval in intervals]
+
+
+class RangesHistogram:
+    """
+    Histogram of the samples of many signals between all the limits of a list of intervals, from which the statistics
+    depending on the ranges are obtained for every interval without going through the samples again.
+
+    The limits of all the intervals are sorted and each sample is assigned once to the bin between two consecutive
+    limits it belongs to (with the same criterion as ranges_labels: a glucose level equal to a limit belongs to the
+    bin below it). The number of samples, their time and the sum of their glucose levels are accumulated by signal and
+    bin, and cumulated along the bins, so the values below, in and above any interval are differences of two columns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    intervals : list
+        List of intervals, each one a list with the lower and upper limits.
+    """
+    def __init__(self, df: pd.DataFrame, intervals: list):
+        column_name_timestamps, column_name_glucose = df.columns
+        self.intervals = intervals
+        self.limits = np.unique(np.asarray(intervals, dtype='float64'))
+
+        codes, signals_ids = pd.factorize(df.index)
+        self.signals_ids = pd.Index(signals_ids, name=df.index.name)
+        self.codes = codes
+        self.glucose = df[column_name_glucose].to_numpy(dtype='float64')
+        n_signals, n_bins = len(signals_ids), len(self.limits) + 1
+
+        # The time of each sample is the time elapsed since the previous row of its signal, as in time_in_ranges
+        order = np.argsort(codes, kind='stable')
+        times = df[column_name_timestamps].to_numpy(dtype='datetime64[ns]').astype('int64')[order]
+        time_diff = np.zeros(len(order))
+        time_diff[1:] = np.where(codes[order][1:] == codes[order][:-1], np.diff(times) / 1e9, 0)
+        self.time_diff = np.empty(len(order))
+        self.time_diff[order] = time_diff
+
+        keys = codes * n_bins + np.searchsorted(self.limits, self.glucose, side='left')
+        histograms = [np.bincount(keys, weights=weights, minlength=n_signals * n_bins).reshape(n_signals, n_bins)
+                      for weights in [None, self.time_diff, self.glucose]]
+        self.counts, self.times, self.sums = [np.cumsum(histogram, axis=1) for histogram in histograms]
+        self.n_signals = n_signals
+
+    def ranges(self, interval: list, cumulated: np.ndarray) -> tuple:
+        """
+        Values below, in and above an interval of a cumulated histogram.
+        """
+        lower, upper = np.searchsorted(self.limits, interval)
+        below, up_to_upper, total = cumulated[:, lower], cumulated[:, upper], cumulated[:, -1]
+        return below, up_to_upper - below, total - up_to_upper
+
+    def statistics(self, subgroups: list, time_units: str = 'm', a: int or float = 1.1, b: int or float = 2.0,
+                   c: int or float = 30, d: int or float = 30) -> pd.DataFrame:
+        """
+        Calculates the statistics of the subgroups given (keys of sweep_subgroups) for every interval.
+
+        Returns
+        -------
+        sweep_df : pd.DataFrame
+            A dataframe with ids of samples as index and a column per statistic and interval ('<stat>_<lower>-<upper>').
+        """
+        units = {'h': 3600, 'm': 60, 's': 1}[time_units]
+        n_observations = self.counts[:, -1]
+        columns = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for interval in self.intervals:
+                suffix = interval_suffix(interval)
+                n_br, n_ir, n_ar = self.ranges(interval, self.counts)
+                t_br, t_ir, t_ar = self.ranges(interval, self.times)
+                stats = {}
+                if 'time_in_ranges' in subgroups:
+                    stats.update({'t_ir': t_ir / units, 't_ar': t_ar / units, 't_br': t_br / units,
+                                  't_or': (t_ar + t_br) / units})
+                if 'percentage_time_in_ranges' in subgroups:
+                    total = t_br + t_ir + t_ar
+                    stats.update({'pt_ir': t_ir / total * 100, 'pt_ar': t_ar / total * 100, 'pt_br': t_br / total * 100,
+                                  'pt_or': (t_ar + t_br) / total * 100})
+                if 'observations_in_ranges' in subgroups:
+                    stats.update({'n_ir': n_ir, 'n_ar': n_ar, 'n_br': n_br, 'n_or': n_ar + n_br})
+                if 'percentage_observations_in_ranges' in subgroups:
+                    stats.update({'pn_ir': n_ir / n_observations * 100, 'pn_ar': n_ar / n_observations * 100,
+                                  'pn_br': n_br / n_observations * 100, 'pn_or': (n_ar + n_br) / n_observations * 100})
+                if 'mean_in_ranges' in subgroups:
+                    sum_br, sum_ir, sum_ar = self.ranges(interval, self.sums)
+                    stats.update({'mean_ir': sum_ir / n_ir, 'mean_ar': sum_ar / n_ar, 'mean_br': sum_br / n_br,
+                                  'mean_or': (sum_ar + sum_br) / (n_ar + n_br)})
+                if 'control_indexes' in subgroups:
+                    # The contributions of the glucose levels depend on the distance to the limits, not only on the bins
+                    low_values, high_values = control_values(self.glucose, interval, a, b)
+                    hypo_index = np.bincount(self.codes, weights=low_values, minlength=self.n_signals) \
+                        / (d * n_observations)
+                    hyper_index = np.bincount(self.codes, weights=high_values, minlength=self.n_signals) \
+                        / (c * n_observations)
+                    stats.update({'hyper_index': hyper_index, 'hypo_index': hypo_index,
+                                  'igc': hypo_index + hyper_index})
+                columns.update({f'{stat}_{suffix}': values for stat, values in stats.items()})
+        return pd.DataFrame(columns, index=self.signals_ids)
+
+
+def ranges_sweep(df: pd.DataFrame, intervals: list, subgroups: list = list(sweep_subgroups), time_units: str = 'm',
+                 a: int or float = 1.1, b: int or float = 2.0, c: int or float = 30,
+                 d: int or float = 30) -> pd.DataFrame:
+    """
+    Calculates the statistics depending on the ranges (time_in_ranges, percentage_time_in_ranges,
+    observations_in_ranges, percentage_observations_in_ranges, mean_in_ranges and control_indexes) for several
+    intervals in one pass over the samples, e.g. to compare targets. The results for each interval are the same as the
+    ones of the functions of each subgroup with that interval.
+
+    Parameters
+    ----------
+    df : pd.DataFrame MultiIndex
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    intervals : list
+        List of intervals, each one a list with the lower and upper limits in mg/dL, e.g. [[70, 180], [63, 140]].
+
+    subgroups : list, default all the subgroups depending on the ranges
+        Subgroups of statistics to calculate.
+
+    time_units : str, default 'm'
+        Time units of the time in ranges. Can be 'h' (hours), 'm' (minutes) or 's' (seconds).
+
+    a, b, c, d : int | float, default 1.1, 2.0, 30, 30
+        Parameters of the glucose control indexes, see g_control.
+
+    Returns
+    -------
+    sweep_df : pd.DataFrame
+        A dataframe with ids of samples as index and a column per statistic and interval ('<stat>_<lower>-<upper>',
+        e.g. 't_ir_70-180').
+    """
+    df = glucose_data_verification(df)
+    intervals = intervals_verification(intervals)
+    unknown_subgroups = set(subgroups) - set(sweep_subgroups)
+    if len(unknown_subgroups) > 0:
+        raise ValueError(f'{sorted(unknown_subgroups)} subgroups do not depend on the ranges.')
+    if time_units not in ['h', 'm', 's']:
+        raise ValueError("time must be 'h', 'm' or 's'")
+    for param in [a, b, c, d]:
+        if not (isinstance(param, int) or isinstance(param, float)):
+            raise ValueError(f'{param} must be an integer or float')
+    return RangesHistogram(df, intervals).statistics(subgroups, time_units, a, b, c, d)
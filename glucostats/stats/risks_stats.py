@@ -2,6 +2,50 @@ import pandas as pd
 import numpy as np
 from glucostats.utils.format_verification import glucose_data_verification
 
+gri_intervals = [54, 70, 180, 250]
+
+
+def bg_risks(glucose: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Calculates the low and high blood glucose risk of each glucose level, whose means are the lbgi and the hbgi.
+
+    Parameters
+    ----------
+    glucose : np.ndarray
+        Glucose levels in mg/dL.
+
+    Returns
+    -------
+    risk_l, risk_h : np.ndarray
+        Low and high blood glucose risks of each glucose level.
+    """
+    risk = ((np.log(glucose) ** 1.084) - 5.381) * 1.509
+    risk_squared = 10 * (risk ** 2)
+    return np.where(risk >= 0, 0, risk_squared), np.where(risk <= 0, 0, risk_squared)
+
+
+def gri_labels(glucose: np.ndarray) -> np.ndarray:
+    """
+    Labels the glucose levels with the glycemia risk range they belong to: 0 very low (glucose <= 54), 1 low
+    (54 < glucose <= 70), 2 normal (70 < glucose <= 180), 3 high (180 < glucose <= 250) and 4 very high
+    (glucose > 250).
+    """
+    return np.searchsorted(np.asarray(gri_intervals, dtype='float64'), glucose, side='left')
+
+
+def gri_index(vlow, low, high, vhigh):
+    """
+    Calculates the glycemia risk index from the percentages of time in very low, low, high and very high glucose.
+    """
+    return np.minimum(3 * vlow + 2.4 * low + 1.6 * high + 0.8 * vhigh, 100)
+
+
+def grade_values(glucose: np.ndarray) -> np.ndarray:
+    """
+    Calculates the GRADE value of each glucose level, whose mean is the grade.
+    """
+    return np.minimum(425 * np.square(np.log10(np.log10(glucose / 18)) + 0.16), 50)
+
 
 def glucose_indexes(df: pd.DataFrame):
     """
@@ -30,9 +74,7 @@ def glucose_indexes(df: pd.DataFrame):
     df_copy = df.copy()
     glucose_signals = df_copy.groupby(level=0, sort=False)
 
-    df_copy['risk'] = df_copy[column_name_glucose].apply(lambda x: ((np.log(x) ** 1.084) - 5.381) * 1.509)
-    df_copy['risk_l'] = df_copy['risk'].apply(lambda x: 0 if x >= 0 else 10 * (x ** 2))
-    df_copy['risk_h'] = df_copy['risk'].apply(lambda x: 0 if x <= 0 else 10 * (x ** 2))
+    df_copy['risk_l'], df_copy['risk_h'] = bg_risks(df_copy[column_name_glucose].to_numpy(dtype='float64'))
 
     gi_df = pd.DataFrame()
     gi_df['lbgi'] = glucose_signals['risk_l'].mean()
@@ -66,34 +108,15 @@ def glycemia_risk(df: pd.DataFrame):
         A dataframe with ids of samples as index and glycemia risks as columns.
     """
     df = glucose_data_verification(df)
-    intervals = [54, 70, 180, 250]
     column_name_timestamps, column_name_glucose = df.columns
 
     df_copy = df.copy()
     glucose_signals = df_copy.groupby(level=0, sort=False)
 
-    if 0 not in intervals:
-        ranges = [0] + intervals
-    else:
-        ranges = intervals
-    ranges = glucose_signals[column_name_glucose].max().apply(
-        lambda x: ranges + [x] if x > ranges[-1] else ranges + [ranges[-1] + 1.])
-    df_copy['ranges'] = glucose_signals.apply(
-        lambda signal: pd.cut(signal[column_name_glucose], bins=ranges.loc[signal.name])).values
-
-    time_ranges = pd.Series(df_copy['ranges'])
-    map_ranges = list(time_ranges.apply(
-        lambda interval:
-        'vlow' if interval.right <= 54 else
-        'low' if 54 < interval.right <= 70 else
-        'normal' if 70 < interval.right <= 180 else
-        'high' if 180 < interval.right <= 250 else
-        'vhigh')
-    )
-    df_copy['ranges'] = map_ranges
-
-    df_copy['time_diff'] = glucose_signals.apply(
-            lambda signal: signal['time'].diff().dt.total_seconds()).values
+    ranges_names = np.array(['vlow', 'low', 'normal', 'high', 'vhigh'])
+    df_copy['ranges'] = ranges_names[gri_labels(df_copy[column_name_glucose].to_numpy(dtype='float64'))]
+
+    df_copy['time_diff'] = glucose_signals[column_name_timestamps].diff().dt.total_seconds()
 
     total_time = glucose_signals['time_diff'].sum()
     df_copy = df_copy[df_copy['ranges'] != 'normal']
@@ -105,8 +128,7 @@ def glycemia_risk(df: pd.DataFrame):
         if stat not in gr_df.columns:
             gr_df[stat] = [0] * len(gr_df)
 
-    gr_df['gri'] = 3 * gr_df['vlow'] + 2.4 * gr_df['low'] + 1.6 * gr_df['high'] + 0.8 * gr_df['vhigh']
-    gr_df['gri'] = gr_df['gri'].apply(lambda x: 100 if x > 100 else x)
+    gr_df['gri'] = gri_index(gr_df['vlow'], gr_df['low'], gr_df['high'], gr_df['vhigh'])
 
     return gr_df
 
@@ -137,13 +159,14 @@ def grade(df: pd.DataFrame) -> pd.DataFrame:
 
     df_copy = df.copy()
 
-    grade_values = df_copy[column_name_glucose].apply(
-        lambda x: np.minimum(425 * np.square(np.log10(np.log10(x/18)) + 0.16), 50))
-    grade_hypo = grade_values[df_copy[column_name_glucose]/18 < 3.9]
-    grade_hyper = grade_values[df_copy[column_name_glucose]/18 > 7.8]
-    grade_eu = grade_values[(3.9 <= (df_copy[column_name_glucose] / 18)) & ((df_copy[column_name_glucose] / 18) <= 7.8)]
+    signals_grade_values = pd.Series(grade_values(df_copy[column_name_glucose].to_numpy(dtype='float64')),
+                                     index=df_copy.index)
+    grade_hypo = signals_grade_values[df_copy[column_name_glucose]/18 < 3.9]
+    grade_hyper = signals_grade_values[df_copy[column_name_glucose]/18 > 7.8]
+    grade_eu = signals_grade_values[(3.9 <= (df_copy[column_name_glucose] / 18)) &
+                                    ((df_copy[column_name_glucose] / 18) <= 7.8)]
 
-    patients_grades = grade_values.groupby(level=0, sort=False)
+    patients_grades = signals_grade_values.groupby(level=0, sort=False)
     patients_grades_hypo = grade_hypo.groupby(level=0, sort=False)
     patients_grades_hyper = grade_hyper.groupby(level=0, sort=False)
     patients_grades_eu = grade_eu.groupby(level=0, sort=False)
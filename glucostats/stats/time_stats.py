@@ -1,7 +1,30 @@
+import numpy as np
 import pandas as pd
 from glucostats.utils.format_verification import glucose_data_verification, in_range_verification
 
 
+def ranges_labels(glucose: np.ndarray, in_range_interval: list = [70, 180]) -> np.ndarray:
+    """
+    Labels the glucose levels with the range they belong to: 0 if below range (glucose <= lower limit), 1 if in range
+    and 2 if above range (glucose > upper limit). These are the ranges used by every statistic dependent of the ranges.
+
+    Parameters
+    ----------
+    glucose : np.ndarray
+        Glucose levels in mg/dL.
+
+    in_range_interval : list of int|float, default [70, 180]
+        Interval defining whether glucose levels are within range or not. The parameter must be a list with the lower
+        and upper limit, default is [70, 180] in mg/dL.
+
+    Returns
+    -------
+    labels : np.ndarray
+        Array of integers with the same shape as glucose with the range of each glucose level.
+    """
+    return np.searchsorted(np.asarray(in_range_interval, dtype='float64'), glucose, side='left')
+
+
 def time_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180], time_units: str = 'm') -> pd.DataFrame:
     """
     Calculates the time for specific ranges:
@@ -38,26 +61,11 @@ def time_in_ranges(df: pd.DataFrame, in_range_interval: list = [70, 180], time_u
     df_copy = df.copy()
     glucose_signals = df_copy.groupby(level=0, sort=False)
 
-    if 0 not in in_range_interval:
-        ranges = [0] + in_range_interval
-    else:
-        ranges = in_range_interval
-    ranges = glucose_signals[column_name_glucose].max().apply(
-        lambda x: ranges + [x] if x > ranges[-1] else ranges + [ranges[-1] + 1.])
-    df_copy['ranges'] = glucose_signals.apply(
-        lambda signal: pd.cut(signal[column_name_glucose], bins=ranges.loc[signal.name])).values
-
-    time_ranges = pd.Series(df_copy['ranges'])
-    map_ranges = list(time_ranges.apply(
-        lambda interval:
-        't_br' if interval.right <= in_range_interval[0]
-        else 't_ar' if interval.left >= in_range_interval[1]
-        else 't_ir')
-    )
-    df_copy['ranges'] = map_ranges
-
-    df_copy['time_diff'] = glucose_signals.apply(
-            lambda signal: signal[column_name_timestamps].diff().dt.total_seconds()).values
+    ranges_names = np.array(['t_br', 't_ir', 't_ar'])
+    df_copy['ranges'] = ranges_names[ranges_labels(df_copy[column_name_glucose].to_numpy(dtype='float64'),
+                                                   in_range_interval)]
+
+    df_copy['time_diff'] = glucose_signals[column_name_timestamps].diff().dt.total_seconds()
     if time_units == 'h':
         df_copy['time_diff'] = df_copy['time_diff'] / 3600
     elif time_units == 'm':
@@ -0,0 +1,279 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Tuple
+
+from glucostats.utils.format_verification import glucose_data_verification
+
+
+def _write_atomic(path: Path, write):
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _append_bytes(path: Path, data: bytes, size: int):
+    # Data written by an interrupted append (after the last committed size) is overwritten
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+        f.seek(0, os.SEEK_END)
+        f.write(data)
+
+
+def _append_array(path: Path, array: np.ndarray, n_items: int):
+    _append_bytes(path, array.tobytes(), n_items * array.itemsize)
+
+
+class StoreBatch:
+    """
+    Batch of signals of a SignalStore. It only contains the path of the store and the positions and ids of the signals,
+    so it is cheap to send to other processes, and the samples are read from the memory-mapped arrays when it is loaded.
+    """
+    def __init__(self, path: Path, columns: list, index_name, positions: np.ndarray, starts: np.ndarray,
+                 ends: np.ndarray, ids: list = None):
+        self.path = path
+        self.columns = columns
+        self.index_name = index_name
+        self.positions = positions
+        self.starts = starts
+        self.ends = ends
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.positions)
+
+    def load(self) -> pd.DataFrame:
+        """
+        Returns the signals of the batch with the format expected by ExtractGlucoStats, where the index contains the
+        positions of the signals in the store as int32 codes, and the ids of the signals are in its attrs ('id_labels')
+        as in the batches of ExtractGlucoStats. The timestamps and glucose levels are read-only views of the
+        memory-mapped arrays when the signals of the batch are contiguous in the store.
+        """
+        times = np.memmap(self.path / 'timestamps.bin', dtype='int64', mode='r')
+        glucose = np.memmap(self.path / 'glucose.bin', dtype='float64', mode='r')
+        if np.all(self.starts[1:] == self.ends[:-1]):
+            times, glucose = times[self.starts[0]:self.ends[-1]], glucose[self.starts[0]:self.ends[-1]]
+        else:
+            times = np.concatenate([times[start:end] for start, end in zip(self.starts, self.ends)])
+            glucose = np.concatenate([glucose[start:end] for start, end in zip(self.starts, self.ends)])
+        codes = np.repeat(self.positions.astype('int32'), self.ends - self.starts)
+        column_name_timestamps, column_name_glucose = self.columns
+        batch = pd.DataFrame({column_name_timestamps: times.view('datetime64[ns]'), column_name_glucose: glucose},
+                             index=pd.Index(codes, name=self.index_name), copy=False)
+        if self.ids is not None:
+            batch.attrs['id_labels'] = pd.Index(self.ids, name=self.index_name)
+        return batch
+
+
+class StoreBatches:
+    """
+    Sequence of the batches of a SignalStore, built when each batch is accessed.
+    """
+    def __init__(self, store, positions: np.ndarray, batch_size: int = None):
+        self.store = store
+        self.positions = positions
+        self.batch_size = batch_size if batch_size is not None else max(len(positions), 1)
+
+    def __len__(self):
+        return -(-len(self.positions) // self.batch_size)
+
+    def __getitem__(self, i: int) -> StoreBatch:
+        if not 0 <= i < len(self):
+            raise IndexError('batch index out of range')
+        positions = self.positions[i * self.batch_size:(i + 1) * self.batch_size]
+        return StoreBatch(self.store.path, self.store.columns, self.store.index_name, positions,
+                          self.store.offsets[positions], self.store.offsets[positions + 1],
+                          [self.store.ids[position] for position in positions])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class SignalStore:
+    """
+    On-disk store of glucose signals for cohorts larger than memory. The timestamps and glucose levels of all the
+    signals are kept in two contiguous arrays on disk, which are memory-mapped, with the samples of each signal stored
+    together in chronological order. An offsets array and a dictionary from ids to positions give the samples of any
+    signal in O(1) without reading the others.
+
+    The store is a directory with the files:
+
+    * timestamps.bin: int64 timestamps in nanoseconds since epoch.
+    * glucose.bin: float64 glucose levels.
+    * offsets.bin: int64 offsets, where the samples of the i-th signal are in [offsets[i], offsets[i + 1]).
+    * ids.jsonl: ids of the signals, one JSON value per line.
+    * meta.json: number of signals, size of ids.jsonl and names of the columns and the index.
+
+    New signals are appended at the end of the files and committed by replacing meta.json, which has a fixed size, so
+    appending does not rewrite the signals already stored and the signals of an interrupted append are discarded. A
+    store can be passed directly to ExtractGlucoStats.transform, transform_batches and atransform instead of a
+    pd.DataFrame: the batches are read from the memory-mapped arrays without loading the whole cohort.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        Directory of the store. If it does not exist, an empty store is created.
+    """
+    def __init__(self, path: str or os.PathLike):
+        self.path = Path(path)
+        if not (self.path / 'meta.json').exists():
+            self.path.mkdir(parents=True, exist_ok=True)
+            for name in ['timestamps.bin', 'glucose.bin', 'ids.jsonl']:
+                (self.path / name).touch()
+            _write_atomic(self.path / 'offsets.bin', lambda f: np.zeros(1, dtype='int64').tofile(f))
+            self._commit({'n_signals': 0, 'ids_size': 0, 'columns': None, 'index_name': None})
+
+        with open(self.path / 'meta.json') as f:
+            meta = json.load(f)
+        n_signals, self._ids_size = meta['n_signals'], meta['ids_size']
+        self.columns = meta['columns']
+        self.index_name = meta['index_name']
+        with open(self.path / 'ids.jsonl', 'rb') as f:
+            self.ids = [json.loads(line) for line in f.read(self._ids_size).splitlines()]
+        self._offsets = np.fromfile(self.path / 'offsets.bin', dtype='int64', count=n_signals + 1)
+        self.offsets = self._offsets
+
+        # The ids, offsets and samples written by an append interrupted before meta.json was committed are discarded
+        sizes = {'ids.jsonl': self._ids_size, 'offsets.bin': (n_signals + 1) * 8,
+                 'timestamps.bin': self.n_samples * 8, 'glucose.bin': self.n_samples * 8}
+        for name, size in sizes.items():
+            if (self.path / name).stat().st_size > size:
+                os.truncate(self.path / name, size)
+        self.positions = {signal_id: i for i, signal_id in enumerate(self.ids)}
+        self._open()
+
+    def _commit(self, meta: dict):
+        # The files are appended before meta.json is replaced, and new signals are only visible once it is written
+        _write_atomic(self.path / 'meta.json', lambda f: f.write(json.dumps(meta).encode()))
+
+    def _open(self):
+        n_samples = int(self.offsets[-1])
+        if n_samples == 0:
+            self._times, self._glucose = np.zeros(0, dtype='int64'), np.zeros(0, dtype='float64')
+        else:
+            self._times = np.memmap(self.path / 'timestamps.bin', dtype='int64', mode='r', shape=(n_samples,))
+            self._glucose = np.memmap(self.path / 'glucose.bin', dtype='float64', mode='r', shape=(n_samples,))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, signal_id):
+        return signal_id in self.positions
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def labels(self) -> pd.Index:
+        """
+        Ids of the signals, in the order they are stored.
+        """
+        return pd.Index(self.ids, name=self.index_name)
+
+    def append(self, df_signals: pd.DataFrame):
+        """
+        Appends new signals to the store. Samples are sorted by timestamp within each signal.
+
+        Parameters
+        ----------
+        df_signals : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a
+            string, and it has two columns: the first column must contain the timestamps in datetime format of the
+            samples and the second column must contain the glucose levels in mg/dL of the samples. Timestamps must be
+            timezone-naive and the ids must not be in the store already.
+        """
+        df_signals = glucose_data_verification(df_signals, min_samples=1)
+        column_name_timestamps, column_name_glucose = df_signals.columns
+        if df_signals[column_name_timestamps].dt.tz is not None:
+            raise ValueError('SignalStore only supports timezone-naive timestamps.')
+        if self.columns is not None and [column_name_timestamps, column_name_glucose] != self.columns:
+            raise ValueError(f'df_signals columns must be {self.columns}.')
+
+        codes, labels = pd.factorize(df_signals.index)
+        labels = [label.item() if isinstance(label, np.generic) else label for label in labels]
+        repeated = [label for label in labels if label in self.positions]
+        if len(repeated) > 0:
+            raise ValueError(f'Signals {repeated[:5]} are already in the store.')
+
+        times = df_signals[column_name_timestamps].to_numpy(dtype='datetime64[ns]').view('int64')
+        order = np.lexsort((times, codes))
+        lengths = np.bincount(codes, minlength=len(labels))
+
+        n_samples, n_signals = self.n_samples, len(self.ids)
+        _append_array(self.path / 'timestamps.bin', times[order], n_samples)
+        _append_array(self.path / 'glucose.bin', df_signals[column_name_glucose].to_numpy(dtype='float64')[order],
+                      n_samples)
+        new_offsets = n_samples + np.cumsum(lengths)
+        _append_array(self.path / 'offsets.bin', new_offsets, n_signals + 1)
+        new_ids = ''.join(json.dumps(label) + '\n' for label in labels).encode()
+        _append_bytes(self.path / 'ids.jsonl', new_ids, self._ids_size)
+
+        meta = {'n_signals': n_signals + len(labels), 'ids_size': self._ids_size + len(new_ids),
+                'columns': [column_name_timestamps, column_name_glucose],
+                'index_name': df_signals.index.name if self.index_name is None else self.index_name}
+        self._commit(meta)
+
+        if len(self._offsets) < n_signals + 1 + len(labels):
+            # The offsets are kept in a buffer with spare capacity, so appends do not copy them
+            self._offsets = np.resize(self._offsets, max(2 * len(self._offsets), n_signals + 1 + len(labels)))
+        self._offsets[n_signals + 1:n_signals + 1 + len(labels)] = new_offsets
+        self.offsets = self._offsets[:n_signals + 1 + len(labels)]
+        self.positions.update({label: n_signals + i for i, label in enumerate(labels)})
+        self.ids.extend(labels)
+        self._ids_size = meta['ids_size']
+        self.columns, self.index_name = meta['columns'], meta['index_name']
+        self._open()
+
+    def signal(self, signal_id) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the timestamps (datetime64[ns]) and glucose levels of a signal as read-only views of the memory-mapped
+        arrays.
+        """
+        position = self.positions[signal_id]
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self._times[start:end].view('datetime64[ns]'), self._glucose[start:end]
+
+    def __getitem__(self, signal_id) -> pd.DataFrame:
+        times, glucose = self.signal(signal_id)
+        column_name_timestamps, column_name_glucose = self.columns
+        return pd.DataFrame({column_name_timestamps: times, column_name_glucose: glucose},
+                            index=pd.Index([signal_id] * len(times), name=self.index_name))
+
+    def _select_positions(self, ids: list = None) -> np.ndarray:
+        if ids is None:
+            return np.arange(len(self.ids))
+        return np.sort([self.positions[signal_id] for signal_id in ids]).astype('int64')
+
+    def batches(self, batch_size: int = None, ids: list = None) -> StoreBatches:
+        """
+        Divides the signals of the store in batches of batch_size signals, in the order they are stored.
+
+        Parameters
+        ----------
+        batch_size : int, default None
+            Number of signals per batch. If None, all the signals are in one batch.
+
+        ids : list, default None
+            Ids of the signals to include. If None, all the signals of the store are included.
+
+        Return
+        ------
+        batches : StoreBatches
+            A sequence of StoreBatch, whose load method returns the signals of the batch as a pd.DataFrame.
+        """
+        return StoreBatches(self, self._select_positions(ids), batch_size)
+
+    def to_frame(self, ids: list = None) -> pd.DataFrame:
+        """
+        Loads the signals of the store (or only the ones in ids) in a pd.DataFrame with the original ids as index.
+        """
+        positions = self._select_positions(ids)
+        if len(positions) == 0:
+            return pd.DataFrame(columns=self.columns, index=pd.Index([], name=self.index_name))
+        df_signals = self.batches(ids=ids)[0].load()
+        df_signals.attrs.pop('id_labels')
+        return df_signals.set_axis(self.labels.take(df_signals.index.to_numpy())).copy()
@@ -1,7 +1,12 @@
 __all__ = [
     'batching',
+    'caching',
+    'checkpointing',
+    'compacting',
     'constants',
+    'downsampling',
     'format_verification',
+    'logs',
     'transform_units',
     'windowing'
 ]
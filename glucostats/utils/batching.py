@@ -3,27 +3,9 @@ import pandas as pd
 from tqdm import tqdm
 from typing import List
 from glucostats.utils.format_verification import glucose_data_verification
+from glucostats.utils.logs import get_logger
 
-import logging
-from colorlog import ColoredFormatter
-
-logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-
-formatter = ColoredFormatter(
-    "%(log_color)s%(levelname)s:%(reset)s %(message)s",
-    log_colors={
-        "DEBUG": "cyan",
-        "INFO": "green",
-        "WARNING": "yellow",
-        "ERROR": "red",
-        "CRITICAL": "bold_red",
-    },
-)
-
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
+logger = get_logger(__name__)
 
 
 def extract_batches(df_signals: pd.DataFrame, signals_ids: list or np.array):
@@ -80,10 +62,18 @@ def batching(df_signals: pd.DataFrame, batch_size: int = None) -> List[pd.DataFr
 
     batches = []
     if batch_size is not None:
-        unique_ids = df_signals.index.unique()
-        batches_indexes = np.array_split(unique_ids, np.ceil(len(unique_ids) / batch_size))
-        batches = [extract_batches(df_signals, idx_batch)
-                   for idx_batch in tqdm(batches_indexes, desc="Batching", unit="batches", ncols=80)]
+        # Samples are sorted by signal (in order of appearance) once, so every batch is a slice of positions instead
+        # of a lookup of its ids in the index
+        codes, unique_ids = pd.factorize(df_signals.index)
+        order = np.argsort(codes, kind='stable')
+        signals_ends = np.cumsum(np.bincount(codes, minlength=len(unique_ids)))
+        batches_sizes = [len(idx_batch) for idx_batch in np.array_split(np.arange(len(unique_ids)),
+                                                                         np.ceil(len(unique_ids) / batch_size))]
+        batches_ends = signals_ends[np.cumsum(batches_sizes) - 1]
+        batches_starts = np.concatenate([[0], batches_ends[:-1]])
+        batches = [df_signals.iloc[order[start:end]]
+                   for start, end in tqdm(zip(batches_starts, batches_ends), total=len(batches_ends), desc="Batching",
+                                          unit="batches", ncols=80)]
         logger.info(f'Number of batches: {len(batches)}.')
     else:
         batches.append(df_signals)
@@ -0,0 +1,156 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import functools
+import pandas as pd
+from pathlib import Path
+from glucostats.utils.checkpointing import samples_hashes
+
+
+def max_size_verification(max_size):
+    """
+    Verifies the maximum size in bytes of a results cache.
+    """
+    if (not isinstance(max_size, int) or isinstance(max_size, bool)) and max_size is not None:
+        raise TypeError('cache_max_size must be an integer or None. If None, the cache is not bounded.')
+    if isinstance(max_size, int) and max_size < 1:
+        raise ValueError('cache_max_size must be greater than or equal to 1.')
+
+
+class ResultsCache:
+    """
+    Content-addressed on-disk cache for the statistics of single signals. The key of a signal is a hash of its
+    timestamps and glucose levels together with the parameters that affect its statistics, so the same signal computed
+    with the same configuration is read from disk instead of being computed again, whatever its id and the dtypes of its
+    samples are.
+
+    Entries are written to a temporary file and renamed, so several processes (e.g. the workers of the pool) can write
+    to the same cache concurrently. When max_size is given, the least recently used entries are removed once the size
+    of the cache exceeds it. The size of the cache is read from disk once and then updated with the entries written by
+    this instance, so the entries are only listed again when the size exceeds max_size. Entries written by other
+    processes are counted at that point, so the cache may exceed max_size until one of the processes evicts.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory where the cache entries are stored. It is created if it does not exist.
+
+    max_size : int, default None
+        Maximum size of the cache in bytes. If None, the cache is not bounded.
+    """
+    def __init__(self, cache_dir: str, max_size: int = None):
+        max_size_verification(max_size)
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        # Size in bytes of the entries, None until it is read from disk
+        self.size = None
+
+    def signals_keys(self, df_signals: pd.DataFrame, parameters: dict) -> pd.Series:
+        """
+        Calculates the key of every signal of df_signals.
+
+        Parameters
+        ----------
+        df_signals : pd.DataFrame
+            A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a
+            string, and it has two columns: the first column must contain the timestamps in datetime format of the
+            samples and the second column must contain the glucose levels in mg/dL of the samples.
+
+        parameters : dict
+            Parameters that affect the statistics of the signals.
+
+        Return
+        ------
+        keys : pd.Series
+            A pd.Series where the index is the unique identifier of the signals and the values are their keys.
+        """
+        hashes = samples_hashes(df_signals)
+        parameters_hash = json.dumps(parameters, sort_keys=True, default=str).encode()
+
+        keys = {}
+        for signal_id, positions in df_signals.groupby(level=0, sort=False).indices.items():
+            hasher = hashlib.blake2b(parameters_hash, digest_size=16)
+            hasher.update(hashes[positions].tobytes())
+            keys[signal_id] = hasher.hexdigest()
+        return pd.Series(keys, dtype=object)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.pkl'
+
+    def get(self, key: str):
+        """
+        Returns the entry stored with key, or None if there is no such entry. Reading an entry marks it as recently
+        used.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def put(self, key: str, entry):
+        """
+        Stores entry with key. The entry is written to a temporary file which is then renamed, so readers never see
+        partially written entries.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{key}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            entry_size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if self.size is not None:
+            self.size += entry_size
+
+    def _entries(self) -> list:
+        # Last access time, size and path of every entry. Entries removed by other processes are ignored
+        entries = []
+        for path in self.cache_dir.glob('*/*.pkl'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the size of the cache is below max_size. The entries are only
+        listed when the size of the cache known by this instance exceeds max_size.
+        """
+        if self.max_size is None or not self.cache_dir.exists():
+            return
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        if self.size <= self.max_size:
+            return
+
+        entries = self._entries()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+
+@functools.lru_cache(maxsize=None)
+def open_cache(cache_dir: str, max_size: int = None) -> ResultsCache:
+    """
+    Returns the ResultsCache of cache_dir of this process, so the size of the cache is tracked across batches instead of
+    being read from disk for every batch.
+    """
+    return ResultsCache(cache_dir, max_size)
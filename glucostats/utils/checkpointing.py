@@ -0,0 +1,86 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Tuple
+
+
+def samples_hashes(df_signals: pd.DataFrame) -> np.ndarray:
+    """
+    Hash of every sample (timestamp and glucose level) of df_signals. Timestamps are hashed as datetime64[ns] and
+    glucose levels as float64, so the hashes do not depend on the dtypes used to store them (e.g. compact glucose
+    levels, see compact_signals).
+    """
+    column_name_timestamps, column_name_glucose = df_signals.columns
+    timestamps = df_signals[column_name_timestamps]
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+    samples = pd.DataFrame({column_name_timestamps: timestamps.dt.as_unit('ns').to_numpy(),
+                            column_name_glucose: df_signals[column_name_glucose].to_numpy(dtype='float64')})
+    return pd.util.hash_pandas_object(samples, index=False).to_numpy()
+
+
+def batch_key(batch: pd.DataFrame, parameters: dict, ids: pd.Index or np.ndarray = None) -> str:
+    """
+    Calculates the key identifying the results of a batch. The key depends on the contents of the batch (signals ids,
+    timestamps and glucose levels, whatever their dtypes, see samples_hashes) and on the parameters used to compute the
+    statistics, so any change in the data or in the configuration produces a different key.
+
+    Parameters
+    ----------
+    batch : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    parameters : dict
+        Parameters that affect the results: statistics, windowing parameters and statistics configuration.
+
+    ids : pd.Index | np.ndarray, default None
+        Ids of the signals of the samples of the batch, used instead of the index of the batch (e.g. the original
+        labels of a batch whose index contains encoded ids). If None, the index of the batch is used.
+
+    Return
+    ------
+    key : str
+        Hexadecimal digest identifying the batch and the parameters.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    ids = batch.index if ids is None else pd.Index(ids)
+    hasher.update(pd.util.hash_pandas_object(ids, index=False).values.tobytes())
+    hasher.update(samples_hashes(batch).tobytes())
+    hasher.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+def load_checkpoint(checkpoint_dir: str, key: str) -> Tuple[pd.DataFrame, ...] or None:
+    """
+    Load the results (statistics, time ranges and errors) of a completed batch. Returns None if the batch has not been
+    completed yet.
+    """
+    path = Path(checkpoint_dir) / f'{key}.pkl'
+    if not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_checkpoint(checkpoint_dir: str, key: str, results: Tuple[pd.DataFrame, ...]):
+    """
+    Persist the results (statistics, time ranges and errors) of a completed batch. The results are written to a
+    temporary file which is then renamed, so a crash while writing never leaves a corrupted checkpoint behind.
+    """
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=checkpoint_dir, prefix=f'.{key}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, checkpoint_dir / f'{key}.pkl')
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from glucostats.utils.format_verification import glucose_data_verification
+
+
+def compact_signals(df_signals: pd.DataFrame, rows: np.ndarray = None) -> pd.DataFrame:
+    """
+    Reduces the memory used by df_signals. Glucose levels are stored as int16 when all of them are integers between 0
+    and 32767 (CGM values in mg/dL), which is lossless, and as float32 otherwise (e.g. values in mmol/L), with a
+    relative error lower than 6e-8. Timestamps stored as python objects are converted to datetime64.
+
+    The glucose levels are cast before selecting the rows, so the float64 glucose levels of df_signals are never copied.
+
+    Parameters
+    ----------
+    df_signals : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    rows : np.ndarray, default None
+        Boolean mask of the rows of df_signals to keep, e.g. the samples of the signals with correct format (see
+        signals_quality_check). If None, all the rows are kept and df_signals is verified.
+
+    Return
+    ------
+    compact_df : pd.DataFrame
+        A pd.DataFrame with the same format and values as df_signals (or its rows selected), with compact dtypes.
+    """
+    if rows is None:
+        df_signals = glucose_data_verification(df_signals, min_samples=1)
+    column_name_timestamps, column_name_glucose = df_signals.columns
+    index, timestamps = df_signals.index, df_signals[column_name_timestamps]
+    glucose = df_signals[column_name_glucose].to_numpy()
+    if rows is not None:
+        index, timestamps = index[rows], timestamps[rows]
+        if glucose.dtype == object:
+            # Rows discarded may contain non numeric values
+            glucose, rows = glucose[rows], None
+    if glucose.dtype == object:
+        glucose = glucose.astype('float64')
+
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+
+    # Values that are not integers or out of the range of int16 change when they are cast
+    with np.errstate(invalid='ignore'):
+        compact_glucose = glucose.astype('int16')
+    is_exact = compact_glucose == glucose
+    if not (is_exact if rows is None else is_exact[rows]).all():
+        compact_glucose = glucose.astype('float32')
+    if rows is not None:
+        compact_glucose = compact_glucose[rows]
+
+    return pd.DataFrame({column_name_timestamps: timestamps.to_numpy(), column_name_glucose: compact_glucose},
+                        index=index, copy=False)
+
+
+def expand_signals(df_signals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inverse of compact_signals: converts compact glucose levels to float64, so the statistics are always computed in
+    double precision (e.g. squares of int16 values do not overflow). df_signals is returned unchanged if its glucose
+    levels are already float64.
+    """
+    column_name_timestamps, column_name_glucose = df_signals.columns
+    if df_signals[column_name_glucose].dtype in ['int16', 'float32']:
+        df_signals = df_signals.astype({column_name_glucose: 'float64'})
+    return df_signals
@@ -26,6 +26,12 @@ available_statistics = {
     'variability_stats': {
         'excursions': ['mage', 'ef'],
         'variability': ['dt', 'mag', 'gvp', 'cv']
+    },
+    'agp_stats': {
+        'agp': ['agp_p5', 'agp_p25', 'agp_p50', 'agp_p75', 'agp_p95']
+    },
+    'episodes_stats': {
+        'episodes': ['n_hypo_ep', 't_hypo_ep', 'nadir_hypo_ep', 'n_hyper_ep', 't_hyper_ep', 'peak_hyper_ep']
     }
 }
 
@@ -34,22 +40,53 @@ groups = ['time_stats',
           'descriptive_stats',
           'risks_stats',
           'control_stats',
-          'variability_stats']
+          'variability_stats',
+          'episodes_stats']
+
+# Groups of statistics only computed when requested by name, they are not part of the default groups
+optional_groups = ['agp_stats']
 
 subgroups = ['time_in_ranges', 'percentage_time_in_ranges',
              'observations_in_ranges', 'percentage_observations_in_ranges',
              'mean_in_ranges', 'distribution', 'complexity', 'auc',
              'g_indexes', 'g_risks', 'grade_stats',
              'control_indexes', 'a1c', 'qgc',
-             'excursions', 'variability']
+             'excursions', 'variability', 'agp', 'episodes']
 
 statistics = ['t_ir', 't_ar', 't_br', 't_or', 'pt_ir', 'pt_ar', 'pt_br', 'pt_or',
               'n_ir', 'n_ar', 'n_br', 'n_or', 'pn_ir', 'pn_ar', 'pn_br', 'pn_or',
               'mean_ir', 'mean_ar', 'mean_br', 'mean_or', 'max', 'min', 'max_diff', 'mean', 'std', 'quartiles', 'iqr', 'entropy', 'dfa', 'auc',
               'lbgi', 'max_lbgi', 'hbgi', 'max_hbgi', 'bgri', 'vlow', 'low', 'high', 'vhigh', 'gri', 'grade', 'grade_hypo', 'grade_eu', 'grade_hyper',
               'hyper_index', 'hypo_index', 'igc', 'eA1C', 'gmi', 'm_value', 'j_index',
-              'mage', 'ef', 'dt', 'mag', 'gvp', 'cv']
+              'mage', 'ef', 'dt', 'mag', 'gvp', 'cv', 'agp_p5', 'agp_p25', 'agp_p50', 'agp_p75', 'agp_p95',
+              'n_hypo_ep', 't_hypo_ep', 'nadir_hypo_ep', 'n_hyper_ep', 't_hyper_ep', 'peak_hyper_ep']
 
-possible_names = groups + subgroups + statistics
+possible_names = groups + optional_groups + subgroups + statistics
+
+non_decomposable_statistics = ['quartiles', 'iqr', 'entropy', 'dfa', 'mage', 'ef', 'agp_p5', 'agp_p25', 'agp_p50',
+                               'agp_p75', 'agp_p95', 'n_hypo_ep', 't_hypo_ep', 'nadir_hypo_ep', 'n_hyper_ep',
+                               't_hyper_ep', 'peak_hyper_ep']
+decomposable_statistics = [stat for stat in statistics if stat not in non_decomposable_statistics]
+
+subgroups_configuration = {
+    'time_in_ranges': ['in_range_interval', 'time_units'],
+    'percentage_time_in_ranges': ['in_range_interval'],
+    'observations_in_ranges': ['in_range_interval'],
+    'percentage_observations_in_ranges': ['in_range_interval'],
+    'mean_in_ranges': ['in_range_interval'],
+    'distribution': ['ddof', 'quartiles'],
+    'complexity': [],
+    'auc': ['threshold', 'where'],
+    'g_indexes': [],
+    'g_risks': [],
+    'grade_stats': [],
+    'control_indexes': ['in_range_interval', 'a', 'b', 'c', 'd'],
+    'a1c': [],
+    'qgc': ['ideal_bg'],
+    'excursions': [],
+    'variability': [],
+    'agp': ['agp_bin'],
+    'episodes': ['in_range_interval', 'time_units', 'episode_min_duration', 'episode_end_duration']
+}
 
 windowing_methods = ['number', 'static', 'dynamic', 'personalized']
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def minmax_downsampling(x: np.ndarray, y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Selects the samples to plot of a signal with the min/max envelope: the x range is divided in n_buckets buckets of
+    the same width (e.g. one per pixel) and the samples with the minimum and the maximum y of each bucket are kept, so
+    every excursion (e.g. hypoglycemia and hyperglycemia peaks) is preserved. The first and last samples are also kept.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted x values of the samples (e.g. timestamps as int64).
+
+    y : np.ndarray
+        y values of the samples.
+
+    n_buckets : int
+        Number of buckets. At most 2 * n_buckets + 2 samples are selected.
+
+    Return
+    ------
+    indices : np.ndarray
+        Sorted indices of the samples selected.
+    """
+    if len(x) <= 2 * n_buckets:
+        return np.arange(len(x))
+    x = np.asarray(x, dtype='float64')
+    span = x[-1] - x[0]
+    buckets = np.minimum(((x - x[0]) / span * n_buckets).astype('int64'), n_buckets - 1) if span > 0 \
+        else np.zeros(len(x), dtype='int64')
+
+    order = np.lexsort((y, buckets))
+    boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+    firsts = np.concatenate([[0], boundaries])
+    lasts = np.concatenate([boundaries - 1, [len(x) - 1]])
+    return np.unique(np.concatenate([[0, len(x) - 1], order[firsts], order[lasts]]))
+
+
+def lttb_downsampling(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Selects the samples to plot of a signal with the largest-triangle-three-buckets algorithm: the first and last
+    samples are kept and, in each of n_out - 2 buckets with the same number of samples, the sample forming the largest
+    triangle with the sample selected in the previous bucket and the mean of the next bucket is kept.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted x values of the samples (e.g. timestamps as int64).
+
+    y : np.ndarray
+        y values of the samples.
+
+    n_out : int
+        Number of samples selected, at least 3.
+
+    Return
+    ------
+    indices : np.ndarray
+        Sorted indices of the samples selected.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype('int64') + 1
+    edges[-1] = n - 1
+    indices = np.zeros(n_out, dtype='int64')
+    indices[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket < n_out - 3:
+            next_x, next_y = x[end:edges[bucket + 2]].mean(), y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        # Twice the area of the triangles formed with the previous selected sample and the mean of the next bucket
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
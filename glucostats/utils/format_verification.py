@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import glucostats.utils.constants as constants
 from typing import List
@@ -35,7 +36,7 @@ def list_statistics_verification(list_statistics: list) -> List:
 
     list_statistics_ordered = []
 
-    groups_selected = list(set(list_statistics) & set(constants.groups))
+    groups_selected = list(set(list_statistics) & set(constants.available_statistics))
     for group in groups_selected:
         del_subgroups = constants.available_statistics[group].keys()
         del_stats = sum(constants.available_statistics[group].values(), [])
@@ -56,7 +57,55 @@ def list_statistics_verification(list_statistics: list) -> List:
     return list_statistics_ordered
 
 
-def glucose_data_verification(df_signals: pd.DataFrame) -> pd.DataFrame:
+def _index_verification(df_signals: pd.DataFrame):
+    """
+    Verifies the structure of df_signals: one index level with integer or string ids and two columns.
+    """
+    if not isinstance(df_signals, pd.DataFrame):
+        raise TypeError('df_signals must be a multi-indexed dataframe.')
+
+    if df_signals.index.nlevels != 1:
+        raise ValueError('df_signals must have only one index level with signals ids.')
+    index = df_signals.index
+    if isinstance(index, pd.CategoricalIndex):
+        index = index.categories
+    if index.inferred_type not in ['integer', 'string', 'mixed-integer', 'empty']:
+        if not all(map(lambda x: isinstance(x, int) or isinstance(x, str), index)):
+            raise TypeError('Index must be integers or strings.')
+
+    if df_signals.shape[1] != 2:
+        raise ValueError('df_signals must have two columns: timestamps and glucose levels.')
+
+
+def _samples_verification(df_signals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Verifies every sample of df_signals. Returns a boolean pd.DataFrame with the same index as df_signals where each
+    column indicates the samples that do not fulfil one of the requirements of the samples. Columns are checked
+    vectorized when dtypes allow it, falling back to checking the type of each sample for object columns.
+    """
+    column_name_timestamps, column_name_glucose = df_signals.columns
+    timestamps = df_signals[column_name_timestamps]
+    glucose = df_signals[column_name_glucose]
+
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        non_datetime = np.zeros(len(df_signals), dtype=bool)
+    else:
+        non_datetime = ~np.fromiter(map(lambda x: isinstance(x, datetime), timestamps), dtype=bool,
+                                    count=len(df_signals))
+
+    if pd.api.types.is_numeric_dtype(glucose) and not pd.api.types.is_bool_dtype(glucose):
+        non_numeric = np.zeros(len(df_signals), dtype=bool)
+        non_positive = ~(glucose.to_numpy() >= 0)
+    else:
+        non_numeric = ~np.fromiter(map(lambda x: isinstance(x, float) or isinstance(x, int), glucose), dtype=bool,
+                                   count=len(df_signals))
+        non_positive = ~(pd.to_numeric(glucose.where(~non_numeric), errors='coerce').to_numpy() >= 0) & ~non_numeric
+
+    return pd.DataFrame({'non_datetime': non_datetime, 'non_numeric': non_numeric, 'non_positive': non_positive},
+                        index=df_signals.index)
+
+
+def glucose_data_verification(df_signals: pd.DataFrame, min_samples: int = 2) -> pd.DataFrame:
     """
     Function for verifying if df_signals has the correct format.
 
@@ -67,40 +116,69 @@ def glucose_data_verification(df_signals: pd.DataFrame) -> pd.DataFrame:
         it has two columns: the first column must contain the timestamps in datetime format of the samples and the
         second column must contain the glucose levels in mg/dL of the samples.
 
+    min_samples : int, default 2
+        Minimum number of samples of each signal.
+
     RETURN
     ------
     df_signals : pd.DataFrame
         Only return df_signals if it has the correct format.
     """
+    _index_verification(df_signals)
+    wrong_samples = _samples_verification(df_signals)
 
-    if not isinstance(df_signals, pd.DataFrame):
-        raise TypeError('df_signals must be a multi-indexed dataframe.')
-
-    if df_signals.index.nlevels != 1:
-        raise ValueError('df_signals must have only one index level with signals ids.')
-    if not all(map(lambda x: isinstance(x, int) or isinstance(x, str), df_signals.index)):
-        raise TypeError('Index must be integers or strings.')
-
-    if df_signals.shape[1] != 2:
-        raise ValueError('df_signals must have two columns: timestamps and glucose levels.')
-    column_name_timestamps, column_name_glucose = df_signals.columns
-
-    if not (all(map(lambda x: isinstance(x, datetime), df_signals[column_name_timestamps]))):
+    if wrong_samples['non_datetime'].any():
         raise ValueError('First column corresponding to timestamps contain non datetime type values.')
 
-    signals_len = df_signals.groupby(level=0).apply(len)
-    if len(signals_len[signals_len <= 1]) > 0:
-        raise ValueError(f'Glucose signals must have more than one sample. {list(signals_len[signals_len <= 1].index)} '
-                         f'signals have only one or no samples.')
+    signals_len = df_signals.groupby(level=0, sort=False, observed=True).size()
+    if len(signals_len[signals_len < min_samples]) > 0:
+        raise ValueError(f'Glucose signals must have at least {min_samples} samples. '
+                         f'{list(signals_len[signals_len < min_samples].index)} signals have fewer samples.')
 
-    if not all(map(lambda x: (isinstance(x, float) or isinstance(x, int)), df_signals[column_name_glucose])):
+    if wrong_samples['non_numeric'].any():
         raise TypeError('Glucose levels must be integers or float values.')
-    if not all(map(lambda x: x >= 0, df_signals[column_name_glucose])):
+    if wrong_samples['non_positive'].any():
         raise ValueError('Glucose levels must be positive values.')
 
     return df_signals
 
 
+def signals_quality_check(df_signals: pd.DataFrame) -> pd.Series:
+    """
+    Function for finding the signals of df_signals that do not have the correct format, without raising errors for
+    them. The structure of df_signals (index and columns) is still verified and errors are raised if it is not correct,
+    as it affects every signal. All the checks are vectorized, so the whole dataset is checked at once.
+
+    PARAMS
+    ------
+    df_signals : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    RETURN
+    ------
+    signals_errors : pd.Series
+        A pd.Series where the index is the unique identifier of the signals with wrong format and the values are the
+        description of the error. Empty if all signals have the correct format.
+    """
+    _index_verification(df_signals)
+    wrong_signals = _samples_verification(df_signals).groupby(level=0, sort=False, observed=True).any()
+    wrong_signals['one_sample'] = df_signals.groupby(level=0, sort=False, observed=True).size() <= 1
+
+    messages = {
+        'non_datetime': 'Timestamps contain non datetime type values.',
+        'one_sample': 'Glucose signal must have more than one sample.',
+        'non_numeric': 'Glucose levels must be integers or float values.',
+        'non_positive': 'Glucose levels must be positive values.'
+    }
+    signals_errors = pd.Series(index=wrong_signals.index, dtype=object)
+    for check in reversed(messages.keys()):
+        signals_errors[wrong_signals[check]] = messages[check]
+
+    return signals_errors.dropna()
+
+
 def windows_params_verification(windowing: bool = False, windowing_method: str = 'number', windowing_param=4,
                                 windowing_start: str = 'tail', windowing_overlap: bool = False):
     """
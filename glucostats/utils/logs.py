@@ -0,0 +1,35 @@
+import logging
+from colorlog import ColoredFormatter
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the logger of a glucostats module, which writes colored messages of level INFO or higher to stderr. The
+    handler is only added the first time, so modules sharing a logger or imported again do not repeat the messages.
+
+    Parameters
+    ----------
+    name : str
+        Name of the logger, usually the __name__ of the module.
+
+    Return
+    ------
+    logger : logging.Logger
+        Logger with the colored handler.
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(ColoredFormatter(
+            "%(log_color)s%(levelname)s:%(reset)s %(message)s",
+            log_colors={
+                "DEBUG": "cyan",
+                "INFO": "green",
+                "WARNING": "yellow",
+                "ERROR": "red",
+                "CRITICAL": "bold_red",
+            },
+        ))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
@@ -1,14 +1,101 @@
 import pandas as pd
+from datetime import timedelta
 from glucostats.utils.format_verification import glucose_data_verification
 
+# Periods are counted from a Monday at midnight, so weekly periods start on Mondays
+periods_origin = pd.Timestamp('1969-12-29').value
+day_ns = pd.Timedelta(days=1).value
 
-def split_signals_by_day(df):
+
+def split_signals_by_period(df: pd.DataFrame, period: str or timedelta = '1D', start: str or timedelta = '0h',
+                            utc_offset: int or float or timedelta = None, tz: str = None) -> pd.DataFrame:
+    """
+    Splits the signals in calendar periods (days, weeks, nights...). Each sample is assigned to a period from its
+    timestamp with integer arithmetic and the signal of each patient and period gets its own id, '<id>_<period start>'.
+    The input df is not modified and the timestamps and glucose levels are not copied.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals which must be an integer or a string, and
+        it has two columns: the first column must contain the timestamps in datetime format of the samples and the
+        second column must contain the glucose levels in mg/dL of the samples.
+
+    period : str | timedelta, default '1D'
+        Duration of the periods, e.g. '1D' for days, '7D' or '1W' for weeks (starting on Monday) or '12h'.
+
+    start : str | timedelta, default '0h'
+        Offset of the start of the periods from local midnight, e.g. period='12h' and start='6h' splits the signals in
+        days (from 6:00 to 18:00) and nights (from 18:00 to 6:00).
+
+    utc_offset : int | float | timedelta, default None
+        Offset in hours (or as a timedelta) added to the timestamps to obtain the local time. Cannot be used with tz.
+
+    tz : str, default None
+        Time zone of the local time, e.g. 'Europe/Madrid'. Naive timestamps are assumed to be in UTC. Daylight saving
+        changes are taken into account. If neither utc_offset nor tz are given, the timestamps are used as they are
+        (wall time for timezone-aware timestamps).
+
+    Return
+    ------
+    split_df : pd.DataFrame
+        A pd.DataFrame with the same columns as df, where the index is a pd.CategoricalIndex with the ids of the
+        patient and period of each sample. The start of the period is formatted as '%Y-%m-%d' when period and start are
+        whole days and as '%Y-%m-%d %H:%M' otherwise.
+    """
     df = glucose_data_verification(df)
     column_name_timestamps, column_name_glucose = df.columns
 
-    df['date'] = df[column_name_timestamps].dt.date
-    df['id'] = df.index.astype(str) + '_' + df['date'].astype(str)
+    period, start = pd.Timedelta(period).value, pd.Timedelta(start).value
+    if period <= 0:
+        raise ValueError('period must be a positive duration.')
+    if utc_offset is not None and tz is not None:
+        raise ValueError('Only one of utc_offset and tz can be given.')
+
+    if df.empty:
+        return _with_index(df, pd.CategoricalIndex([], categories=pd.Index([], dtype=object), name=df.index.name))
+
+    timestamps = df[column_name_timestamps]
+    if tz is not None:
+        if timestamps.dt.tz is None:
+            timestamps = timestamps.dt.tz_localize('UTC')
+        timestamps = timestamps.dt.tz_convert(tz)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    times = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+    if utc_offset is not None:
+        offset = utc_offset if isinstance(utc_offset, timedelta) else timedelta(hours=utc_offset)
+        times = times + pd.Timedelta(offset).value
+
+    periods = (times - periods_origin - start) // period
+    first_period = periods.min()
+    periods -= first_period
+    patients_codes, patients_labels = pd.factorize(df.index)
+    keys = patients_codes.astype('int64') * (periods.max() + 1) + periods
+    keys_codes, unique_keys = pd.factorize(keys, sort=True)
+
+    # Labels are only built for the unique (patient, period) pairs
+    periods_starts = pd.to_datetime((unique_keys % (periods.max() + 1) + first_period) * period + periods_origin
+                                    + start)
+    date_format = '%Y-%m-%d' if period % day_ns == 0 and start % day_ns == 0 else '%Y-%m-%d %H:%M'
+    labels = (patients_labels.take(unique_keys // (periods.max() + 1)).astype(str) + '_'
+              + periods_starts.strftime(date_format))
+
+    index = pd.CategoricalIndex(pd.Categorical.from_codes(keys_codes, categories=labels), name=df.index.name)
+    return _with_index(df, index)
+
+
+def _with_index(df: pd.DataFrame, index: pd.Index) -> pd.DataFrame:
+    # Shallow copy of df with another index, the samples are not copied
+    split_df = df.copy(deep=False)
+    split_df.index = index
+    return split_df
 
-    df = df.set_index('id').drop(['date'], axis=1)
 
-    return df
+def split_signals_by_day(df: pd.DataFrame, utc_offset: int or float or timedelta = None,
+                         tz: str = None) -> pd.DataFrame:
+    """
+    Splits the signals in days, from local midnight to midnight. The ids of the new signals are '<id>_<date>'. See
+    split_signals_by_period.
+    """
+    return split_signals_by_period(df, '1D', utc_offset=utc_offset, tz=tz)
@@ -1,6 +1,9 @@
 import pandas as pd
 from glucostats.utils.format_verification import glucose_data_verification
 
+# mg/dL in 1 mmol/L of glucose
+mmol_to_mgdl = 18
+
 
 def mmol_mgdl(df_signals: pd.DataFrame, initial: str, final: str) -> pd.DataFrame:
     """
@@ -32,9 +35,9 @@ def mmol_mgdl(df_signals: pd.DataFrame, initial: str, final: str) -> pd.DataFram
         raise ValueError('Final value must be either "mmol" or "mgdl"')
 
     if initial == 'mmol' and final == 'mgdl':
-        df_signals[column_name_glucose] = df_signals[column_name_glucose] * 18
+        df_signals[column_name_glucose] = df_signals[column_name_glucose] * mmol_to_mgdl
     elif initial == 'mgdl' and final == 'mmol':
-        df_signals[column_name_glucose] = df_signals[column_name_glucose] / 18
+        df_signals[column_name_glucose] = df_signals[column_name_glucose] / mmol_to_mgdl
     else:
         df_signals = df_signals
 
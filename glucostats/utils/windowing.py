@@ -1,7 +1,50 @@
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 from glucostats.utils.format_verification import glucose_data_verification, windows_params_verification
 
+# Window ids of encoded windows are (signal code << window_bits) | number of window
+window_bits = 24
+
+
+def timestamps_to_ns(timestamps: pd.Series) -> np.ndarray:
+    """
+    Converts datetime values (naive or timezone aware) to int64 nanoseconds. Aware values are converted to UTC.
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert(None)
+    return timestamps.to_numpy(dtype='datetime64[ns]').astype('int64')
+
+
+def ns_to_timestamps(ns: np.ndarray, timezone=None) -> pd.DatetimeIndex:
+    """
+    Inverse of timestamps_to_ns.
+    """
+    timestamps = pd.DatetimeIndex(np.asarray(ns, dtype='int64').astype('datetime64[ns]'))
+    return timestamps.tz_localize('UTC').tz_convert(timezone) if timezone is not None else timestamps
+
+
+def timedelta_ns(time_: list) -> int:
+    """
+    Converts a [days, hours, minutes, seconds] window size to nanoseconds.
+    """
+    return pd.Timedelta(timedelta(days=time_[0], hours=time_[1], minutes=time_[2], seconds=time_[3])).value
+
+
+def encode_window_ids(signals_codes: np.ndarray, n_windows: np.ndarray) -> np.ndarray:
+    """
+    Builds the int64 ids of windows from the integer codes of their signals and their numbers.
+    """
+    return (np.asarray(signals_codes, dtype='int64') << window_bits) | np.asarray(n_windows, dtype='int64')
+
+
+def decode_window_ids(window_ids: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Inverse of encode_window_ids. Returns the codes of the signals and the numbers of the windows.
+    """
+    window_ids = np.asarray(window_ids, dtype='int64')
+    return window_ids >> window_bits, window_ids & ((1 << window_bits) - 1)
+
 
 def calculate_division_timestamps(df_signals: pd.DataFrame,
                                   windowing_method: str,
@@ -69,58 +112,44 @@ def calculate_division_timestamps(df_signals: pd.DataFrame,
                                 windowing_start=windowing_start)
     column_name_timestamps, column_name_glucose = df_signals.columns
 
-    times_windows = []
-    division_timestamps = pd.DataFrame()
-    for unique_id, time_series in df_signals.groupby(level=0):
-        first_date = time_series[column_name_timestamps].min()
-        last_date = time_series[column_name_timestamps].max()
-        total_duration = last_date - first_date
-
-        if windowing_method == 'personalized':
-            times_windows = [first_date]
-            for timestamp in windowing_param:
-                times_windows.append(timestamp)
-            times_windows.append(last_date)
-
-        elif windowing_method in ['number', 'static', 'dynamic']:
-            window_lengths = []
-
-            if windowing_method == 'number':
-                n_windows = windowing_param
-                window_length = total_duration / n_windows
-                window_lengths = [window_length] * n_windows
-
-            elif windowing_method == 'static':
-                window_length = timedelta(days=windowing_param[0], hours=windowing_param[1],
-                                          minutes=windowing_param[2], seconds=windowing_param[3])
-                n_windows = total_duration // window_length
-                window_lengths = [window_length] * n_windows
-
-            elif windowing_method == 'dynamic':
-                for time_ in windowing_param:
-                    window_lengths.append(timedelta(days=time_[0], hours=time_[1],
-                                                    minutes=time_[2], seconds=time_[3]))
-
-            if windowing_start == 'tail':
-                times_windows = [last_date]
-                time_window_start = last_date
-                for length in window_lengths:
-                    time_window_start -= length
-                    if time_window_start >= first_date:
-                        times_windows.append(time_window_start)
-
-            elif windowing_start == 'head':
-                times_windows = [first_date]
-                time_window_end = first_date
-                for length in window_lengths:
-                    time_window_end += length
-                    if time_window_end <= last_date:
-                        times_windows.append(time_window_end)
-
-        times_windows = sorted(times_windows)
-
-        division_timestamps = pd.concat([division_timestamps,
-                                        pd.DataFrame([[times_windows]], index=[unique_id], columns=['time_windows'])])
+    signals_timestamps = df_signals.groupby(level=0)[column_name_timestamps]
+    first_dates, last_dates = signals_timestamps.min(), signals_timestamps.max()
+    timezone = first_dates.dt.tz
+    first_ns, last_ns = timestamps_to_ns(first_dates), timestamps_to_ns(last_dates)
+    total_durations = last_ns - first_ns
+
+    if windowing_method == 'personalized':
+        personalized_ns = np.array([pd.Timestamp(timestamp).value for timestamp in windowing_param], dtype='int64')
+        times_windows = np.column_stack([first_ns, np.tile(personalized_ns, (len(first_ns), 1)), last_ns])
+        valid = np.ones(times_windows.shape, dtype=bool)
+    else:
+        # Offsets of the division timestamps from the first (head) or last (tail) timestamp of each signal
+        if windowing_method == 'number':
+            window_lengths = pd.Series(last_dates - first_dates).to_numpy(dtype='timedelta64[ns]').astype('int64')
+            window_lengths = (window_lengths / windowing_param).astype('int64')
+            offsets = window_lengths[:, None] * np.arange(windowing_param + 1)
+        elif windowing_method == 'static':
+            window_length = timedelta_ns(windowing_param)
+            n_windows = int(total_durations.max() // window_length) if len(total_durations) > 0 else 0
+            offsets = np.tile(window_length * np.arange(n_windows + 1), (len(first_ns), 1))
+        else:
+            offsets = np.cumsum([0] + [timedelta_ns(time_) for time_ in windowing_param])
+            offsets = np.tile(offsets, (len(first_ns), 1))
+        valid = offsets <= total_durations[:, None]
+        if windowing_start == 'tail':
+            times_windows = last_ns[:, None] - offsets
+        else:
+            times_windows = first_ns[:, None] + offsets
+
+    # Discarded timestamps are moved to the end of each row when sorting
+    times_windows = np.sort(np.where(valid, times_windows, np.iinfo('int64').max), axis=1)
+    n_times = valid.sum(axis=1)
+    timestamps = ns_to_timestamps(times_windows[np.arange(times_windows.shape[1]) < n_times[:, None]], timezone)
+    division_timestamps = pd.DataFrame({'time_windows': np.split(np.asarray(timestamps, dtype=object),
+                                                                 np.cumsum(n_times)[:-1])},
+                                       index=first_dates.index)
+    division_timestamps['time_windows'] = division_timestamps['time_windows'].apply(list)
+    division_timestamps.index.name = None
 
     return division_timestamps
 
@@ -161,46 +190,90 @@ def create_windows(df_signals: pd.DataFrame, division_timestamps, windowing_star
         A pd.DataFrame where the index is the unique identifier of the signals or windows of the signals and the
         columns are the start and end timestamps of the signals or the windows of the signals.
     """
+    windowed_signals, signals_start_and_end = create_encoded_windows(df_signals, division_timestamps, windowing_start,
+                                                                     windowing_overlap)
+    signals_codes, n_windows = decode_window_ids(signals_start_and_end.index)
+    window_ids = division_timestamps.index[signals_codes].astype(str) + '|' + pd.Index(n_windows).astype(str)
+    signals_start_and_end.index = window_ids
+    signals_codes, n_windows = decode_window_ids(windowed_signals.index)
+    windowed_signals.index = division_timestamps.index[signals_codes].astype(str) + '|' + \
+        pd.Index(n_windows).astype(str)
+
+    return windowed_signals, signals_start_and_end
+
+
+def create_encoded_windows(df_signals: pd.DataFrame, division_timestamps, windowing_start: str,
+                           windowing_overlap: bool) -> (pd.DataFrame, pd.DataFrame):
+    """
+    Same as create_windows, but the windows are identified by int64 ids (see encode_window_ids) built from the
+    position of their signal in division_timestamps and their number, instead of '<signal id>|<window number>'
+    strings. Grouping by integer ids is much faster and lighter than by strings.
+    """
     df_signals = glucose_data_verification(df_signals)
     windows_params_verification(windowing_start=windowing_start, windowing_overlap=windowing_overlap)
     column_name_timestamps, column_name_glucose = df_signals.columns
 
-    signals_start_and_end = pd.DataFrame()
-    windowed_signals = pd.DataFrame()
-    for unique_id, time_series in df_signals.groupby(level=0):
-        windows = division_timestamps.loc[unique_id].item()
-        for n_window in range(len(windows)-1):
-            window_id = f"{unique_id}|{n_window}"
-            start, end = windows[n_window], windows[n_window+1]
-
-            if windowing_start == 'tail':
-                if windowing_overlap:
-                    filtered_df = time_series[time_series[column_name_timestamps] > start]
-                    signals_start_and_end = pd.concat([signals_start_and_end,
-                                                       pd.DataFrame({'start': start, 'end': windows[-1]},
-                                                                    index=[window_id])])
-                else:
-                    filtered_df = time_series[(time_series[column_name_timestamps] > start) &
-                                              (time_series[column_name_timestamps] <= end)]
-                    signals_start_and_end = pd.concat([signals_start_and_end,
-                                                       pd.DataFrame({'start': start, 'end': end},
-                                                                    index=[window_id])])
-            elif windowing_start == 'head':
-                if windowing_overlap:
-                    filtered_df = time_series[time_series[column_name_timestamps] < end]
-                    signals_start_and_end = pd.concat([signals_start_and_end,
-                                                       pd.DataFrame({'start': windows[0], 'end': end},
-                                                                    index=[window_id])])
-                else:
-                    filtered_df = time_series[(time_series[column_name_timestamps] >= start) &
-                                              (time_series[column_name_timestamps] < end)]
-                    signals_start_and_end = pd.concat([signals_start_and_end,
-                                                       pd.DataFrame({'start': start, 'end': end},
-                                                                    index=[window_id])])
-            else:
-                raise ValueError('windowing_start must be either "tail" or "head".')
-
-            filtered_df.index = [window_id] * len(filtered_df)
-            windowed_signals = pd.concat([windowed_signals, filtered_df])
+    # Division timestamps of every signal, contiguous and sorted
+    times_windows = division_timestamps['time_windows']
+    n_times = times_windows.apply(len).to_numpy()
+    timestamps = pd.Series(np.concatenate(times_windows.to_numpy()) if len(times_windows) > 0 else [],
+                           dtype=df_signals[column_name_timestamps].dtype)
+    times_ns = timestamps_to_ns(timestamps)
+    times_offsets = np.concatenate([[0], np.cumsum(n_times)[:-1]]).astype('int64')
+
+    # Windows: every pair of consecutive division timestamps of a signal
+    n_windows = np.maximum(n_times - 1, 0)
+    windows_signals = np.repeat(np.arange(len(n_times)), n_windows)
+    windows_numbers = np.arange(n_windows.sum()) - np.repeat(np.cumsum(n_windows) - n_windows, n_windows)
+    windows_starts = times_offsets[windows_signals] + windows_numbers
+    if windowing_start == 'tail' and windowing_overlap:
+        starts, ends = windows_starts, (times_offsets + n_times - 1)[windows_signals]
+    elif windowing_start == 'head' and windowing_overlap:
+        starts, ends = times_offsets[windows_signals], windows_starts + 1
+    else:
+        starts, ends = windows_starts, windows_starts + 1
+    if len(windows_numbers) > 0 and windows_numbers.max() >= 1 << window_bits:
+        raise ValueError(f'Signals cannot be divided in more than {1 << window_bits} windows.')
+    signals_start_and_end = pd.DataFrame({'start': timestamps.array[starts], 'end': timestamps.array[ends]},
+                                         index=encode_window_ids(windows_signals, windows_numbers))
+
+    # Number of division timestamps of its signal before each sample. Samples and division timestamps are sorted
+    # together by signal and time, and on ties samples go first in 'tail' (windows exclude their start) and last in
+    # 'head' (windows include their start)
+    samples_signals = division_timestamps.index.get_indexer(df_signals.index)
+    if np.any(samples_signals < 0):
+        raise KeyError('Every signal of df_signals must have division timestamps.')
+    samples_ns = timestamps_to_ns(df_signals[column_name_timestamps])
+    n_samples = len(samples_ns)
+    is_sample = np.concatenate([np.ones(n_samples, dtype=bool), np.zeros(len(times_ns), dtype=bool)])
+    kind = is_sample if windowing_start == 'head' else ~is_sample
+    order = np.lexsort((kind, np.concatenate([samples_ns, times_ns]),
+                        np.concatenate([samples_signals, np.repeat(np.arange(len(n_times)), n_times)])))
+    n_times_before = np.empty(len(order), dtype='int64')
+    n_times_before[order] = np.cumsum(~is_sample[order])
+    n_times_before = n_times_before[:n_samples] - times_offsets[samples_signals]
+
+    samples_n_times = n_times[samples_signals]
+    if windowing_overlap:
+        if windowing_start == 'tail':
+            first_window = np.zeros(n_samples, dtype='int64')
+            last_window = np.minimum(n_times_before, samples_n_times - 1)
+        else:
+            first_window = np.maximum(n_times_before - 1, 0)
+            last_window = samples_n_times - 1
+    else:
+        in_window = (n_times_before >= 1) & (n_times_before <= samples_n_times - 1)
+        first_window = np.where(in_window, n_times_before - 1, 0)
+        last_window = np.where(in_window, n_times_before, 0)
+
+    # Every sample is repeated once for each window it belongs to
+    n_repeats = np.maximum(last_window - first_window, 0)
+    positions = np.repeat(np.arange(n_samples), n_repeats)
+    samples_windows = np.repeat(first_window, n_repeats) + np.arange(n_repeats.sum()) - \
+        np.repeat(np.cumsum(n_repeats) - n_repeats, n_repeats)
+    samples_windows_signals = samples_signals[positions]
+    order = np.lexsort((positions, samples_windows, samples_windows_signals))
+    windowed_signals = df_signals.iloc[positions[order]]
+    windowed_signals.index = encode_window_ids(samples_windows_signals[order], samples_windows[order])
 
     return windowed_signals, signals_start_and_end
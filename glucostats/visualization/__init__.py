@@ -1,4 +1,6 @@
 __all__ = [
+    'agp',
     'heatmaps',
+    'reports',
     'signal_visualization'
 ]
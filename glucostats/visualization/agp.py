@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from glucostats.stats.agp_stats import agp_percentiles
+
+
+def prepare_agp(df_stats: pd.DataFrame, signal_id) -> pd.DataFrame:
+    """
+    Gets the Ambulatory Glucose Profile of a signal from the statistics extracted with the agp statistics (see
+    glucostats.stats.agp_stats.agp), so it can be drawn or exported.
+
+    Parameters
+    ----------
+    df_stats : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals and the columns are the statistics
+        extracted without windowing. It must contain the columns of the 5 percentiles of the AGP ('agp_p5_<HH:MM>',
+        ..., 'agp_p95_<HH:MM>').
+
+    signal_id : int | str
+        Id of the signal.
+
+    Return
+    ------
+    profile : pd.DataFrame
+        A pd.DataFrame where the index is the start of the time of day bins (pd.Timedelta from midnight) and the columns
+        are the percentiles ('agp_p5', 'agp_p25', 'agp_p50', 'agp_p75', 'agp_p95').
+    """
+    if signal_id not in df_stats.index:
+        raise ValueError(f'{signal_id} is not in df_stats.')
+    row = df_stats.loc[signal_id]
+    if isinstance(row, pd.DataFrame):
+        raise ValueError(f'{signal_id} is repeated in df_stats.')
+
+    profile = {}
+    for stat in agp_percentiles:
+        stat_values = row[row.index.str.startswith(f'{stat}_')]
+        if len(stat_values) == 0:
+            raise ValueError(f'{stat} columns are not in df_stats, agp statistics must be extracted without windowing.')
+        profile[stat] = stat_values.set_axis(pd.to_timedelta(stat_values.index.str[len(stat) + 1:] + ':00'))
+    return pd.DataFrame(profile).sort_index().astype('float64')
+
+
+def draw_agp(fig: Figure, df_stats: pd.DataFrame, signal_id, hypo_1_threshold: int or float = 70,
+             hyper_threshold: int or float = 180):
+    """
+    Draws the Ambulatory Glucose Profile of plot_agp in a matplotlib Figure, which can be created without pyplot (e.g.
+    to render many figures in a batch). See plot_agp for the parameters.
+    """
+    for param in [hypo_1_threshold, hyper_threshold]:
+        if not (isinstance(param, int) or isinstance(param, float)):
+            raise ValueError(f'{param} must be int or float')
+    profile = prepare_agp(df_stats, signal_id)
+    # Each bin is drawn at its center
+    bin_width = (profile.index[1] - profile.index[0]) if len(profile) > 1 else pd.Timedelta(days=1)
+    hours = ((profile.index + bin_width / 2) / pd.Timedelta(hours=1)).to_numpy()
+
+    ax = fig.add_subplot()
+    ax.fill_between(hours, profile['agp_p5'], profile['agp_p95'], color='#4C72B0', alpha=0.2,
+                    label='5th - 95th percentiles')
+    ax.fill_between(hours, profile['agp_p25'], profile['agp_p75'], color='#4C72B0', alpha=0.45,
+                    label='25th - 75th percentiles')
+    ax.plot(hours, profile['agp_p50'], color='#1F3A5F', linewidth=2.5, label='Median')
+    ax.axhline(hypo_1_threshold, color='#FFB347', linestyle='--', linewidth=1.5)
+    ax.axhline(hyper_threshold, color='#FFB347', linestyle='--', linewidth=1.5, label='Target range')
+
+    ax.set_xlim(0, 24)
+    ax.set_xticks(np.arange(0, 25, 3))
+    ax.set_xticklabels([f'{hour:02d}:00' for hour in range(0, 25, 3)])
+    ax.set_xlabel('Time of day', fontsize=18)
+    ax.set_ylabel('Glucose (mg/dL)', fontsize=18)
+    ax.set_title(f'Ambulatory Glucose Profile of {signal_id}', fontsize=20)
+    ax.legend(fontsize=16, loc='upper left', bbox_to_anchor=(1, 1))
+    ax.tick_params(axis='both', labelsize=16)
+
+
+def plot_agp(df_stats: pd.DataFrame, signal_id, hypo_1_threshold: int or float = 70,
+             hyper_threshold: int or float = 180, saving_path: str = None):
+    """
+    Generates the Ambulatory Glucose Profile (AGP) graph of a signal: the median glucose level by time of day with the
+    bands between the 25th and 75th percentiles and between the 5th and 95th percentiles, and the limits of the target
+    range.
+
+    Parameters
+    ----------
+    df_stats : pd.DataFrame
+        A pd.DataFrame where the index is the unique identifier of the signals and the columns are the statistics
+        extracted without windowing, including the agp statistics (e.g. ExtractGlucoStats(['agp']).transform(...)).
+
+    signal_id : int | str
+        Id of the signal, usually the signal of 14 days of a patient.
+
+    hypo_1_threshold, hyper_threshold : int | float, default 70, 180
+        Lower and upper limits of the target range.
+
+    saving_path : str, default None
+        If None, the graph is shown. If a path, the graph is saved in it instead.
+    """
+    fig = plt.figure(figsize=(15, 7))
+    draw_agp(fig, df_stats, signal_id, hypo_1_threshold, hyper_threshold)
+
+    if saving_path is not None:
+        fig.savefig(saving_path)
+        plt.close(fig)
+    else:
+        plt.show()
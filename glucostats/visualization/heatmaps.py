@@ -1,201 +1,330 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 from datetime import datetime, date, time, timedelta
+from typing import Tuple
 
+from glucostats.results import ResultsStore
 
-def plot_intrapatient_heatmap(df_stats: pd.DataFrame, signals_time_ranges: pd.DataFrame,
-                              patient: str, stat: str, days: list, saving_path: str = None):
-    """
-    Generates an intrapatient heatmap. See the definition in visualization section in getting started.
-
-    Parameters
-    ----------
-    df_stats : pd.DataFrame
-        A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
-        statistics extracted from the df_signals. Can be obtained calling the attribute .statistics of
-        ExtractGlucoStats.
-
-    signals_time_ranges: pd.DataFrame
-        A pd.DataFrame where the index is the unique identifier of the signals or windows of the signals and the
-        columns are the start and end timestamps of the signals or the windows of the signals. Can be obtained calling
-        the attribute .signals_time_ranges of ExtractGlucoStats.
+# Maximum number of time bins of the raster of a heatmap, with bins of at least one minute
+max_time_bins = 4096
 
-    patient: str
-        The id of the patient to analyze.
 
-    stat : str
-        The name of the statistic to be plotted.
+def _stats_from_store(store: ResultsStore, patients: list, stat: str, days: list) -> tuple:
+    """
+    Reads from a ResultsStore only the statistic and the patients plotted, with the signals or windows starting between
+    the day before days[0] (signals crossing midnight) and days[1], with the format of ExtractGlucoStats.statistics and
+    signals_time_ranges.
+    """
+    if not isinstance(stat, str):
+        raise TypeError('stat must be a string.')
+    if stat not in store.stats:
+        raise ValueError(f'stat {stat} is not in df_stats.')
+    start = end = None
+    if isinstance(days, list) and len(days) == 2 and all(map(lambda x: isinstance(x, date), days)):
+        start, end = days[0] - timedelta(days=1), days[1]
+    df_stats, signals_time_ranges = store.frames([stat], patients, start, end)
+    if df_stats.empty:
+        raise ValueError(f'No signals between the days given.')
+    return df_stats, signals_time_ranges
 
-    days: list
-        A list with just two elements, the fist element will be the start date and the second element will be the end
-        date of the period to analyze. A maximum of 31 days can be analyzed at once.
 
-    saving_path : str | None, default None
-        If path is provided, the resulting graph will be saved in the path. If None, no saving will be done just
-        visualization.
+def _stat_values(df_stats: pd.DataFrame, stat: str) -> Tuple[np.ndarray, np.ndarray or None]:
+    """
+    Returns the values of stat as a (signals, windows) array and the numbers of the windows of its columns (None
+    without windowing).
     """
-    if not isinstance(df_stats, pd.DataFrame):
-        raise TypeError('df must be a pd.DataFrame.')
-
     if not isinstance(stat, str):
         raise TypeError('stat must be a string.')
     if len(df_stats.columns[0].split('|')) > 1:
-        df_stats = df_stats.filter(regex=rf'^{stat}\|')
+        stat_columns = df_stats.filter(regex=rf'^{stat}\|')
+        windows = stat_columns.columns.str.rsplit('|', n=1).str[1].astype('int64').to_numpy()
     else:
-        df_stats = df_stats.filter(items=[f'{stat}'], axis=1)
-    if df_stats.empty:
+        stat_columns = df_stats.filter(items=[f'{stat}'], axis=1)
+        windows = None
+    if stat_columns.empty:
         raise ValueError(f'stat {stat} is not in df_stats.')
+    return stat_columns.to_numpy(dtype='float64'), windows
 
-    if not isinstance(patient, str):
-        raise TypeError('patient must be a string corresponding to the id of the patient to analyze.')
-    patient_stats = df_stats.filter(regex=rf'^{patient}\_', axis=0)
-    if len(patient_stats) == 0:
-        raise ValueError(f'patient {patient} must is not in in df_stats.')
 
+def _days_verification(days: list) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Checks days and returns the midnights of the first day and of the day after the last day.
+    """
     if not isinstance(days, list):
         raise TypeError('days must be a list.')
     if len(days) != 2:
         raise ValueError('days must be a list with two elements.')
     if not all(map(lambda x: isinstance(x, date), days)):
         raise TypeError('elements of days must be datetime objects.')
-    num_days = days[1] - days[0]
-    if num_days > timedelta(days=31):
+    first_day, last_day = pd.Timestamp(days[0]).normalize(), pd.Timestamp(days[1]).normalize()
+    if last_day - first_day > timedelta(days=31):
         raise ValueError(f'A maximum of 31 days can be represented.')
+    return first_day, last_day + pd.Timedelta(days=1)
 
-    column_names = [days[0]]
-    for day in range(1, num_days.days+1):
-        column_names.append(days[0]+day*timedelta(days=1))
-    all_days = dict.fromkeys(column_names)
-    signals_starts_and_ends = signals_time_ranges.filter(regex=rf'^{patient}\_', axis=0)
-    for signal_id in patient_stats.index:
-        if len(df_stats.columns[0].split('|')) > 1:
-            signal_starts_and_ends = signals_starts_and_ends[signals_starts_and_ends.index.str.startswith(f"{signal_id}|")]
-        else:
-            signal_starts_and_ends = signals_starts_and_ends[signals_starts_and_ends.index.str == f"{signal_id}"]
-        datetimes_in_singal = pd.concat([signal_starts_and_ends['start'], signal_starts_and_ends['end']])
-        day_of_signal = datetimes_in_singal.iloc[0].date()
-        day_start = datetime.combine(day_of_signal, time(0, 0, 0))
-        day_end = day_start + timedelta(days=1)
-        if not all(map(lambda x: day_start <= x <= day_end, datetimes_in_singal)):
-            raise ValueError(f'signal {signal_id} is not embedded in a day.')
-        else:
-            if days[0] <= day_of_signal <= days[1]:
-                all_days.update({day_of_signal: signal_id})
-
-    signals_ids_between_days = list(filter(lambda x: x is not None, all_days.values()))
-    if len(signals_ids_between_days) == 0:
-        raise ValueError(f'No signals between the days given.')
-    signals_between_days = patient_stats[patient_stats.index.isin(signals_ids_between_days)]
-
-    signals_between_days_information = {}
-    for signal_id, signal_stats in signals_between_days.iterrows():
-        signal_windows_and_values = []
-        n_windows = len(signal_stats)
-        if n_windows > 1:
-            for window in range(n_windows):
-                start = signals_starts_and_ends.loc[f'{signal_id}|{window}']['start']
-                end = signals_starts_and_ends.loc[f'{signal_id}|{window}']['end']
-                window_size = (end - start).total_seconds() / 3600
-
-                custom_date = datetime(1, 1, 1)
-                start = datetime.combine(custom_date, start.time())
-                end = start + timedelta(hours=window_size)
-                value = signal_stats[f'{stat}|{window}']
-                signal_windows_and_values.append((start, end, window_size, value))
-        else:
-            start = signals_starts_and_ends.loc[f'{signal_id}']['start']
-            end = signals_starts_and_ends.loc[f'{signal_id}']['end']
-            signal_size = (end - start).total_seconds() / 3600
-
-            custom_date = datetime(1, 1, 1)
-            start = datetime.combine(custom_date, start.time())
-            end = start + timedelta(hours=signal_size)
-            value = signal_stats[f'{stat}']
-            signal_windows_and_values.append((start, end, signal_size, value))
-
-        signals_between_days_information.update({signal_id: signal_windows_and_values})
-
-    heatmap = {day: signals_between_days_information[signal]
-               if signal is not None else
-               None for day, signal in all_days.items()}
-    title = (f"Heatmap for {stat} statistic for patient {patient} between the "
-             f"days {days[0].strftime('%Y/%m/%d')}-{days[1].strftime('%Y/%m/%d')}")
 
-    colormaps = [
-        'viridis', 'plasma', 'GnBu',
-        'RdYlBu', 'coolwarm', 'Spectral_r'
-    ]
+def _localize(timestamp: pd.Timestamp, timestamps: pd.Series) -> pd.Timestamp:
+    # Bounds of the days are taken in the time zone of the timestamps
+    return timestamp.tz_localize(timestamps.dt.tz) if timestamps.dt.tz is not None else timestamp
+
+
+def _signals_windows(signals_ids: pd.Index, signals_time_ranges: pd.DataFrame, values: np.ndarray,
+                     windows: np.ndarray or None) -> pd.DataFrame:
+    """
+    Joins the time ranges of the signals or windows with their values of the statistic. Returns a pd.DataFrame with the
+    position of the signal in signals_ids, the start, the end and the value of each signal or window, in the order of
+    signals_time_ranges. Time ranges of signals or windows without statistics are dropped.
+    """
+    ranges_ids = pd.Series(signals_time_ranges.index.astype(str))
+    if windows is not None:
+        ranges_ids = ranges_ids.str.rsplit('|', n=1)
+        window_positions = pd.Index(windows).get_indexer(ranges_ids.str[1].astype('int64'))
+        ranges_ids = ranges_ids.str[0]
+    else:
+        window_positions = np.zeros(len(ranges_ids), dtype='int64')
+    signal_positions = signals_ids.get_indexer(ranges_ids)
 
-    for i in colormaps:
+    found = (signal_positions >= 0) & (window_positions >= 0)
+    signal_positions, window_positions = signal_positions[found], window_positions[found]
+    return pd.DataFrame({'signal': signal_positions,
+                         'start': signals_time_ranges['start'].to_numpy()[found],
+                         'end': signals_time_ranges['end'].to_numpy()[found],
+                         'value': values[signal_positions, window_positions]})
 
-        fig, ax = plt.subplots(figsize=(15, 10))
 
-        list_values = [value for sublist in heatmap.values() if sublist is not None for value in sublist]
-        max_value = max(list_values, key=lambda x: x[3])[3]
-        min_value = min(list_values, key=lambda x: x[3])[3]
+def prepare_intrapatient(df_stats: pd.DataFrame or ResultsStore, signals_time_ranges: pd.DataFrame or None,
+                         patient: str, stat: str, days: list) -> Tuple[list, pd.DataFrame]:
+    """
+    Prepares the data of an intrapatient heatmap: the signals of the patient (whose ids are '<patient>_<date>', see
+    split_signals_by_day) between the days given, with one row per day and the values of the statistic in each window.
+    See plot_intrapatient_heatmap for the parameters.
+
+    Return
+    ------
+    days_labels : list
+        The dates of the rows of the heatmap, every day between days[0] and days[1].
+
+    heatmap : pd.DataFrame
+        A pd.DataFrame with one row per signal or window, with the columns 'row' (position of its day in days_labels),
+        'start' and 'end' (pd.Timedelta from the midnight of its day) and 'value' (value of the statistic).
+    """
+    if isinstance(df_stats, ResultsStore):
+        df_stats, signals_time_ranges = _stats_from_store(df_stats, [patient], stat, days)
+    if not isinstance(df_stats, pd.DataFrame):
+        raise TypeError('df must be a pd.DataFrame or a ResultsStore.')
+    values, windows = _stat_values(df_stats, stat)
 
-        cmap = plt.get_cmap(i)
-        norm = mcolors.Normalize(vmin=min_value, vmax=max_value)
+    if not isinstance(patient, str):
+        raise TypeError('patient must be a string corresponding to the id of the patient to analyze.')
+    signals_ids = df_stats.index.astype(str)
+    patient_signals = signals_ids.str.startswith(f'{patient}_')
+    if not patient_signals.any():
+        raise ValueError(f'patient {patient} must is not in in df_stats.')
+    first_day, end_day = _days_verification(days)
+    days_labels = list(pd.date_range(first_day, end_day, inclusive='left').date)
 
-        for n, (column_name, column_values) in enumerate(heatmap.items()):
-            if column_values is not None:
-                for (start, end, duration, value) in column_values:
-                    color = cmap(norm(value))
-                    ax.bar(n, duration, bottom=start, width=1, color=color, edgecolor=None)
-                    ax.bar(n, duration, bottom=end, width=1, color='white', edgecolor=None)
+    windows_df = _signals_windows(signals_ids[patient_signals], signals_time_ranges, values[patient_signals], windows)
+    if windows_df.empty:
+        raise ValueError(f'No signals between the days given.')
 
-        ax.set_xlabel('Dates', fontsize=20)
-        ax.set_ylabel('Time', fontsize=20)
-        ax.set_title(title, fontsize=22)
+    # Each signal must be embedded in the day of its first start
+    signal_starts = windows_df['start'].groupby(windows_df['signal']).transform('first').dt.normalize()
+    embedded = ((windows_df['start'] >= signal_starts) & (windows_df['end'] <= signal_starts + pd.Timedelta(days=1))
+                & (windows_df['end'] >= windows_df['start']))
+    if not embedded.all():
+        signal_id = signals_ids[patient_signals][windows_df['signal'][~embedded].iloc[0]]
+        raise ValueError(f'signal {signal_id} is not embedded in a day.')
+
+    signal_days = signal_starts.dt.tz_localize(None) if signal_starts.dt.tz is not None else signal_starts
+    rows = ((signal_days - first_day) // pd.Timedelta(days=1)).to_numpy()
+    in_days = (rows >= 0) & (rows < len(days_labels))
+    # If there are several signals in the same day, the last one is plotted
+    last_signals = pd.Series(windows_df['signal'][in_days].to_numpy(), index=rows[in_days]).groupby(level=0).max()
+    selected = in_days & (windows_df['signal'].to_numpy() == last_signals.reindex(rows).to_numpy())
+    if not selected.any():
+        raise ValueError(f'No signals between the days given.')
 
-        ax.set_xticks(list(range(len(heatmap.keys()))))
-        ax.set_xticklabels(heatmap.keys())
+    heatmap = pd.DataFrame({'row': rows[selected],
+                            'start': (windows_df['start'] - signal_starts)[selected].to_numpy(),
+                            'end': (windows_df['end'] - signal_starts)[selected].to_numpy(),
+                            'value': windows_df['value'][selected].to_numpy()})
+    return days_labels, heatmap
 
-        ax.yaxis_date()
-        ax.yaxis.set_major_formatter(mdates.DateFormatter('%H-%M-%S'))
 
-        # ax.set_ylim(max_time, min_time)
-        ax.set_ylim(datetime(1, 1, 1, 23, 59, 59),
-                    datetime(1, 1, 1, 0, 0, 0))
-        ax.tick_params(axis='y', labelsize=20)
-        ax.tick_params(axis='x', labelsize=20)
+def prepare_interpatient(df_stats: pd.DataFrame or ResultsStore, signals_time_ranges: pd.DataFrame or None,
+                         patients: list, stat: str, days: list) -> Tuple[list, pd.DataFrame]:
+    """
+    Prepares the data of an interpatient heatmap: the signals or windows of the patients (whose ids are
+    '<patient>_<period>', see split_signals_by_day) that overlap the days given, with one row per patient. See
+    plot_interpatient_heatmap for the parameters.
+
+    Return
+    ------
+    patients_labels : list
+        The patients of the rows of the heatmap.
+
+    heatmap : pd.DataFrame
+        A pd.DataFrame with one row per signal or window, with the columns 'row' (position of its patient in
+        patients_labels), 'start' and 'end' (timestamps) and 'value' (value of the statistic).
+    """
+    if isinstance(df_stats, ResultsStore):
+        df_stats, signals_time_ranges = _stats_from_store(df_stats, patients, stat, days)
+    if not isinstance(df_stats, pd.DataFrame):
+        raise TypeError('df must be a pd.DataFrame or a ResultsStore.')
+    values, windows = _stat_values(df_stats, stat)
 
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax)
-        cbar.set_label(f'{stat} value', fontsize=22)
-        cbar.ax.tick_params(labelsize=20)
+    if not isinstance(patients, list):
+        raise TypeError('patients must be a list of patients ids.')
+    if not all(map(lambda x: isinstance(x, str) or isinstance(x, int), patients)):
+        raise TypeError('patients ids must in patients mut be strings or integers.')
+    patients_labels = [str(patient) for patient in patients]
+    signals_ids = df_stats.index.astype(str)
+    signals_patients = pd.Index(patients_labels).get_indexer(signals_ids.str.rsplit('_', n=1).str[0])
+    missing = set(range(len(patients_labels))) - set(signals_patients)
+    if len(missing) > 0:
+        raise ValueError(f'patient {patients[min(missing)]} must is not in in df_stats.')
+    first_day, end_day = _days_verification(days)
+
+    # Time ranges are filtered by date before joining them with the statistics
+    starts, ends = signals_time_ranges['start'], signals_time_ranges['end']
+    between_days = (starts < _localize(end_day, starts)) & (ends >= _localize(first_day, ends))
+    selected_patients = signals_patients >= 0
+    windows_df = _signals_windows(signals_ids[selected_patients], signals_time_ranges[between_days.to_numpy()],
+                                  values[selected_patients], windows)
+    if windows_df.empty:
+        raise ValueError(f'No signals between the days given.')
 
-        plt.xticks(rotation=90)
-        plt.tight_layout()
+    heatmap = pd.DataFrame({'row': signals_patients[selected_patients][windows_df['signal'].to_numpy()],
+                            'start': windows_df['start'], 'end': windows_df['end'], 'value': windows_df['value']})
+    return patients_labels, heatmap.sort_values('row', kind='stable', ignore_index=True)
 
-        if saving_path is not None:
-            plt.savefig(saving_path, format="pdf", bbox_inches="tight")
 
+def _heatmap_raster(rows: np.ndarray, n_rows: int, starts: np.ndarray, ends: np.ndarray, span: float,
+                    values: np.ndarray) -> np.ndarray:
+    """
+    Rasterizes the windows of a heatmap in a (rows, time bins) grid, where starts, ends and span are in minutes from
+    the start of the grid. Bins of one minute are used unless the grid would have more than max_time_bins bins. Cells
+    without windows are NaN.
+    """
+    bin_minutes = max(1, int(np.ceil(span / max_time_bins)))
+    n_bins = int(np.ceil(span / bin_minutes))
+    first_bins = np.clip(np.floor(starts / bin_minutes), 0, n_bins - 1).astype('int64')
+    last_bins = np.clip(np.ceil(ends / bin_minutes), 0, n_bins).astype('int64')
+    # Windows shorter than a bin fill the bin of their start
+    lengths = np.maximum(last_bins - first_bins, 1)
+
+    windows = np.repeat(np.arange(len(rows)), lengths)
+    bins = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - first_bins, lengths)
+    grid = np.full((n_rows, n_bins), np.nan, dtype='float32')
+    grid[rows[windows], bins] = values[windows]
+    return grid
+
+
+def _draw_raster(fig: Figure, ax: plt.Axes, grid: np.ndarray, extent: tuple, stat: str, title: str,
+                 colormap: str or mcolors.Colormap):
+    image = ax.imshow(grid, extent=extent, aspect='auto', origin='upper', interpolation='nearest',
+                      cmap=plt.get_cmap(colormap), vmin=np.nanmin(grid), vmax=np.nanmax(grid))
+    ax.set_title(title, fontsize=22)
+    ax.tick_params(axis='y', labelsize=20)
+    ax.tick_params(axis='x', labelsize=20, labelrotation=90)
+
+    cbar = fig.colorbar(image, ax=ax)
+    cbar.set_label(f'{stat} value', fontsize=22)
+    cbar.ax.tick_params(labelsize=20)
+    fig.tight_layout()
+
+
+def _show_or_save(fig: Figure, saving_path: str or None):
+    if saving_path is not None:
+        fig.savefig(saving_path, format="pdf", bbox_inches="tight")
+        plt.close(fig)
+    else:
         plt.show()
 
 
-def plot_interpatient_heatmap(df_stats: pd.DataFrame, signals_time_ranges: pd.DataFrame,
-                              patients: list, stat: str, days: list, saving_path: str = None):
+def draw_intrapatient_heatmap(fig: Figure, df_stats: pd.DataFrame or ResultsStore,
+                              signals_time_ranges: pd.DataFrame or None, patient: str, stat: str, days: list,
+                              colormap: str or mcolors.Colormap = 'viridis'):
+    """
+    Draws an intrapatient heatmap in a matplotlib Figure, which can be created without pyplot (e.g. to render many
+    figures in a batch). See plot_intrapatient_heatmap for the parameters.
+    """
+    days_labels, heatmap = prepare_intrapatient(df_stats, signals_time_ranges, patient, stat, days)
+    title = (f"Heatmap for {stat} statistic for patient {patient} between the "
+             f"days {days[0].strftime('%Y/%m/%d')}-{days[1].strftime('%Y/%m/%d')}")
+
+    grid = _heatmap_raster(heatmap['row'].to_numpy(), len(days_labels),
+                           heatmap['start'].dt.total_seconds().to_numpy() / 60,
+                           heatmap['end'].dt.total_seconds().to_numpy() / 60, 24 * 60, heatmap['value'].to_numpy())
+
+    ax = fig.add_subplot()
+    ax.set_xlabel('Dates', fontsize=20)
+    ax.set_ylabel('Time', fontsize=20)
+    ax.set_xticks(list(range(len(days_labels))))
+    ax.set_xticklabels(days_labels)
+    ax.set_yticks(list(range(0, 25, 2)))
+    ax.set_yticklabels([f'{hour:02d}-00-00' for hour in range(0, 25, 2)])
+    _draw_raster(fig, ax, grid.T, (-0.5, len(days_labels) - 0.5, 24, 0), stat, title, colormap)
+
+
+def draw_interpatient_heatmap(fig: Figure, df_stats: pd.DataFrame or ResultsStore,
+                              signals_time_ranges: pd.DataFrame or None, patients: list, stat: str, days: list,
+                              colormap: str or mcolors.Colormap = 'viridis'):
+    """
+    Draws an interpatient heatmap in a matplotlib Figure, which can be created without pyplot (e.g. to render many
+    figures in a batch). See plot_interpatient_heatmap for the parameters.
+    """
+    patients_labels, heatmap = prepare_interpatient(df_stats, signals_time_ranges, patients, stat, days)
+    title = (f"Heatmap for {stat} statistic for {len(patients)} patients between the "
+             f"days {days[0].strftime('%Y/%m/%d')}-{days[1].strftime('%Y/%m/%d')}")
+
+    starts, ends = heatmap['start'], heatmap['end']
+    if starts.dt.tz is not None:
+        starts, ends = starts.dt.tz_localize(None), ends.dt.tz_localize(None)
+    first_day = datetime.combine(days[0], time(0, 0, 0))
+    end_day = datetime.combine(days[1], time(0, 0, 0)) + timedelta(days=1)
+    grid = _heatmap_raster(heatmap['row'].to_numpy(), len(patients_labels),
+                           ((starts - first_day).dt.total_seconds() / 60).to_numpy(),
+                           ((ends - first_day).dt.total_seconds() / 60).to_numpy(),
+                           (end_day - first_day).total_seconds() / 60, heatmap['value'].to_numpy())
+
+    ax = fig.add_subplot()
+    ax.set_xlabel('Dates and time', fontsize=22)
+    ax.set_ylabel('Patients ids', fontsize=22)
+    ax.set_yticks(list(range(len(patients_labels))))
+    ax.set_yticklabels(patients_labels)
+    ax.xaxis_date()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y/%m/%d %H:%M:%S'))
+    _draw_raster(fig, ax, grid, (mdates.date2num(first_day), mdates.date2num(end_day), len(patients_labels) - 0.5,
+                                 -0.5), stat, title, colormap)
+
+
+def plot_intrapatient_heatmap(df_stats: pd.DataFrame or ResultsStore, signals_time_ranges: pd.DataFrame or None,
+                              patient: str, stat: str, days: list, saving_path: str = None,
+                              colormap: str or mcolors.Colormap = 'viridis'):
     """
-    Generates an interpatient heatmap. See the definition in visualization section in getting started.
+    Generates an intrapatient heatmap. See the definition in visualization section in getting started. The data is
+    prepared by prepare_intrapatient and the windows are drawn as a single raster image
+    (with one-minute bins).
 
     Parameters
     ----------
-    df_stats : pd.DataFrame
+    df_stats : pd.DataFrame | ResultsStore
         A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
         statistics extracted from the df_signals. Can be obtained calling the attribute .statistics of
-        ExtractGlucoStats.
+        ExtractGlucoStats. Can also be a ResultsStore written with split_signals=True, from which only the statistic,
+        patients and days plotted are read.
 
-    signals_time_ranges: pd.DataFrame
+    signals_time_ranges: pd.DataFrame | None
         A pd.DataFrame where the index is the unique identifier of the signals or windows of the signals and the
         columns are the start and end timestamps of the signals or the windows of the signals. Can be obtained calling
-        the attribute .signals_time_ranges of ExtractGlucoStats.
+        the attribute .signals_time_ranges of ExtractGlucoStats. Ignored (can be None) if df_stats is a ResultsStore.
 
-    patients: list
-        The list of the ids of the patients to analyze.
+    patient: str
+        The id of the patient to analyze.
 
     stat : str
         The name of the statistic to be plotted.
@@ -205,124 +334,55 @@ def plot_interpatient_heatmap(df_stats: pd.DataFrame, signals_time_ranges: pd.Da
         date of the period to analyze. A maximum of 31 days can be analyzed at once.
 
     saving_path : str | None, default None
-        If path is provided, the resulting graph will be saved in the path. If None, no saving will be done just
-        visualization.
-    """
-    if not isinstance(df_stats, pd.DataFrame):
-        raise TypeError('df must be a pd.DataFrame.')
-
-    if not isinstance(stat, str):
-        raise TypeError('stat must be a string.')
-    if len(df_stats.columns[0].split('|')) > 1:
-        df_stats = df_stats.filter(regex=rf'^{stat}\|')
-    else:
-        df_stats = df_stats.filter(items=[f'{stat}'], axis=1)
-    if df_stats.empty:
-        raise ValueError(f'stat {stat} is not in df_stats.')
-
-    if not isinstance(patients, list):
-        raise TypeError('patients must be a list of patients ids.')
-    if not all(map(lambda x: isinstance(x, str) or isinstance(x, int), patients)):
-        raise TypeError('patients ids must in patients mut be strings or integers.')
-    patients_stats = pd.DataFrame()
-    for patient in patients:
-        patient_stats = df_stats.filter(regex=rf'^{patient}\_', axis=0)
-        if len(patient_stats) == 0:
-            raise ValueError(f'patient {patient} must is not in in df_stats.')
-        patients_stats = pd.concat([patients_stats, patient_stats])
-
-    if not isinstance(days, list):
-        raise TypeError('days must be a list.')
-    if len(days) != 2:
-        raise ValueError('days must be a list with two elements.')
-    if not all(map(lambda x: isinstance(x, date), days)):
-        raise TypeError('elements of days must be datetime objects.')
-    num_days = days[1] - days[0]
-    if num_days > timedelta(days=31):
-        raise ValueError(f'A maximum of 31 days can be represented.')
-
-    signals_starts_and_ends = signals_time_ranges.filter(regex=rf'^({"|".join(patients)})\_', axis=0)
-    signals_between_days_starts_and_ends = signals_starts_and_ends[
-        (signals_starts_and_ends['start'].apply(lambda x: x.date()) <= days[1]) &
-        (signals_starts_and_ends['end'].apply(lambda x: x.date()) >= days[0])
-    ]
-    if signals_between_days_starts_and_ends.empty:
-        raise ValueError(f'No signals between the days given.')
-
-    heatmap = {}
-    for patient in patients:
-        patient_between_days_information = []
-        patient_stats = patients_stats.filter(regex=rf'^{patient}\_', axis=0)
-        patient_signals_between_days_starts_and_ends = signals_between_days_starts_and_ends.filter(regex=rf'^{patient}\_', axis=0)
-
-        for window_id, (start, end) in patient_signals_between_days_starts_and_ends.iterrows():
-            if patients_stats.shape[1] > 1:
-                signal_id = window_id.split('|')[0]
-                stat_name = f"{stat}|{window_id.split('|')[1]}"
-            else:
-                signal_id = window_id
-                stat_name = stat
-            window_duration = (end - start).total_seconds() / 3600
-            value = patient_stats.loc[signal_id][stat_name]
-            patient_between_days_information.append((start, end, window_duration, value))
-
-        if len(patient_between_days_information) == 0:
-            heatmap.update({patient: None})
-        else:
-            heatmap.update({patient: patient_between_days_information})
-
-    title = (f"Heatmap for {stat} statistic for {len(patients)} patients between the "
-             f"days {days[0].strftime('%Y/%m/%d')}-{days[1].strftime('%Y/%m/%d')}")
-
-    colormaps = [
-        'viridis', 'plasma', 'YlGnBu',
-        'RdYlBu', 'coolwarm', 'Spectral_r'
-    ]
-
-    for i in colormaps:
-
-        fig, ax = plt.subplots(figsize=(15, 10))
+        If path is provided, the resulting graph will be saved in the path as a PDF and not shown. If None, no saving
+        will be done just visualization.
 
-        list_values = [value for sublist in heatmap.values() if sublist is not None for value in sublist]
-        max_value = max(list_values, key=lambda x: x[3])[3]
-        min_value = min(list_values, key=lambda x: x[3])[3]
-
-        cmap = plt.get_cmap(i)
-        norm = mcolors.Normalize(vmin=min_value, vmax=max_value)
-
-        for n, (row_name, row_values) in enumerate(heatmap.items()):
-            if row_values is not None:
-                for (start, end, duration, value) in row_values:
-                    color = cmap(norm(value))
-                    ax.barh(n, duration, left=start, height=1, color=color, edgecolor=None)
-                    ax.barh(n, duration, left=end, height=1, color='white', edgecolor=None)
+    colormap : str | matplotlib.colors.Colormap, default 'viridis'
+        Colormap of the values of the statistic.
+    """
+    fig = plt.figure(figsize=(15, 10))
+    draw_intrapatient_heatmap(fig, df_stats, signals_time_ranges, patient, stat, days, colormap)
+    _show_or_save(fig, saving_path)
 
-        ax.set_xlabel('Dates and time', fontsize=22)
-        ax.set_ylabel('Patients ids', fontsize=22)
-        ax.set_title(title, fontsize=22)
 
-        ax.set_yticks(list(range(len(heatmap.keys()))))
-        ax.set_yticklabels(heatmap.keys())
+def plot_interpatient_heatmap(df_stats: pd.DataFrame or ResultsStore, signals_time_ranges: pd.DataFrame or None,
+                              patients: list, stat: str, days: list, saving_path: str = None,
+                              colormap: str or mcolors.Colormap = 'viridis'):
+    """
+    Generates an interpatient heatmap. See the definition in visualization section in getting started. The data is
+    prepared by prepare_interpatient and the windows are drawn as a single raster image
+    (with bins of one minute, or longer to keep at most max_time_bins bins).
 
-        ax.xaxis_date()
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y/%m/%d %H:%M:%S'))
+    Parameters
+    ----------
+    df_stats : pd.DataFrame | ResultsStore
+        A pd.DataFrame where the index is the unique identifier of the signals and the columns are the
+        statistics extracted from the df_signals. Can be obtained calling the attribute .statistics of
+        ExtractGlucoStats. Can also be a ResultsStore written with split_signals=True, from which only the statistic,
+        patients and days plotted are read.
 
-        ax.set_xlim(datetime.combine(days[0], time(0, 0, 0)),
-                    datetime.combine(days[1], time(23, 59, 59)))
+    signals_time_ranges: pd.DataFrame | None
+        A pd.DataFrame where the index is the unique identifier of the signals or windows of the signals and the
+        columns are the start and end timestamps of the signals or the windows of the signals. Can be obtained calling
+        the attribute .signals_time_ranges of ExtractGlucoStats. Ignored (can be None) if df_stats is a ResultsStore.
 
-        ax.tick_params(axis='y', labelsize=20)
-        ax.tick_params(axis='x', labelsize=20)
+    patients: list
+        The list of the ids of the patients to analyze.
 
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax)
-        cbar.set_label(f'{stat} value', fontsize=22)
-        cbar.ax.tick_params(labelsize=20)
+    stat : str
+        The name of the statistic to be plotted.
 
-        plt.xticks(rotation=90)
-        plt.tight_layout()
+    days: list
+        A list with just two elements, the fist element will be the start date and the second element will be the end
+        date of the period to analyze. A maximum of 31 days can be analyzed at once.
 
-        if saving_path is not None:
-            plt.savefig(saving_path, format="pdf", bbox_inches="tight")
+    saving_path : str | None, default None
+        If path is provided, the resulting graph will be saved in the path as a PDF and not shown. If None, no saving
+        will be done just visualization.
 
-        plt.show()
+    colormap : str | matplotlib.colors.Colormap, default 'viridis'
+        Colormap of the values of the statistic.
+    """
+    fig = plt.figure(figsize=(15, 10))
+    draw_interpatient_heatmap(fig, df_stats, signals_time_ranges, patients, stat, days, colormap)
+    _show_or_save(fig, saving_path)
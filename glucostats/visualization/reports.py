@@ -0,0 +1,222 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from multiprocessing import Pool
+from typing import Tuple, Iterator
+from tqdm import tqdm
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+
+from glucostats.results import ResultsStore
+from glucostats.visualization.heatmaps import draw_intrapatient_heatmap
+from glucostats.visualization.signal_visualization import draw_glucose_time_series
+from glucostats.utils.logs import get_logger
+
+logger = get_logger(__name__)
+
+# Data of the reports, set once per process by _init_reports instead of being sent with every patient
+_reports_data = {}
+
+
+def _patients_positions(ids: pd.Index, patients: list, windowed: bool = False) -> dict:
+    """
+    Groups the positions of the rows of a pd.DataFrame by patient. The patient of an id is the id itself if it is one
+    of the patients, or the id before the last '_' otherwise (ids of split_signals_by_day). With windowed=True, the
+    window number of the ids ('<id>|<window>') is removed first. Ids are parsed once per unique id.
+    """
+    codes, unique_ids = pd.factorize(ids)
+    unique_ids = pd.Series(unique_ids.astype(str))
+    if windowed:
+        unique_ids = unique_ids.str.rsplit('|', n=1).str[0]
+    unique_patients = unique_ids.where(unique_ids.isin(patients), unique_ids.str.rsplit('_', n=1).str[0])
+    patients_codes = pd.Index(patients).get_indexer(unique_patients)[codes]
+    positions = pd.Series(np.arange(len(ids))).groupby(patients_codes).indices
+    return {patients[code]: positions[code] for code in positions if code >= 0}
+
+
+def _init_reports(data: dict, agg: bool = True):
+    if agg:
+        matplotlib.use('Agg')
+        if isinstance(data['df_stats'], ResultsStore):
+            # SQLite connections must not be shared with forked processes
+            store = data['df_stats']
+            data = dict(data, df_stats=ResultsStore(store.path, store.split_signals))
+    _reports_data.clear()
+    _reports_data.update(data)
+
+
+def _patient_rows(df: pd.DataFrame or None, positions: dict, patient: str) -> pd.DataFrame or None:
+    if df is None or positions is None:
+        return df
+    return df.iloc[positions.get(patient, np.zeros(0, dtype='int64'))]
+
+
+def _report_pages(patient: str) -> Iterator[Tuple[str, Figure]]:
+    """
+    Draws the pages of the report of a patient, one at a time, so only one figure is alive at once.
+    """
+    data = _reports_data
+    days = data['days']
+    df_stats = _patient_rows(data['df_stats'], data['stats_positions'], patient)
+    signals_time_ranges = _patient_rows(data['signals_time_ranges'], data['ranges_positions'], patient)
+    for stat in data['stats']:
+        fig = Figure(figsize=(15, 10))
+        draw_intrapatient_heatmap(fig, df_stats, signals_time_ranges, patient, stat, days, data['colormap'])
+        yield f'heatmap_{stat}', fig
+
+    df_signals = _patient_rows(data['df_signals'], data['signals_positions'], patient)
+    if df_signals is not None:
+        column_name_timestamps = df_signals.columns[0]
+        timestamps = df_signals[column_name_timestamps]
+        first_day = pd.Timestamp(days[0]).normalize()
+        end_day = pd.Timestamp(days[1]).normalize() + pd.Timedelta(days=1)
+        if timestamps.dt.tz is not None:
+            first_day, end_day = first_day.tz_localize(timestamps.dt.tz), end_day.tz_localize(timestamps.dt.tz)
+        in_days = ((timestamps >= first_day) & (timestamps < end_day)).to_numpy()
+        # The signals of the patient (e.g. one per day) are plotted as a single signal
+        df_signals = df_signals[in_days].set_axis(pd.Index([patient] * in_days.sum(), name=df_signals.index.name))
+        if df_signals.empty:
+            raise ValueError(f'No samples of patient {patient} between the days given.')
+        fig = Figure(figsize=(15, 7))
+        draw_glucose_time_series(fig, df_signals, patient, *data['thresholds'])
+        yield 'time_series', fig
+
+
+def _render_report(patient: str) -> Tuple[str, str or None, str or None]:
+    """
+    Renders the report of a patient in a worker. Returns the path of the report or the error found.
+    """
+    output_dir, report_format = _reports_data['output_dir'], _reports_data['report_format']
+    try:
+        if report_format == 'pdf':
+            path = output_dir / f'{patient}.pdf'
+            tmp_path = output_dir / f'.{patient}.pdf.tmp'
+            try:
+                with PdfPages(tmp_path) as pdf:
+                    for _, fig in _report_pages(patient):
+                        pdf.savefig(fig, bbox_inches='tight')
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        else:
+            path = output_dir / str(patient)
+            path.mkdir(exist_ok=True)
+            for n, (name, fig) in enumerate(_report_pages(patient)):
+                fig.savefig(path / f'{n:02d}_{name}.png', format='png', bbox_inches='tight')
+    except Exception as error:
+        return patient, None, f'{type(error).__name__}: {error}'
+    return patient, str(path), None
+
+
+def render_reports(df_stats: pd.DataFrame or ResultsStore, signals_time_ranges: pd.DataFrame or None,
+                   df_signals: pd.DataFrame or None, patients: list, stats: list, days: list,
+                   output_dir: str or os.PathLike, report_format: str = 'pdf', n_workers: int = 0,
+                   colormap: str = 'viridis', hypo_1_threshold: int or float = 70, hypo_2_threshold: int or float = 54,
+                   hyper_threshold: int or float = 180) -> Tuple[dict, pd.DataFrame]:
+    """
+    Renders a report per patient with an intrapatient heatmap of each statistic in stats and the time series of the
+    glucose levels of the patient between the days given, e.g. weekly reports of a cohort. Reports are rendered in a
+    process pool with the Agg backend. Figures are created without pyplot and each page is written and released
+    before drawing the next one, so the memory used does not grow with the number of patients or pages. The data is
+    sent once to each worker, and the rows of each patient are found through an index built once. Patients whose
+    report cannot be rendered are reported without aborting the rendering.
+
+    Parameters
+    ----------
+    df_stats : pd.DataFrame | ResultsStore
+        Statistics of the signals of the patients split by day, see plot_intrapatient_heatmap.
+
+    signals_time_ranges : pd.DataFrame | None
+        Start and end timestamps of the signals or windows, see plot_intrapatient_heatmap. Ignored (can be None) if
+        df_stats is a ResultsStore.
+
+    df_signals : pd.DataFrame | None
+        A pd.DataFrame where the index is the unique identifier of the signals (the id of the patient, or the ids of
+        split_signals_by_day) and it has two columns: the timestamps and the glucose levels of the samples. If None,
+        the reports do not include the time series.
+
+    patients : list
+        Ids of the patients.
+
+    stats : list
+        Names of the statistics whose heatmaps are included in the reports.
+
+    days : list
+        A list with the start and end dates of the period of the reports. A maximum of 31 days can be represented.
+
+    output_dir : str | os.PathLike
+        Directory where the reports are written. It is created if it does not exist.
+
+    report_format : str, default 'pdf'
+        'pdf' to write a multi-page PDF per patient ('<output_dir>/<patient>.pdf') or 'png' to write a directory of
+        PNG images per patient ('<output_dir>/<patient>/<page>_<name>.png').
+
+    n_workers : int, default 0
+        Number of processes rendering reports. If 0, reports are rendered in the main process.
+
+    colormap : str, default 'viridis'
+        Colormap of the heatmaps.
+
+    hyper_threshold, hypo_2_threshold, hypo_1_threshold: int | float, default 180, 70, 54
+        Thresholds of the glucose ranges of the time series, see plot_glucose_time_series.
+
+    Returns
+    -------
+    reports : dict
+        Path of the report of each patient rendered.
+
+    errors_report : pd.DataFrame
+        A pd.DataFrame where the index is the id of the patients whose report could not be rendered, with 'stage' and
+        'error' columns as ExtractGlucoStats.errors_report.
+    """
+    if report_format not in ['pdf', 'png']:
+        raise ValueError('report_format must be "pdf" or "png".')
+    if not isinstance(n_workers, int) or n_workers < 0:
+        raise ValueError('n_workers must be positive integer.')
+    if not isinstance(patients, list) or not isinstance(stats, list):
+        raise TypeError('patients and stats must be lists.')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    patients = [str(patient) for patient in patients]
+
+    start = time.time()
+    data = {'df_stats': df_stats, 'signals_time_ranges': signals_time_ranges, 'df_signals': df_signals,
+            'stats_positions': None, 'ranges_positions': None, 'signals_positions': None, 'stats': stats, 'days': days,
+            'output_dir': output_dir, 'report_format': report_format, 'colormap': colormap,
+            'thresholds': (hypo_1_threshold, hypo_2_threshold, hyper_threshold)}
+    if isinstance(df_stats, pd.DataFrame):
+        windowed = len(df_stats.columns) > 0 and len(str(df_stats.columns[0]).split('|')) > 1
+        data['stats_positions'] = _patients_positions(df_stats.index, patients)
+        data['ranges_positions'] = _patients_positions(signals_time_ranges.index, patients, windowed)
+    if df_signals is not None:
+        data['signals_positions'] = _patients_positions(df_signals.index, patients)
+
+    def results():
+        if n_workers > 0:
+            with Pool(n_workers, initializer=_init_reports, initargs=(data,)) as pool:
+                yield from pool.imap_unordered(_render_report, patients,
+                                               chunksize=max(1, len(patients) // (4 * n_workers)))
+        else:
+            _init_reports(data, agg=False)
+            try:
+                yield from map(_render_report, patients)
+            finally:
+                _reports_data.clear()
+
+    reports, errors = {}, {}
+    for patient, path, error in tqdm(results(), total=len(patients), desc="Reports rendering", unit="patients",
+                                     ncols=80):
+        if error is not None:
+            errors[patient] = ['rendering', error]
+        else:
+            reports[patient] = path
+
+    if len(errors) > 0:
+        logger.warning(f'{len(errors)} of {len(patients)} reports could not be rendered.')
+    logger.info(f'Rendering of {len(patients)} reports: {time.time() - start:.3f}s.')
+    errors_report = pd.DataFrame.from_dict(errors, orient='index', columns=['stage', 'error']) if len(errors) > 0 \
+        else pd.DataFrame(columns=['stage', 'error'])
+    return reports, errors_report
@@ -2,15 +2,88 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 
 from glucostats.utils.format_verification import glucose_data_verification
+from glucostats.utils.downsampling import minmax_downsampling, lttb_downsampling
 
 list_markers = ['o', '^', 'x', 's', 'd', '|', 'p', '>', '*', '<']
 
 
+def draw_glucose_time_series(fig: Figure, df_signals: pd.DataFrame, signals_ids,
+                             hypo_1_threshold: int or float = 70, hypo_2_threshold: int or float = 54,
+                             hyper_threshold: int or float = 180, downsampling: str = None, max_points: int = 2000):
+    """
+    Draws the time series graph of glucose levels of plot_glucose_time_series in a matplotlib Figure, which can be
+    created without pyplot (e.g. to render many figures in a batch). See plot_glucose_time_series for the parameters.
+    """
+    for param in [hypo_1_threshold, hypo_2_threshold, hyper_threshold]:
+        if not (isinstance(param, int) or isinstance(param, float)):
+            raise ValueError(f'{param} must be int or float')
+    if isinstance(signals_ids, int) or isinstance(signals_ids, str):
+        signals_ids = [signals_ids]
+    elif isinstance(signals_ids, list) or isinstance(signals_ids, np.ndarray):
+        signals_ids = signals_ids
+    else:
+        raise TypeError(f'signals_ids must be int, string, list or array')
+    if not (all(map(lambda x: isinstance(x, int) or isinstance(x, str), signals_ids))):
+        raise ValueError(f'signals ids must be integers or strings')
+    if downsampling not in [None, 'minmax', 'lttb']:
+        raise ValueError('downsampling must be None, "minmax" or "lttb".')
+    if not isinstance(max_points, int) or max_points < 3:
+        raise ValueError('max_points must be an integer greater than or equal to 3.')
+
+    # Samples of all the signals are selected with a single scan of the index
+    selected_signals = df_signals[df_signals.index.isin(signals_ids)]
+    found_ids = set(selected_signals.index.unique())
+    for signal_id in signals_ids:
+        if signal_id not in found_ids:
+            raise ValueError(f'{signal_id} is not in df_signals')
+    selected_signals = glucose_data_verification(selected_signals)
+    signals_positions = pd.Series(np.arange(len(selected_signals))).groupby(selected_signals.index.to_numpy()).indices
+
+    column_name_timestamps, column_name_glucose = selected_signals.columns
+
+    max_value = selected_signals[column_name_glucose].max()
+    first_date = selected_signals[column_name_timestamps].min()
+    last_date = selected_signals[column_name_timestamps].max()
+
+    ax = fig.add_subplot()
+    for n, signal_id in enumerate(signals_ids):
+        selected_signal = selected_signals.iloc[signals_positions[signal_id]]
+        if downsampling is not None:
+            selected_signal = selected_signal.sort_values(column_name_timestamps, kind='stable')
+            timestamps = selected_signal[column_name_timestamps].to_numpy(dtype='datetime64[ns]').view('int64')
+            glucose = selected_signal[column_name_glucose].to_numpy(dtype='float64')
+            indices = minmax_downsampling(timestamps, glucose, max_points // 2) if downsampling == 'minmax' \
+                else lttb_downsampling(timestamps, glucose, max_points)
+            selected_signal = selected_signal.iloc[indices]
+        ax.plot(selected_signal[column_name_timestamps], selected_signal[column_name_glucose],
+                label=f'Signal with id: {signal_id}', marker=list_markers[n], linestyle='-', markersize=1.5)
+
+    ax.fill_between([first_date, last_date], 0, hypo_2_threshold, color='#FF6F61', alpha=0.4,
+                    label='Type 2 hypoglycemia')
+    ax.fill_between([first_date, last_date], hypo_2_threshold, hypo_1_threshold,
+                    color='#FFB347', alpha=0.4, label='Type 1 hypoglycemia')
+    ax.fill_between([first_date, last_date], hypo_1_threshold, hyper_threshold, color='#88B04B',
+                    alpha=0.4, label='Normoglycemia')
+    ax.fill_between([first_date, last_date], hyper_threshold, max_value, color='skyblue',
+                    alpha=0.4, label='Hyperglycemia')
+
+    ax.set_xlabel('Time', fontsize=18)
+    ax.set_ylabel('Glucose (mg/dL)', fontsize=18)
+    ax.set_title('Glucose Levels Over Time', fontsize=20)
+    ax.legend(fontsize=16, loc='upper left', bbox_to_anchor=(1, 1))
+
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d %B %Y %H:%M'))
+    ax.tick_params(axis='x', labelrotation=60, labelsize=16)
+    ax.tick_params(axis='y', labelsize=16)
+    fig.tight_layout()
+
+
 def plot_glucose_time_series(df_signals, signals_ids, hypo_1_threshold: int or float = 70,
                              hypo_2_threshold: int or float = 54, hyper_threshold: int or float = 180,
-                             saving_path: str = None):
+                             saving_path: str = None, downsampling: str = None, max_points: int = 2000):
     """
     Generates a time series graph of glucose levels for a specific patient or for several patients, with colored
     backgrounds for type 1 hypoglycemia, type 2 hypoglycemia and hyperglycemia thresholds.
@@ -39,59 +112,26 @@ def plot_glucose_time_series(df_signals, signals_ids, hypo_1_threshold: int or f
     saving_path : str | None, default None
         If path is provided, the resulting graph will be saved in the path. If None, no saving will be done just
         visualization.
-    """
-    for param in [hypo_1_threshold, hypo_2_threshold, hyper_threshold]:
-        if not (isinstance(param, int) or isinstance(param, float)):
-            raise ValueError(f'{param} must be int or float')
-    if isinstance(signals_ids, int) or isinstance(signals_ids, str):
-        signals_ids = [signals_ids]
-    elif isinstance(signals_ids, list) or isinstance(signals_ids, np.ndarray):
-        signals_ids = signals_ids
-    else:
-        raise TypeError(f'signals_ids must be int, string, list or array')
-    if not (all(map(lambda x: isinstance(x, int) or isinstance(x, str), signals_ids))):
-        raise ValueError(f'signals ids must be integers or strings')
-    selected_signals = pd.DataFrame()
-    for signal_id in signals_ids:
-        signal = df_signals[df_signals.index == signal_id]
-        if signal.empty:
-            raise ValueError(f'{signal_id} is not in df_signals')
-        else:
-            selected_signals = pd.concat([selected_signals, signal])
-    selected_signals = glucose_data_verification(selected_signals)
 
-    column_name_timestamps, column_name_glucose = df_signals.columns
+    downsampling : str | None, default None
+        Reduction of the samples plotted for long signals:
 
-    max_value = selected_signals[column_name_glucose].max()
-    first_date = selected_signals[column_name_timestamps].min()
-    last_date = selected_signals[column_name_timestamps].max()
+        * None: all the samples are plotted.
+        * 'minmax': the time range is divided in max_points / 2 buckets and the lowest and highest samples of each
+          bucket are plotted, so every hypoglycemia and hyperglycemia excursion is kept.
+        * 'lttb': max_points samples are selected with the largest-triangle-three-buckets algorithm, which keeps the
+          visual shape of the signal.
 
-    plt.figure(figsize=(15, 7))
-    for n, signal_id in enumerate(signals_ids):
-        selected_signal = df_signals.loc[signal_id, :]
-        plt.plot(selected_signal[column_name_timestamps], selected_signal[column_name_glucose],
-                 label=f'Signal with id: {signal_id}', marker=list_markers[n], linestyle='-', markersize=1.5)
-
-    plt.fill_between([first_date, last_date], 0, hypo_2_threshold, color='#FF6F61', alpha=0.4,
-                     label='Type 2 hypoglycemia')
-    plt.fill_between([first_date, last_date], hypo_2_threshold, hypo_1_threshold,
-                     color='#FFB347', alpha=0.4, label='Type 1 hypoglycemia')
-    plt.fill_between([first_date, last_date], hypo_1_threshold, hyper_threshold, color='#88B04B',
-                     alpha=0.4, label='Normoglycemia')
-    plt.fill_between([first_date, last_date], hyper_threshold, max_value, color='skyblue',
-                     alpha=0.4, label='Hyperglycemia')
-
-    plt.xlabel('Time',fontsize=18)
-    plt.ylabel('Glucose (mg/dL)',fontsize=18)
-    plt.title('Glucose Levels Over Time',fontsize=20)
-    plt.legend(fontsize=16, loc='upper left', bbox_to_anchor=(1, 1))
-
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d %B %Y %H:%M'))
-    plt.xticks(rotation=60,fontsize=16)
-    plt.yticks(fontsize=16)
-    plt.tight_layout()
+    max_points : int, default 2000
+        Maximum number of samples plotted per signal when downsampling is used. Around twice the width of the figure in
+        pixels is enough for the graph to look the same as with all the samples.
+    """
+    fig = plt.figure(figsize=(15, 7))
+    draw_glucose_time_series(fig, df_signals, signals_ids, hypo_1_threshold, hypo_2_threshold, hyper_threshold,
+                             downsampling, max_points)
 
     if saving_path is not None:
-        plt.savefig(saving_path)
-
-    plt.show()
+        fig.savefig(saving_path)
+        plt.close(fig)
+    else:
+        plt.show()
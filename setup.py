@@ -1,3 +1,7 @@
 from setuptools import setup
 
-setup()
+setup(
+    entry_points={
+        'console_scripts': ['glucostats = glucostats.main:main'],
+    },
+)
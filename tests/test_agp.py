@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import glucostats
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.stats.agp_stats import agp, agp_columns
+import glucostats.utils.constants as constants
+
+
+@pytest.fixture
+def df_signals():
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range('2023-01-01 00:03', periods=288 * 14, freq='5min')
+    glucose = rng.integers(40, 350, (2, len(timestamps))).astype(float)
+    return pd.DataFrame({'time': list(timestamps) * 2, 'glucose': glucose.ravel()},
+                        index=pd.Index(['a'] * len(timestamps) + ['b'] * len(timestamps), name='id'))
+
+
+def test_agp_percentiles(df_signals):
+    agp_df = agp(df_signals, agp_bin=15)
+    assert agp_df.shape == (2, 5 * 96)
+    assert list(agp_df.columns[:2]) == ['agp_p5_00:00', 'agp_p5_00:15']
+    timestamps = df_signals['time']
+    bins = (timestamps.dt.hour * 60 + timestamps.dt.minute) // 15
+    expected = df_signals['glucose'].groupby([df_signals.index, bins]).quantile(0.95).unstack()
+    assert agp_df[agp_columns('agp_p95', 15)].to_numpy() == pytest.approx(expected.loc[['a', 'b']].to_numpy())
+
+    with pytest.raises(ValueError):
+        agp(df_signals, agp_bin=7)
+
+
+def test_agp_extraction(df_signals):
+    extraction = ExtractGlucoStats(['agp_p50', 'mean']).configuration(agp_bin=30)
+    statistics = extraction.transform(df_signals)
+    assert set(statistics.columns) == set(agp_columns('agp_p50', 30) + ['mean'])
+    expected = agp(df_signals, 30)[agp_columns('agp_p50', 30)]
+    assert statistics[expected.columns].to_numpy() == pytest.approx(expected.loc[statistics.index].to_numpy())
+
+    stats = glucostats.compute(df_signals.loc['b', 'time'].to_numpy(), df_signals.loc['b', 'glucose'].to_numpy(),
+                               ['agp_p50'], agp_bin=30)
+    assert list(stats) == agp_columns('agp_p50', 30)
+    assert list(stats.values()) == pytest.approx(expected.loc['b'].to_numpy())
+
+    with pytest.raises(ValueError):
+        extraction.configuration(agp_bin=0)
+
+
+def test_plot_agp(df_signals, tmp_path):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    from glucostats.visualization.agp import prepare_agp, plot_agp
+
+    agp_df = agp(df_signals, agp_bin=60)
+    profile = prepare_agp(agp_df, 'a')
+    assert list(profile.columns) == ['agp_p5', 'agp_p25', 'agp_p50', 'agp_p75', 'agp_p95']
+    assert profile.index[1] == pd.Timedelta(hours=1)
+    assert (profile['agp_p5'] <= profile['agp_p50']).all() and (profile['agp_p50'] <= profile['agp_p95']).all()
+    with pytest.raises(ValueError):
+        prepare_agp(agp_df.drop(columns=agp_columns('agp_p25')), 'a')
+
+    plot_agp(agp_df, 'b', saving_path=tmp_path / 'agp.png')
+    assert (tmp_path / 'agp.png').stat().st_size > 0
+
+
+def test_agp_opt_in(df_signals):
+    assert 'agp_stats' not in constants.groups
+    statistics = ExtractGlucoStats(['agp_stats']).configuration(agp_bin=60).transform(df_signals)
+    assert statistics.shape == (2, 5 * 24)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import glucostats
+import glucostats.utils.constants as constants
+from glucostats.extract_statistics import ExtractGlucoStats
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(0)
+    n = 288
+    timestamps = (pd.Timestamp('2023-01-01') + pd.to_timedelta(np.cumsum(rng.integers(240, 360, n)), unit='s'))
+    return timestamps.to_numpy(), rng.integers(40, 350, n).astype(float)
+
+
+@pytest.mark.parametrize('config', [{}, {'in_range_interval': [80, 160], 'time_units': 'h', 'ddof': 0,
+                                         'quartiles': [0.1, 0.5], 'threshold': 100, 'where': 'below'}])
+def test_compute_matches_extraction(signal, config):
+    timestamps, glucose = signal
+    extraction = ExtractGlucoStats(constants.groups)
+    extraction.configuration(**config)
+    signals = pd.DataFrame({'time': np.tile(timestamps, 2), 'glucose': np.tile(glucose, 2)},
+                           index=['a'] * len(glucose) + ['b'] * len(glucose))
+    expected = extraction.transform(signals).loc['a']
+
+    stats = glucostats.compute(timestamps, glucose, **config)
+    assert set(stats) == set(expected.index)
+    for stat, value in expected.items():
+        assert stats[stat] == pytest.approx(value, nan_ok=True), stat
+
+
+def test_compute_seconds_and_errors(signal):
+    timestamps, glucose = signal
+    seconds = timestamps.astype('datetime64[s]').astype('int64')
+    stats = glucostats.compute(seconds, glucose, ['mean', 'quartiles', 'time_in_ranges'])
+    assert list(stats) == ['mean', 'quartile_0.25', 'quartile_0.5', 'quartile_0.75', 't_ir', 't_ar', 't_br', 't_or']
+    assert stats == glucostats.compute(timestamps, glucose, ['mean', 'quartiles', 'time_in_ranges'])
+
+    with pytest.raises(ValueError):
+        glucostats.compute(timestamps[:1], glucose[:1], ['mean'])
+    with pytest.raises(TypeError):
+        glucostats.compute(timestamps, glucose, ['mean'], unknown=1)
@@ -0,0 +1,93 @@
+import sys
+import pandas as pd
+from datetime import datetime, timedelta
+
+from glucostats.main import main, parse_windowing_param
+from glucostats.results import read_results
+
+
+def write_signals(path):
+    timestamps = [datetime(2023, 1, 1) + timedelta(minutes=5 * i) for i in range(24)]
+    df = pd.DataFrame({
+        'id': ['p1'] * 24 + ['p2'] * 24,
+        'time': timestamps * 2,
+        'glucose': [100 + i for i in range(24)] + [200 - i for i in range(24)]
+    })
+    df.to_csv(path, index=False)
+
+
+def test_parse_windowing_param():
+    assert parse_windowing_param('number', '4') == 4
+    assert parse_windowing_param('static', '0,6,0,0') == [0, 6, 0, 0]
+    assert parse_windowing_param('dynamic', '0,6,0,0;0,1,30,0') == [[0, 6, 0, 0], [0, 1, 30, 0]]
+    assert parse_windowing_param('personalized', '2023-01-01T06:00') == [datetime(2023, 1, 1, 6)]
+
+
+def test_extract_and_resume(tmp_path, monkeypatch):
+    write_signals(tmp_path / 'signals.csv')
+    output = tmp_path / 'out'
+    argv = ['glucostats', 'extract', str(tmp_path / '*.csv'), '-o', str(output), '--stats', 'mean', 'a1c',
+            '--batch-size', '1']
+    monkeypatch.setattr(sys, 'argv', argv)
+    main()
+
+    stats = pd.concat([pd.read_csv(part, index_col=0) for part in sorted(output.glob('stats-*.csv'))])
+    assert list(stats.index) == ['p1', 'p2']
+    assert stats.loc['p1', 'mean'] == sum(100 + i for i in range(24)) / 24
+    time_ranges = pd.read_csv(output / 'time_ranges-00000.csv', index_col=0, parse_dates=['start', 'end'])
+    assert time_ranges.loc['p1', 'end'] - time_ranges.loc['p1', 'start'] == timedelta(minutes=5 * 23)
+
+    (output / 'stats-00001.csv').unlink()
+    monkeypatch.setattr(sys, 'argv', argv + ['--resume'])
+    main()
+    assert sorted(p.name for p in output.glob('stats-*.csv')) == ['stats-00000.csv', 'stats-00002.csv']
+    assert list(pd.read_csv(output / 'stats-00002.csv', index_col=0).index) == ['p2']
+
+
+def test_extract_from_store(tmp_path, monkeypatch):
+    write_signals(tmp_path / 'signals.csv')
+    monkeypatch.setattr(sys, 'argv', ['glucostats', 'store', str(tmp_path / 'signals.csv'), '-o',
+                                      str(tmp_path / 'store')])
+    main()
+
+    output = tmp_path / 'out'
+    argv = ['glucostats', 'extract', str(tmp_path / 'store'), '-o', str(output), '--stats', 'mean', '--batch-size', '1']
+    monkeypatch.setattr(sys, 'argv', argv)
+    main()
+    stats = pd.concat([pd.read_csv(part, index_col=0) for part in sorted(output.glob('stats-*.csv'))])
+    assert list(stats.index) == ['p1', 'p2']
+    assert stats.loc['p2', 'mean'] == sum(200 - i for i in range(24)) / 24
+
+    (output / 'stats-00000.csv').unlink()
+    monkeypatch.setattr(sys, 'argv', argv + ['--resume'])
+    main()
+    assert list(pd.read_csv(output / 'stats-00002.csv', index_col=0).index) == ['p1']
+
+
+def test_extract_dataset_format(tmp_path, monkeypatch):
+    write_signals(tmp_path / 'signals.csv')
+    output = tmp_path / 'out'
+    argv = ['glucostats', 'extract', str(tmp_path / 'signals.csv'), '-o', str(output), '--stats', 'mean',
+            '--format', 'dataset', '--batch-size', '1', '--windowing-method', 'number', '--windowing-param', '2']
+    monkeypatch.setattr(sys, 'argv', argv)
+    main()
+    table = read_results(output / 'results')
+    assert list(zip(table['id'], table['window'])) == [('p1', 0), ('p1', 1), ('p2', 0), ('p2', 1)]
+
+    monkeypatch.setattr(sys, 'argv', argv + ['--resume'])
+    main()
+    assert len(read_results(output / 'results')) == 4
+
+
+def test_extract_ranges_sweep(tmp_path, monkeypatch):
+    write_signals(tmp_path / 'signals.csv')
+    output = tmp_path / 'out'
+    argv = ['glucostats', 'extract', str(tmp_path / 'signals.csv'), '-o', str(output), '--stats', 't_ir', 'mean']
+    monkeypatch.setattr(sys, 'argv', argv + ['--in-range-interval', '70', '180', '--in-range-interval', '100', '150'])
+    main()
+    stats = pd.read_csv(output / 'stats-00000.csv', index_col=0)
+    assert set(stats.columns) == {'t_ir_70-180', 't_ir_100-150', 'mean'}
+
+    monkeypatch.setattr(sys, 'argv', argv + ['-o', str(tmp_path / 'single'), '--in-range-interval', '100', '150'])
+    main()
+    assert set(pd.read_csv(tmp_path / 'single' / 'stats-00000.csv', index_col=0).columns) == {'t_ir', 'mean'}
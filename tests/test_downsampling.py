@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glucostats.utils.downsampling import minmax_downsampling, lttb_downsampling
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(0)
+    x = pd.date_range('2023-01-01', periods=90 * 288, freq='5min').to_numpy().view('int64')
+    y = 140 + 40 * np.sin(np.arange(len(x)) / 50) + rng.normal(0, 5, len(x))
+    # Short hypoglycemia and hyperglycemia excursions
+    y[1000:1003] = [52, 45, 50]
+    y[20000] = 320
+    return x, y
+
+
+def test_minmax_downsampling(signal):
+    x, y = signal
+    indices = minmax_downsampling(x, y, 1000)
+    assert len(indices) <= 2002 and np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert y[indices].min() == y.min() == 45 and y[indices].max() == y.max() == 320
+    np.testing.assert_array_equal(minmax_downsampling(x[:100], y[:100], 1000), np.arange(100))
+
+
+def test_lttb_downsampling(signal):
+    x, y = signal
+    indices = lttb_downsampling(x, y, 2000)
+    assert len(indices) == 2000 and np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert 1001 in indices and 20000 in indices
+    np.testing.assert_array_equal(lttb_downsampling(x[:100], y[:100], 2000), np.arange(100))
+
+
+@pytest.mark.parametrize('downsampling', [None, 'minmax', 'lttb'])
+def test_draw_glucose_time_series_downsampling(signal, downsampling):
+    pytest.importorskip('matplotlib')
+    from matplotlib.figure import Figure
+    from glucostats.visualization.signal_visualization import draw_glucose_time_series
+
+    x, y = signal
+    df_signals = pd.DataFrame({'time': pd.to_datetime(np.concatenate([x, x])), 'glucose': np.concatenate([y, y + 10])},
+                              index=['a'] * len(x) + [2] * len(x))
+    fig = Figure()
+    draw_glucose_time_series(fig, df_signals, ['a', 2], downsampling=downsampling, max_points=1000)
+    lines = fig.axes[0].get_lines()
+    assert len(lines) == 2
+    for line, offset in zip(lines, [0, 10]):
+        assert len(line.get_ydata()) == (len(x) if downsampling is None else pytest.approx(1000, abs=2))
+        assert line.get_ydata().min() == 45 + offset or downsampling == 'lttb'
+    with pytest.raises(ValueError):
+        draw_glucose_time_series(Figure(), df_signals, ['a', 'c'])
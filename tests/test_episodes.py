@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import glucostats
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.stats.episodes_stats import episodes_table, glycemic_episodes
+
+
+@pytest.fixture
+def df_signals():
+    # Signal 'a': a hypoglycemic episode of 20 minutes with a 10 minutes recovery in the middle (merged into a single
+    # episode of 30 minutes), a short hypoglycemia of 10 minutes and a hyperglycemic episode that ends the signal
+    glucose_a = [100, 65, 60, 100, 100, 62, 55, 100, 100, 100, 100, 65, 100, 100, 100, 200, 220, 210, 190]
+    # Signal 'b': hypoglycemia lasting 15 minutes after the first sample, right after the end of signal 'a'
+    glucose_b = [60, 60, 60, 60, 100]
+    timestamps = pd.date_range('2023-01-01', periods=len(glucose_a), freq='5min')
+    return pd.DataFrame({'time': list(timestamps) + list(timestamps[:len(glucose_b)]),
+                         'glucose': np.array(glucose_a + glucose_b, dtype=float)},
+                        index=pd.Index(['a'] * len(glucose_a) + ['b'] * len(glucose_b), name='id'))
+
+
+def test_episodes_table(df_signals):
+    table = episodes_table(df_signals)
+    assert list(table.index) == ['a', 'a', 'b']
+    assert list(table['type']) == ['hypo', 'hyper', 'hypo']
+    assert list(table['start_row']) == [1, 15, 19]
+    assert list(table['end_row']) == [6, 18, 22]
+    assert list(table['duration']) == [30., 20., 15.]
+    assert list(table['extreme']) == [55., 220., 60.]
+    assert table['start'].iloc[0] == pd.Timestamp('2023-01-01 00:05')
+
+    # Without merging, the two parts of the first episode are too short
+    table = episodes_table(df_signals, end_duration=5)
+    assert list(table['type']) == ['hyper', 'hypo']
+    # Rows do not need to be sorted, start_row and end_row are positions in the rows given
+    shuffled = df_signals.sample(frac=1, random_state=0)
+    table = episodes_table(shuffled)
+    assert table.drop(columns=['start_row', 'end_row']).equals(
+        episodes_table(df_signals).drop(columns=['start_row', 'end_row']))
+    assert (shuffled['time'].iloc[table['end_row']].to_numpy() == table['end'].to_numpy()).all()
+
+    with pytest.raises(ValueError):
+        episodes_table(df_signals, min_duration=-1)
+
+
+def test_episodes_statistics(df_signals):
+    stats = glycemic_episodes(df_signals, time_units='h')
+    assert list(stats.columns) == ['n_hypo_ep', 't_hypo_ep', 'nadir_hypo_ep', 'n_hyper_ep', 't_hyper_ep',
+                                   'peak_hyper_ep']
+    assert stats.loc['a'].tolist() == [1., 0.5, 55., 1., pytest.approx(1 / 3), 220.]
+    assert stats.loc['b', 'n_hyper_ep'] == 0 and np.isnan(stats.loc['b', 'peak_hyper_ep'])
+
+    extraction = ExtractGlucoStats(['episodes']).configuration(episode_end_duration=5)
+    expected = glycemic_episodes(df_signals, end_duration=5)
+    assert extraction.transform(df_signals)[expected.columns].equals(expected)
+    signal = df_signals.loc['a']
+    computed = glucostats.compute(signal['time'].to_numpy(), signal['glucose'].to_numpy(), ['episodes'],
+                                  episode_end_duration=5)
+    assert computed == pytest.approx(expected.loc['a'].to_dict(), nan_ok=True)
@@ -0,0 +1,255 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.utils.caching import ResultsCache
+from glucostats.utils.compacting import compact_signals
+
+
+@pytest.fixture
+def signals():
+    timestamps = [datetime(2023, 1, 1) + timedelta(minutes=5 * i) for i in range(48)]
+    return pd.DataFrame({
+        'time': timestamps * 3,
+        'glucose': [60. + 3 * i for i in range(48)] + [250. - 2 * i for i in range(48)] + [120.] * 48
+    }, index=['a'] * 48 + ['b'] * 48 + ['c'] * 48)
+
+
+def test_checkpoint_skips_completed_batches(signals, tmp_path, monkeypatch):
+    extraction = ExtractGlucoStats(['mean', 'time_in_ranges'], True, 'number', 2, batch_size=1,
+                                   checkpoint_dir=str(tmp_path))
+    expected = extraction.transform(signals)
+    assert len(list(tmp_path.glob('*.pkl'))) == 3
+
+    def fail(batch, id_labels=None):
+        raise AssertionError('completed batches must not be recomputed')
+
+    monkeypatch.setattr(extraction, 'statistics_computation', fail)
+    pd.testing.assert_frame_equal(extraction.transform(signals), expected)
+
+    # Checkpoints do not depend on the rest of signals of the extraction
+    pd.testing.assert_frame_equal(extraction.transform(signals.loc[['c', 'b']]), expected.loc[['c', 'b']],
+                                  check_dtype=False)
+
+    monkeypatch.undo()
+    extraction.configuration(in_range_interval=[80, 200])
+    extraction.transform(signals)
+    assert len(list(tmp_path.glob('*.pkl'))) == 6
+
+
+def test_errors_collect_isolates_bad_signals(signals):
+    bad_signals = pd.concat([
+        signals,
+        pd.DataFrame({'time': [datetime(2023, 1, 1)], 'glucose': [100.]}, index=['one_sample']),
+        pd.DataFrame({'time': [datetime(2023, 1, 1), datetime(2023, 1, 1, 0, 5)], 'glucose': [100., -5.]},
+                     index=['negative'] * 2)
+    ])
+    with pytest.raises(ValueError):
+        ExtractGlucoStats(['mean']).transform(bad_signals)
+
+    extraction = ExtractGlucoStats(['mean', 'lbgi'], batch_size=2, errors='collect')
+    stats = extraction.transform(bad_signals)
+    expected = ExtractGlucoStats(['mean', 'lbgi'], batch_size=2).transform(signals)
+    pd.testing.assert_frame_equal(stats, expected)
+    assert list(extraction.errors_report.index) == ['one_sample', 'negative']
+    assert (extraction.errors_report['stage'] == 'verification').all()
+
+
+def test_errors_collect_isolates_failing_computation(signals, monkeypatch):
+    extraction = ExtractGlucoStats(['mean'], batch_size=3, errors='collect')
+    statistics_computation = extraction.statistics_computation
+
+    def fail_on_b(batch, id_labels=None):
+        if extraction.id_labels.get_loc('b') in batch.index:
+            raise RuntimeError('kernel failure')
+        return statistics_computation(batch, id_labels)
+
+    monkeypatch.setattr(extraction, 'statistics_computation', fail_on_b)
+    stats = extraction.transform(signals)
+    assert list(stats.index) == ['a', 'c']
+    assert extraction.errors_report.loc['b', 'stage'] == 'computation'
+    assert 'kernel failure' in extraction.errors_report.loc['b', 'error']
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_cache_reuses_signals(signals, tmp_path, monkeypatch, windowing):
+    extraction = ExtractGlucoStats(['distribution', 'lbgi'], windowing, batch_size=2, cache_dir=str(tmp_path))
+    expected = extraction.transform(signals)
+    expected_time_ranges = extraction.signals_time_ranges
+
+    statistics_computation = extraction.statistics_computation
+    computed_ids = []
+
+    def record(batch, id_labels=None):
+        computed_ids.extend(extraction.id_labels[batch.index.unique()])
+        return statistics_computation(batch, id_labels)
+
+    monkeypatch.setattr(extraction, 'statistics_computation', record)
+    renamed = signals.rename(index={'c': 'd'})
+    new_signal = signals.loc[['a']].rename(index={'a': 'e'}).assign(glucose=lambda df: df['glucose'] + 1)
+    stats = extraction.transform(pd.concat([renamed, new_signal]))
+    assert computed_ids == ['e']
+    pd.testing.assert_frame_equal(stats.loc[['a', 'b']], expected.loc[['a', 'b']])
+    pd.testing.assert_series_equal(stats.loc['d'], expected.loc['c'], check_names=False)
+    if windowing:
+        assert list(extraction.signals_time_ranges.index[:2]) == list(expected_time_ranges.index[:2])
+
+    extraction.configuration(ddof=0)
+    extraction.transform(signals)
+    assert computed_ids[1:] == ['a', 'b', 'c']
+
+
+def test_cache_eviction(signals, tmp_path, monkeypatch):
+    extraction = ExtractGlucoStats(['mean'], batch_size=1, cache_dir=str(tmp_path), cache_max_size=1)
+    extraction.transform(signals)
+    assert len(list(tmp_path.glob('*/*.pkl'))) == 0
+
+    # The entries of the cache are listed once, and again only when the cache exceeds its maximum size
+    cache = ResultsCache(tmp_path / 'bounded', max_size=10 ** 6)
+    listings = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, '_entries', lambda: listings.append(1) or entries())
+    for i in range(5):
+        cache.put(f'{i:032x}', 'entry')
+        cache.evict()
+    assert len(listings) == 1 and len(list((tmp_path / 'bounded').glob('*/*.pkl'))) == 5
+
+    for max_size in [-1, 0]:
+        with pytest.raises(ValueError):
+            ExtractGlucoStats(['mean'], cache_max_size=max_size)
+        with pytest.raises(ValueError):
+            ResultsCache(tmp_path, max_size)
+    for max_size in [1.5, '1']:
+        with pytest.raises(TypeError):
+            ExtractGlucoStats(['mean'], cache_max_size=max_size)
+        with pytest.raises(TypeError):
+            ResultsCache(tmp_path, max_size)
+
+
+@pytest.mark.parametrize('n_workers', [0, 2])
+def test_atransform(signals, n_workers):
+    extraction = ExtractGlucoStats(['mean', 'time_in_ranges'], batch_size=1, n_workers=n_workers)
+    expected = extraction.transform(signals)
+
+    async def extract():
+        batches = [stats async for stats, _ in extraction.atransform_batches(signals, max_concurrency=2)]
+        return batches, await extraction.atransform(signals)
+
+    batches, stats = asyncio.run(extract())
+    assert len(batches) == 3
+    pd.testing.assert_frame_equal(stats, expected)
+    pd.testing.assert_frame_equal(pd.concat(batches), expected)
+
+
+def test_atransform_cancellation(signals):
+    extraction = ExtractGlucoStats(['mean'], batch_size=1)
+    batch_computation = extraction.batch_computation
+    computed = []
+
+    def slow_batch_computation(batch):
+        time.sleep(0.2)
+        computed.append(batch.index[0])
+        return batch_computation(batch)
+
+    extraction.batch_computation = slow_batch_computation
+
+    async def extract():
+        task = asyncio.create_task(extraction.atransform(signals, max_concurrency=1))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(extract())
+    time.sleep(0.3)
+    assert len(computed) == 1
+
+
+def test_ids_are_encoded_in_kernels(signals, monkeypatch):
+    extraction = ExtractGlucoStats(['mean'], True, 'number', 2, batch_size=2)
+    expected = extraction.transform(signals)
+    expected_time_ranges = extraction.signals_time_ranges
+    statistics_computation = extraction.statistics_computation
+    index_dtypes = []
+
+    def record(batch, id_labels=None):
+        index_dtypes.append(batch.index.dtype)
+        return statistics_computation(batch, id_labels)
+
+    monkeypatch.setattr(extraction, 'statistics_computation', record)
+    stats = extraction.transform(signals.rename(index={'a': 10, 'b': 20, 'c': 30}))
+    assert index_dtypes == ['int32', 'int32']
+    assert list(stats.index) == ['10', '20', '30']
+    assert list(extraction.signals_time_ranges.index) == \
+        [window_id.replace('a', '10').replace('b', '20').replace('c', '30') for window_id in expected_time_ranges.index]
+    np.testing.assert_array_equal(stats.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_compact_signals(signals, monkeypatch, windowing):
+    # Batches with a single signal are avoided, some kernels do not support them
+    signals = pd.concat([signals, signals.rename(index={'a': 'd'}).loc['d']])
+    list_statistics = ['time_stats', 'descriptive_stats', 'risks_stats', 'control_stats']
+    expected = ExtractGlucoStats(list_statistics, windowing, 'number', 2).transform(signals)
+
+    extraction = ExtractGlucoStats(list_statistics, windowing, 'number', 2, batch_size=2, compact=True)
+    statistics_computation = extraction.statistics_computation
+    glucose_dtypes = []
+
+    def record(batch, id_labels=None):
+        glucose_dtypes.append(batch['glucose'].dtype)
+        return statistics_computation(batch, id_labels)
+
+    monkeypatch.setattr(extraction, 'statistics_computation', record)
+    pd.testing.assert_frame_equal(extraction.transform(signals), expected)
+    assert glucose_dtypes == ['int16', 'int16']
+
+    glucose_dtypes.clear()
+    pd.testing.assert_frame_equal(extraction.transform(signals.assign(glucose=signals['glucose'] / 18)),
+                                  ExtractGlucoStats(list_statistics, windowing, 'number', 2)
+                                  .transform(signals.assign(glucose=signals['glucose'] / 18)), rtol=1e-5)
+    assert glucose_dtypes == ['float32', 'float32']
+
+
+def test_compact_signals_keys(signals, tmp_path, monkeypatch):
+    # Signals with wrong format are discarded while compacting
+    bad_signals = pd.concat([signals, pd.DataFrame({'time': [datetime(2023, 1, 1)] * 2, 'glucose': [100., -5.]},
+                                                   index=['negative'] * 2)])
+    compact = compact_signals(bad_signals, ~bad_signals.index.isin(['negative']))
+    assert compact['glucose'].dtype == 'int16' and compact.index.equals(signals.index)
+
+    # Compact and float64 batches share the cache and the checkpoints
+    ExtractGlucoStats(['mean'], batch_size=1, checkpoint_dir=str(tmp_path / 'checkpoints'), errors='collect',
+                      cache_dir=str(tmp_path / 'cache')).transform(signals)
+    extraction = ExtractGlucoStats(['mean'], batch_size=1, compact=True, cache_dir=str(tmp_path / 'cache'))
+    monkeypatch.setattr(extraction, 'statistics_computation', lambda batch: pytest.fail('signals must be cached'))
+    extraction.transform(signals)
+    extraction = ExtractGlucoStats(['mean'], batch_size=1, checkpoint_dir=str(tmp_path / 'checkpoints'),
+                                   compact=True, errors='collect')
+    monkeypatch.setattr(extraction, 'statistics_computation', lambda batch: pytest.fail('batches must be completed'))
+    extraction.transform(bad_signals)
+    assert len(list((tmp_path / 'checkpoints').glob('*.pkl'))) == 3
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_verification_errors_show_ids(signals, windowing):
+    # A sample of 'c' alone in its window, or a signal 'd' with a single sample
+    sample = pd.DataFrame({'time': [datetime(2023, 1, 1, 5)], 'glucose': [100.]}, index=['c' if windowing else 'd'])
+    extraction = ExtractGlucoStats(['mean'], windowing, 'static', [0, 1, 0, 0], batch_size=2)
+    with pytest.raises(ValueError, match=r"\['c\|4'\] signals" if windowing else r"\['d'\] signals"):
+        extraction.transform(pd.concat([signals, sample]))
+
+
+@pytest.mark.parametrize('checkpoint', [False, True])
+def test_windows_keep_signals_order(signals, tmp_path, checkpoint):
+    signals = signals.rename(index={'a': 0, 'b': 7, 'c': 14})
+    extraction = ExtractGlucoStats(['mean'], True, 'number', 2, batch_size=3,
+                                   checkpoint_dir=tmp_path if checkpoint else None)
+    for _ in range(2 if checkpoint else 1):
+        stats = extraction.transform(signals)
+    assert list(extraction.signals_time_ranges.index) == ['0|0', '0|1', '7|0', '7|1', '14|0', '14|1']
+    assert list(stats.index) == ['0', '14', '7']
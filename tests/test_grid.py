@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import glucostats
+import glucostats.utils.constants as constants
+from glucostats.grid import GlucoseGrid
+from glucostats.extract_statistics import ExtractGlucoStats
+
+grid_stats = ['time_stats', 'observations_stats', 'mean_in_ranges', 'distribution', 'auc', 'risks_stats',
+              'control_stats', 'variability']
+
+
+@pytest.fixture
+def df_signals():
+    timestamps = pd.date_range('2023-01-01 08:01', periods=288, freq='5min')
+    rng = np.random.default_rng(0)
+    glucose = np.clip(140 + np.cumsum(rng.normal(0, 8, (3, 288)), axis=1), 40, 400).round()
+    return pd.DataFrame({'time': list(timestamps) * 3, 'glucose': glucose.ravel()},
+                        index=pd.Index(['a'] * 288 + ['b'] * 288 + ['c'] * 288, name='id'))
+
+
+def test_grid_from_signals(df_signals):
+    grid = GlucoseGrid.from_signals(df_signals, '5min')
+    assert grid.values.shape == (3, 288)
+    assert grid.mask.all()
+    assert list(grid.ids) == ['a', 'b', 'c']
+    # Slots are aligned with the clock and samples are snapped to the nearest one
+    assert grid.starts[0] == np.datetime64('2023-01-01T08:00')
+    assert grid.values[1].tolist() == df_signals.loc['b', 'glucose'].tolist()
+
+    df_gaps = df_signals.loc[['a']].iloc[np.r_[0:10, 14:288]]
+    grid = GlucoseGrid.from_signals(df_gaps, '5min')
+    assert np.isnan(grid.values[0, 10:14]).all() and grid.mask.sum() == len(df_gaps)
+    grid = GlucoseGrid.from_signals(df_gaps, '5min', method='interpolate', max_gap='30min')
+    # The first slot is before the first sample
+    assert not grid.mask[0, 0] and grid.mask[0, 1:].all()
+    assert grid.values[0, 12] == pytest.approx(np.interp(12 * 5, [9 * 5 + 1, 14 * 5 + 1], grid.values[0, [9, 14]]), 1)
+    grid = GlucoseGrid.from_signals(df_gaps, '5min', method='interpolate')
+    assert np.isnan(grid.values[0, 11:14]).all()
+
+    with pytest.raises(ValueError):
+        GlucoseGrid.from_signals(df_signals, '5min', method='nearest')
+
+
+def test_grid_statistics(df_signals):
+    grid = GlucoseGrid.from_signals(df_signals, '5min')
+    statistics = grid.statistics(grid_stats, in_range_interval=[80, 160], quartiles=[0.1, 0.5])
+    for signal_id in ['a', 'c']:
+        expected = glucostats.compute(df_signals.loc[signal_id, 'time'].to_numpy(),
+                                      df_signals.loc[signal_id, 'glucose'].to_numpy(), grid_stats,
+                                      in_range_interval=[80, 160], quartiles=[0.1, 0.5])
+        assert list(statistics.columns) == list(expected)
+        assert statistics.loc[signal_id].to_numpy() == pytest.approx(np.array(list(expected.values())),
+                                                                   nan_ok=True)
+
+    extraction = ExtractGlucoStats(['t_ir', 'auc', 'gri', 'cv'])
+    statistics = grid.statistics(['t_ir', 'auc', 'gri', 'cv'], chunk_size=2)
+    expected = extraction.transform(df_signals)[statistics.columns]
+    assert statistics.to_numpy() == pytest.approx(expected.to_numpy())
+
+    with pytest.raises(ValueError):
+        grid.statistics(['mean', 'mage'])
+    # Groups leave out the subgroups that are not supported
+    statistics = grid.statistics()
+    assert 'mean' in statistics.columns and 'mage' not in statistics.columns
+    assert grid.statistics(['variability_stats']).columns.equals(
+        grid.statistics([subgroup for subgroup in constants.available_statistics['variability_stats']
+                         if subgroup != 'excursions']).columns)
+
+
+def test_grid_gaps_and_saving(df_signals, tmp_path):
+    grid = GlucoseGrid.from_signals(df_signals.iloc[np.r_[0:100, 110:300]], '5min')
+    statistics = grid.statistics(['t_ir', 'n_ir', 'dt'])
+    # The empty slots are not counted as time in any range
+    assert statistics.loc['a', 't_ir'] == (statistics.loc['a', 'n_ir'] - 1) * 5
+    # Differences are not taken across the gap
+    glucose = df_signals.loc['a', 'glucose'].to_numpy()
+    assert statistics.loc['a', 'dt'] == pytest.approx(np.abs(np.diff(glucose[:100])).sum()
+                                                      + np.abs(np.diff(glucose[110:])).sum())
+
+    grid.save(tmp_path / 'grid.npz')
+    loaded = GlucoseGrid.load(tmp_path / 'grid.npz')
+    assert np.array_equal(loaded.values, grid.values, equal_nan=True)
+    assert list(loaded.ids) == list(grid.ids) and loaded.freq == grid.freq
+    df_grid = loaded.to_frame()
+    assert len(df_grid) == grid.mask.sum()
+    assert df_grid.loc['a', 'time'].iloc[0] == pd.Timestamp('2023-01-01 08:00')
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from datetime import date
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.utils.split_in_days import split_signals_by_day
+from glucostats.visualization.heatmaps import prepare_intrapatient, prepare_interpatient
+
+
+@pytest.fixture
+def extraction():
+    timestamps = pd.date_range('2023-01-01 12:00', periods=288 * 2, freq='5min')
+    signals = pd.DataFrame({
+        'time': list(timestamps) * 2,
+        'glucose': [60. + i % 200 for i in range(576)] + [250. - i % 150 for i in range(576)]
+    }, index=['a'] * 576 + ['b'] * 576)
+    extraction = ExtractGlucoStats(['mean', 't_ir'], True, 'number', 2)
+    extraction.transform(split_signals_by_day(signals))
+    return extraction
+
+
+def test_prepare_intrapatient(extraction):
+    days_labels, heatmap = prepare_intrapatient(extraction.statistics, extraction.signals_time_ranges, 'b', 'mean',
+                                                [date(2022, 12, 31), date(2023, 1, 2)])
+    assert days_labels == [date(2022, 12, 31), date(2023, 1, 1), date(2023, 1, 2)]
+    assert list(heatmap.columns) == ['row', 'start', 'end', 'value']
+    assert list(heatmap['row']) == [1, 1, 2, 2]
+    ranges = extraction.signals_time_ranges.loc['b_2023-01-02|1']
+    row = heatmap.iloc[3]
+    assert row['start'] == ranges['start'] - pd.Timestamp('2023-01-02')
+    assert row['end'] == ranges['end'] - pd.Timestamp('2023-01-02')
+    assert row['value'] == extraction.statistics.loc['b_2023-01-02', 'mean|1']
+
+    with pytest.raises(ValueError):
+        prepare_intrapatient(extraction.statistics, extraction.signals_time_ranges, 'c', 'mean',
+                             [date(2023, 1, 1), date(2023, 1, 2)])
+    with pytest.raises(ValueError):
+        prepare_intrapatient(extraction.statistics, extraction.signals_time_ranges, 'a', 'mean',
+                             [date(2023, 2, 1), date(2023, 2, 2)])
+
+
+def test_prepare_interpatient(extraction):
+    patients_labels, heatmap = prepare_interpatient(extraction.statistics, extraction.signals_time_ranges,
+                                                    ['b', 'a'], 't_ir', [date(2023, 1, 2), date(2023, 1, 3)])
+    assert patients_labels == ['b', 'a']
+    assert list(heatmap['row']) == [0] * 4 + [1] * 4
+    assert (heatmap['end'] >= pd.Timestamp('2023-01-02')).all()
+    expected = [extraction.statistics.loc[f'a_2023-01-0{day}', f't_ir|{window}']
+                for day in [2, 3] for window in [0, 1]]
+    assert heatmap['value'].tolist()[4:] == expected
+
+    with pytest.raises(ValueError):
+        prepare_interpatient(extraction.statistics, extraction.signals_time_ranges, ['a', 'c'], 't_ir',
+                             [date(2023, 1, 2), date(2023, 1, 3)])
+    with pytest.raises(ValueError):
+        prepare_interpatient(extraction.statistics, extraction.signals_time_ranges, ['a'], 'gri',
+                             [date(2023, 1, 2), date(2023, 1, 3)])
+
+
+def test_plot_heatmaps_saving(extraction, tmp_path, monkeypatch):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from glucostats.visualization.heatmaps import plot_intrapatient_heatmap, plot_interpatient_heatmap
+
+    def show():
+        raise AssertionError('show must not be called when saving.')
+    monkeypatch.setattr(plt, 'show', show)
+    days = [date(2023, 1, 1), date(2023, 1, 3)]
+    plot_intrapatient_heatmap(extraction.statistics, extraction.signals_time_ranges, 'a', 'mean', days,
+                              tmp_path / 'intrapatient.pdf', colormap='coolwarm')
+    plot_interpatient_heatmap(extraction.statistics, extraction.signals_time_ranges, ['a', 'b'], 't_ir', days,
+                              tmp_path / 'interpatient.pdf')
+    assert (tmp_path / 'intrapatient.pdf').stat().st_size > 0 and (tmp_path / 'interpatient.pdf').stat().st_size > 0
+    assert plt.get_fignums() == []
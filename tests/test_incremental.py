@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+
+import glucostats.utils.constants as constants
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.incremental import IncrementalGlucoStats
+
+
+@pytest.fixture
+def signals():
+    rng = np.random.default_rng(0)
+    dfs = []
+    for signal_id in ['p1', 'p2', 'p3']:
+        n = int(rng.integers(40, 80))
+        timestamps = datetime(2023, 1, 1) + pd.to_timedelta(np.cumsum(rng.integers(1, 15, n)), unit='m')
+        dfs.append(pd.DataFrame({'time': timestamps, 'glucose': rng.integers(40, 350, n).astype(float)},
+                                index=[signal_id] * n))
+    return pd.concat(dfs)
+
+
+def test_partial_fit_matches_full_computation(signals, tmp_path):
+    incremental = IncrementalGlucoStats(constants.groups).configuration(threshold=100)
+    position = signals.groupby(level=0).cumcount().to_numpy()
+    for start, end in [(0, 5), (5, 6), (6, 30), (30, 100)]:
+        incremental.partial_fit(signals[(position >= start) & (position < end)])
+        incremental.save(tmp_path / 'state.json')
+        incremental = IncrementalGlucoStats.load(tmp_path / 'state.json')
+
+    result = incremental.statistics(signals)
+    expected = ExtractGlucoStats(constants.groups).configuration(threshold=100).transform(signals)
+    assert set(result.columns) == set(expected.columns)
+    for column in constants.decomposable_statistics:
+        np.testing.assert_allclose(result[column], expected.loc[result.index, column], rtol=1e-9)
+
+
+def test_non_decomposable_statistics_need_history(signals):
+    incremental = IncrementalGlucoStats(['mean', 'mage']).partial_fit(signals)
+    with pytest.raises(ValueError):
+        incremental.statistics()
+    assert list(incremental.statistics(signals).columns) == ['mean', 'mage']
+
+
+def test_partial_fit_rejects_old_samples(signals):
+    incremental = IncrementalGlucoStats(['mean']).partial_fit(signals)
+    with pytest.raises(ValueError):
+        incremental.update(signals.iloc[:1])
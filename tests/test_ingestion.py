@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from glucostats.ingestion import ingest
+from glucostats.store import SignalStore
+from glucostats.utils.split_in_days import split_signals_by_day
+
+
+@pytest.fixture
+def exports(tmp_path):
+    timestamps = pd.date_range('2023-01-01 22:00', periods=36, freq='5min')
+    pd.DataFrame({'Time': timestamps, 'Glucose': [100. + i for i in range(36)]}).to_csv(tmp_path / 'p1.csv',
+                                                                                         index=False)
+    pd.DataFrame({'Time': timestamps, 'Glucose': [(100. + i) / 18 for i in range(36)]}).to_csv(tmp_path / 'p2.csv',
+                                                                                                index=False)
+    pd.DataFrame({'Time': [timestamps[0], None], 'Glucose': [120., 130.]}).to_parquet(tmp_path / 'p3.parquet')
+    (tmp_path / 'broken.csv').write_text('foo,bar\n1,2\n')
+    return [tmp_path / 'p1.csv', tmp_path / 'broken.csv', tmp_path / 'p2.csv', tmp_path / 'p3.parquet']
+
+
+@pytest.mark.parametrize('n_workers', [0, 2])
+def test_ingest_frame(exports, n_workers):
+    df_signals, errors_report = ingest(exports, id_column=None, time_column='Time', glucose_column='Glucose',
+                                       units='auto', n_workers=n_workers)
+    assert list(errors_report.index) == [str(exports[1])]
+    assert errors_report.loc[str(exports[1]), 'stage'] == 'parsing'
+    assert list(df_signals.index.unique()) == ['p1', 'p2', 'p3']
+    assert list(df_signals.columns) == ['time', 'glucose']
+    assert df_signals.loc['p2', 'glucose'].to_numpy() == pytest.approx(df_signals.loc['p1', 'glucose'].to_numpy())
+    # Rows without timestamp are discarded
+    assert len(df_signals.loc[['p3']]) == 1
+
+
+def test_ingest_store(exports, tmp_path):
+    transform = split_signals_by_day
+    store, errors_report = ingest(exports[:3], tmp_path / 'store', None, 'Time', 'Glucose', units='auto',
+                                  transform=transform, n_workers=2)
+    assert isinstance(store, SignalStore) and len(errors_report) == 1
+    assert SignalStore(tmp_path / 'store').ids == ['p1_2023-01-01', 'p1_2023-01-02', 'p2_2023-01-01',
+                                                   'p2_2023-01-02']
+
+    # Signals already in the store are reported, the new ones are appended (p3 has a single sample, so it cannot be
+    # split in days)
+    store, errors_report = ingest(exports[2:], store, None, 'Time', 'Glucose', units='auto', transform=transform)
+    assert errors_report['stage'].to_dict() == {str(exports[2]): 'store', str(exports[3]): 'parsing'}
+    store, errors_report = ingest(exports[3:], store, None, 'Time', 'Glucose')
+    assert errors_report.empty and store.ids[-1] == 'p3' and store.n_samples == 36 * 2 + 1
+
+
+def test_ingest_store_append_errors(exports, tmp_path, monkeypatch):
+    # Any error appending a file is reported, not only wrong signals
+    append = SignalStore.append
+
+    def fail_on_p2(store, df_signals):
+        if 'p2' in df_signals.index:
+            raise OSError('No space left on device')
+        return append(store, df_signals)
+
+    monkeypatch.setattr(SignalStore, 'append', fail_on_p2)
+    store, errors_report = ingest(exports, tmp_path / 'store', None, 'Time', 'Glucose', units='auto')
+    assert store.ids == ['p1', 'p3']
+    assert errors_report.loc[str(exports[2]), 'error'] == 'OSError: No space left on device'
+
+
+def test_ingest_grid(exports, tmp_path):
+    grid, errors_report = ingest(exports, id_column=None, time_column='Time', glucose_column='Glucose', units='auto',
+                                 grid='5min')
+    assert list(grid.ids) == ['p1', 'p2', 'p3']
+    assert grid.values.shape == (3, 36)
+    assert grid.values[1] == pytest.approx(grid.values[0])
+    with pytest.raises(ValueError):
+        ingest(exports, store=tmp_path / 'store', grid='5min')
+
+
+def test_ingest_repeated_file_names(exports, tmp_path):
+    (tmp_path / 'site_b').mkdir()
+    (tmp_path / 'site_b' / 'p1.csv').write_bytes(exports[0].read_bytes())
+    with pytest.raises(ValueError, match='same name'):
+        ingest([exports[0], tmp_path / 'site_b' / 'p1.csv'], id_column=None, time_column='Time',
+               glucose_column='Glucose')
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.live import LiveGlucoStats, live_statistics
+
+
+def test_push_matches_last_window():
+    rng = np.random.default_rng(0)
+    n = 400
+    timestamps = datetime(2023, 1, 1) + pd.to_timedelta(np.cumsum(rng.integers(3, 8, n)), unit='m')
+    glucose = rng.integers(40, 350, n).astype(float)
+
+    live = LiveGlucoStats(window=timedelta(hours=24), capacity=300)
+    for patient in ['p1', 'p2']:
+        for timestamp, glucose_level in zip(timestamps, glucose):
+            live.push(patient, timestamp, glucose_level)
+
+    in_window = timestamps > timestamps[-1] - timedelta(hours=24)
+    window = pd.DataFrame({'time': timestamps[in_window], 'glucose': glucose[in_window]})
+    signals = pd.concat([window.set_axis(['p1'] * len(window)), window.set_axis(['p2'] * len(window))])
+    expected = ExtractGlucoStats(['time_in_ranges', 'percentage_time_in_ranges', 'lbgi', 'hbgi', 'bgri', 'mean',
+                                  'cv', 'gri']).transform(signals)
+
+    stats = live.to_frame()
+    assert list(stats.columns) == live_statistics
+    for stat in expected.columns:
+        np.testing.assert_allclose(stats[stat], expected[stat])
+    assert live.statistics('p1')['mean'] == pytest.approx(expected.loc['p1', 'mean'])
+
+
+def test_capacity_and_order():
+    live = LiveGlucoStats(capacity=3, time_units='s')
+    for i, glucose_level in enumerate([50, 100, 200, 100]):
+        stats = live.push(1, 60 * i, glucose_level)
+    assert stats['mean'] == pytest.approx(400 / 3)
+    assert stats['t_ar'] == 60 and stats['t_ir'] == 60 and stats['t_br'] == 0
+
+    with pytest.raises(ValueError):
+        live.push(1, 60, 100)
+    with pytest.raises(ValueError):
+        LiveGlucoStats(window=timedelta(0))
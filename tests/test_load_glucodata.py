@@ -1,4 +1,5 @@
-from glucostats.datasets import load_glucodata
+import pandas as pd
+from glucostats.datasets import load_glucodata, read_glucose_csv
 
 
 def test_load_glucodata_shape():
@@ -7,3 +8,31 @@ def test_load_glucodata_shape():
     assert df.shape[0] > 0
     assert "glucose" in df.columns or len(df.columns) > 1
 
+
+def test_read_glucose_csv_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'signals.csv'
+    pd.DataFrame({'id': ['a', 'a', 'b'], 'time': ['2023-01-01 00:00', '2023-01-01 00:05', '2023-01-01 00:00'],
+                  'glucose': [100, 110, 90]}).to_csv(path, index=False)
+    df_signals = read_glucose_csv(path, time_format='%Y-%m-%d %H:%M')
+    assert list(df_signals.index) == ['a', 'a', 'b']
+    assert df_signals['time'].dtype == 'datetime64[ns]' and df_signals['glucose'].dtype == 'float64'
+    assert (tmp_path / '.signals.csv.npz').exists()
+
+    read_csv = pd.read_csv
+
+    def fail(*args, **kwargs):
+        raise AssertionError('cached files must not be parsed')
+
+    monkeypatch.setattr(pd, 'read_csv', fail)
+    pd.testing.assert_frame_equal(read_glucose_csv(path, time_format='%Y-%m-%d %H:%M'), df_signals)
+
+    monkeypatch.setattr(pd, 'read_csv', read_csv)
+    with open(path, 'a') as f:
+        f.write('b,2023-01-01 00:05,95\n')
+    assert read_glucose_csv(path, time_format='%Y-%m-%d %H:%M')['glucose'].tolist() == [100, 110, 90, 95]
+
+    # The sidecar can be saved in another directory, e.g. when the directory of the source is read-only
+    cache_dir = tmp_path / 'cache'
+    pd.testing.assert_frame_equal(read_glucose_csv(path, time_format='%Y-%m-%d %H:%M', cache_dir=cache_dir),
+                                  read_glucose_csv(path, time_format='%Y-%m-%d %H:%M', cache=False))
+    assert len(list(cache_dir.glob('signals.csv.*.npz'))) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.stats.control_stats import g_control
+from glucostats.stats.descriptive_stats import mean_in_ranges
+from glucostats.stats.observations_stats import observations_in_ranges
+from glucostats.stats.ranges_sweep import ranges_sweep
+from glucostats.stats.time_stats import time_in_ranges
+
+intervals = [[70, 180], [63, 140], [54, 250]]
+
+
+@pytest.fixture
+def df_signals():
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range('2023-01-01', periods=100, freq='5min')
+    # Glucose levels equal to the limits are included to check that they are assigned to the same range
+    glucose = np.concatenate([rng.uniform(40, 300, 300), [70, 180, 63, 140, 54, 250]])
+    return pd.DataFrame({'time': list(timestamps) * 3 + list(timestamps[:6]), 'glucose': glucose},
+                        index=pd.Index(['a'] * 100 + ['b'] * 100 + ['c'] * 100 + ['d'] * 6, name='id'))
+
+
+def test_ranges_sweep(df_signals):
+    sweep = ranges_sweep(df_signals, intervals + [[70, 180]])
+    for interval in intervals:
+        suffix = f'_{interval[0]}-{interval[1]}'
+        for expected in [time_in_ranges(df_signals, interval), observations_in_ranges(df_signals, interval),
+                         mean_in_ranges(df_signals, interval), g_control(df_signals, interval)]:
+            computed = sweep[[f'{stat}{suffix}' for stat in expected.columns]].set_axis(expected.columns, axis=1)
+            pd.testing.assert_frame_equal(computed, expected, check_names=False, check_dtype=False)
+    assert len(sweep.columns) == 23 * len(intervals)
+
+    with pytest.raises(TypeError):
+        ranges_sweep(df_signals, [70, 180])
+    with pytest.raises(ValueError):
+        ranges_sweep(df_signals, intervals, subgroups=['g_risks'])
+
+
+def test_ranges_sweep_extraction(df_signals):
+    extraction = ExtractGlucoStats(['time_in_ranges', 'hypo_index']).configuration(in_range_interval=intervals)
+    stats = extraction.transform(df_signals)
+    assert set(stats.columns) == {f'{stat}_{interval[0]}-{interval[1]}' for interval in intervals
+                                  for stat in ['t_ir', 't_ar', 't_br', 't_or', 'hypo_index']}
+    for interval in intervals:
+        single = ExtractGlucoStats(['t_ir', 'hypo_index']).configuration(in_range_interval=interval)
+        expected = single.transform(df_signals)
+        suffix = f'_{interval[0]}-{interval[1]}'
+        assert np.allclose(stats[[f't_ir{suffix}', f'hypo_index{suffix}']].to_numpy(),
+                           expected[['t_ir', 'hypo_index']].to_numpy(), equal_nan=True)
@@ -0,0 +1,46 @@
+import re
+import pandas as pd
+import pytest
+from datetime import date
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.results import ResultsStore
+from glucostats.utils.split_in_days import split_signals_by_day
+from glucostats.visualization.reports import render_reports
+
+pytest.importorskip('matplotlib')
+
+
+@pytest.fixture
+def signals():
+    timestamps = pd.date_range('2023-01-01 12:00', periods=288 * 2, freq='5min')
+    return pd.DataFrame({
+        'time': list(timestamps) * 2,
+        'glucose': [60. + i % 200 for i in range(576)] + [250. - i % 150 for i in range(576)]
+    }, index=['a'] * 576 + ['b'] * 576)
+
+
+@pytest.mark.parametrize('n_workers', [0, 2])
+def test_render_pdf_reports(signals, tmp_path, n_workers):
+    split_signals = split_signals_by_day(signals)
+    extraction = ExtractGlucoStats(['mean', 't_ir'], True, 'number', 4)
+    extraction.transform(split_signals)
+    reports, errors_report = render_reports(extraction.statistics, extraction.signals_time_ranges, split_signals,
+                                            ['a', 'b', 'c'], ['mean', 't_ir'], [date(2023, 1, 1), date(2023, 1, 7)],
+                                            tmp_path, n_workers=n_workers)
+    assert reports == {'a': str(tmp_path / 'a.pdf'), 'b': str(tmp_path / 'b.pdf')}
+    assert list(errors_report.index) == ['c'] and errors_report.loc['c', 'stage'] == 'rendering'
+    # Two heatmaps and the time series
+    assert len(re.findall(rb'/Type /Page\b(?!s)', (tmp_path / 'a.pdf').read_bytes())) == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a.pdf', 'b.pdf']
+
+
+def test_render_png_reports_from_store(signals, tmp_path):
+    store = ResultsStore(tmp_path / 'results.db', split_signals=True)
+    ExtractGlucoStats(['mean'], True, 'number', 2, results_store=store).transform(split_signals_by_day(signals))
+    reports, errors_report = render_reports(store, None, signals, ['a', 'b'], ['mean'],
+                                            [date(2023, 1, 1), date(2023, 1, 3)], tmp_path / 'reports', 'png',
+                                            n_workers=1)
+    assert errors_report.empty
+    assert sorted(path.name for path in (tmp_path / 'reports' / 'b').iterdir()) == ['00_heatmap_mean.png',
+                                                                                    '01_time_series.png']
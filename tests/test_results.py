@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+from datetime import date
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.results import results_table, read_results, ResultsStore
+from glucostats.utils.split_in_days import split_signals_by_day
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def signals():
+    timestamps = pd.date_range('2023-01-01 12:00', periods=288 * 2, freq='5min')
+    return pd.DataFrame({
+        'time': list(timestamps) * 2,
+        'glucose': [60. + i % 200 for i in range(576)] + [250. - i % 150 for i in range(576)]
+    }, index=['a'] * 576 + ['b'] * 576)
+
+
+def test_results_table(signals):
+    extraction = ExtractGlucoStats(['mean', 't_ir'], True, 'number', 2)
+    statistics = extraction.transform(signals)
+    table = results_table(statistics, extraction.signals_time_ranges)
+    assert list(table.columns[:6]) == ['id', 'window', 'start', 'end', 'patient', 'date']
+    assert len(table) == 4
+    row = table[(table['id'] == 'b') & (table['window'] == 1)].iloc[0]
+    assert row['mean'] == statistics.loc['b', 'mean|1'] and row['t_ir'] == statistics.loc['b', 't_ir|1']
+    assert row['start'] == extraction.signals_time_ranges.loc['b|1', 'start']
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_write_and_read_results(signals, tmp_path, windowing):
+    extraction = ExtractGlucoStats(['mean', 't_ir', 'lbgi'], windowing, 'number', 2)
+    extraction.transform(split_signals_by_day(signals))
+    extraction.to_parquet(tmp_path / 'results', split_signals=True)
+    assert sorted(path.name for path in (tmp_path / 'results').iterdir()) == ['patient=a', 'patient=b']
+    expected = results_table(extraction.statistics, extraction.signals_time_ranges, split_signals=True)
+
+    table = read_results(tmp_path / 'results')
+    pd.testing.assert_frame_equal(table, expected[table.columns], check_dtype=False)
+    table = read_results(tmp_path / 'results', patients=['b'], start=date(2023, 1, 2), end='2023-01-02',
+                         stats=['mean'])
+    assert set(table['id']) == {'b_2023-01-02'} and list(table.columns)[-1] == 'mean'
+    assert 'lbgi' not in table.columns
+    with pytest.raises(ValueError):
+        read_results(tmp_path / 'results', stats=['gri'])
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_results_store(signals, tmp_path, windowing):
+    store = ResultsStore(tmp_path / 'results.db', split_signals=True)
+    extraction = ExtractGlucoStats(['mean', 't_ir', 'lbgi'], windowing, 'number', 2, batch_size=2, results_store=store)
+    extraction.transform(split_signals_by_day(signals))
+    expected = results_table(extraction.statistics, extraction.signals_time_ranges, split_signals=True)
+
+    table = store.query()
+    assert sorted(store.stats) == ['lbgi', 'mean', 't_ir']
+    pd.testing.assert_frame_equal(table, expected[table.columns].sort_values(list(table.columns[:2]))
+                                  .reset_index(drop=True), check_dtype=False)
+    table = store.query(['mean'], patients=['b'], start=date(2023, 1, 2), end='2023-01-02')
+    assert set(table['id']) == {'b_2023-01-02'} and list(table.columns)[-1] == 'mean'
+    with pytest.raises(ValueError):
+        store.query(['gri'])
+
+    df_stats, signals_time_ranges = store.frames()
+    pd.testing.assert_frame_equal(df_stats.sort_index(), extraction.statistics[df_stats.columns].sort_index(),
+                                  check_dtype=False, check_names=False)
+    pd.testing.assert_frame_equal(signals_time_ranges.sort_index(), extraction.signals_time_ranges.sort_index(),
+                                  check_names=False)
+    store.close()
+
+    with ResultsStore(tmp_path / 'results.db', split_signals=True) as store:
+        assert store.windowed == windowing and len(store.query()) == len(expected)
+        store.write(extraction.statistics, extraction.signals_time_ranges)
+        assert len(store.query()) == len(expected)
+
+
+def test_heatmaps_from_results_store(signals, tmp_path, monkeypatch):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from glucostats.visualization.heatmaps import plot_intrapatient_heatmap, plot_interpatient_heatmap
+
+    monkeypatch.setattr(plt, 'show', lambda: plt.close('all'))
+    store = ResultsStore(tmp_path / 'results.db', split_signals=True)
+    ExtractGlucoStats(['mean'], True, 'number', 2, results_store=store).transform(split_signals_by_day(signals))
+    days = [date(2023, 1, 1), date(2023, 1, 3)]
+    plot_intrapatient_heatmap(store, None, 'a', 'mean', days)
+    plot_interpatient_heatmap(store, None, ['a', 'b'], 'mean', days)
+    with pytest.raises(ValueError):
+        plot_interpatient_heatmap(store, None, ['a', 'b'], 't_ir', days)
@@ -0,0 +1,65 @@
+import io
+import json
+import urllib.request
+import numpy as np
+import pandas as pd
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.serve import StatsServer
+
+
+@pytest.fixture
+def server():
+    server = StatsServer(['mean', 'lbgi', 'time_in_ranges'], port=0, max_wait_ms=20).start()
+    yield server
+    server.close()
+
+
+def post(server, body, content_type='application/json', query=''):
+    request = urllib.request.Request(f'http://{server.host}:{server.port}/stats{query}', data=body,
+                                     headers={'Content-Type': content_type})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def signal_payload(signal_id, offset):
+    timestamps = [(datetime(2023, 1, 1) + timedelta(minutes=5 * i)).isoformat() for i in range(24)]
+    return {'id': signal_id, 'timestamps': timestamps, 'glucose': [offset + 5 * i for i in range(24)]}
+
+
+def test_json_requests_are_batched(server):
+    payloads = [{'signals': [signal_payload('p', 60 + 10 * i)]} for i in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(lambda payload: post(server, json.dumps(payload).encode()), payloads))
+
+    for i, response in enumerate(responses):
+        signal = signal_payload('p', 60 + 10 * i)
+        df = pd.DataFrame({'time': pd.to_datetime(signal['timestamps']), 'glucose': signal['glucose']},
+                          index=['p'] * 24)
+        expected = ExtractGlucoStats(['mean', 'lbgi', 'time_in_ranges']).statistics_computation(df)[0].loc['p']
+        assert response['errors'] == {}
+        for stat, value in expected.items():
+            assert response['statistics']['p'][stat] == pytest.approx(value)
+
+    metrics = json.loads(urllib.request.urlopen(f'http://{server.host}:{server.port}/metrics').read())
+    assert metrics['requests'] == 8 and metrics['signals'] == 8
+    assert metrics['batches'] < 8
+    assert metrics['latency_ms_p50'] > 0
+
+
+def test_arrow_request_and_errors(server):
+    pa = pytest.importorskip('pyarrow')
+    signal = signal_payload('p', 100)
+    table = pa.table({'id': ['p'] * 24 + ['bad'], 'time': pd.to_datetime(signal['timestamps'] + ['2023-01-01T00:00:00']),
+                      'glucose': np.array(signal['glucose'] + [100], dtype='float64')})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    response = post(server, sink.getvalue(), 'application/vnd.apache.arrow.stream', '?stats=mean')
+    assert list(response['statistics']) == ['p']
+    assert response['statistics']['p']['mean'] == pytest.approx(np.mean(signal['glucose']))
+    assert list(response['errors']) == ['bad']
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glucostats.utils.split_in_days import split_signals_by_day, split_signals_by_period
+
+
+@pytest.fixture
+def signals():
+    timestamps = pd.date_range('2023-03-25 20:00', periods=24, freq='2h')
+    return pd.DataFrame({'time': list(timestamps) * 2, 'glucose': [100.] * 48}, index=['a'] * 24 + [7] * 24)
+
+
+def test_split_signals_by_day(signals):
+    original = signals.copy()
+    split_df = split_signals_by_day(signals)
+    pd.testing.assert_frame_equal(signals, original)
+    assert isinstance(split_df.index, pd.CategoricalIndex)
+    assert list(split_df.index.categories) == ['a_2023-03-25', 'a_2023-03-26', 'a_2023-03-27',
+                                               '7_2023-03-25', '7_2023-03-26', '7_2023-03-27']
+    expected_ids = signals.index.astype(str) + '_' + signals['time'].dt.date.astype(str)
+    assert list(split_df.index) == list(expected_ids)
+    pd.testing.assert_frame_equal(split_df.reset_index(drop=True), signals.reset_index(drop=True))
+    assert np.shares_memory(split_df['glucose'].to_numpy(), signals['glucose'].to_numpy())
+
+
+def test_split_signals_by_period(signals):
+    # Madrid changes from UTC+1 to UTC+2 on 2023-03-26, so local midnight is 23:00 UTC and then 22:00 UTC
+    split_df = split_signals_by_day(signals, tz='Europe/Madrid')
+    assert split_df.loc['a_2023-03-26', 'time'].tolist() == list(pd.date_range('2023-03-26 00:00', '2023-03-26 20:00',
+                                                                               freq='2h'))
+    assert split_df.index.equals(split_signals_by_day(signals.assign(time=signals['time'].dt.tz_localize('UTC')
+                                                                      .dt.tz_convert('Europe/Madrid'))).index)
+    assert list(split_signals_by_day(signals, utc_offset=-21).index.categories[:2]) == ['a_2023-03-24', 'a_2023-03-25']
+
+    split_df = split_signals_by_period(signals, '12h', start='6h')
+    assert list(split_df.index.categories[:3]) == ['a_2023-03-25 18:00', 'a_2023-03-26 06:00', 'a_2023-03-26 18:00']
+    assert split_df.loc['a_2023-03-26 06:00', 'time'].dt.hour.tolist() == [6, 8, 10, 12, 14, 16]
+    assert list(split_signals_by_period(signals, '7D').index.categories) == ['a_2023-03-20', 'a_2023-03-27',
+                                                                             '7_2023-03-20', '7_2023-03-27']
+    with pytest.raises(ValueError):
+        split_signals_by_period(signals, '1D', utc_offset=1, tz='UTC')
+
+
+def test_split_empty_signals(signals):
+    split_df = split_signals_by_period(signals.iloc[:0], '12h', start='6h')
+    assert split_df.empty and list(split_df.columns) == ['time', 'glucose']
+    assert isinstance(split_df.index, pd.CategoricalIndex)
@@ -0,0 +1,81 @@
+import json
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+
+from glucostats.extract_statistics import ExtractGlucoStats
+from glucostats.store import SignalStore
+
+
+@pytest.fixture
+def signals():
+    timestamps = [datetime(2023, 1, 1) + timedelta(minutes=5 * i) for i in range(48)]
+    return pd.DataFrame({
+        'time': timestamps * 4,
+        'glucose': [60. + 3 * i for i in range(48)] + [250. - 2 * i for i in range(48)] + [120.] * 48 +
+                   [100. + i % 7 for i in range(48)]
+    }, index=pd.Index(['a'] * 48 + ['b'] * 48 + [3] * 48 + ['d'] * 48, name='id'))
+
+
+def test_append_and_random_access(signals, tmp_path):
+    store = SignalStore(tmp_path / 'store')
+    store.append(signals.iloc[:96])
+    # Samples are stored in chronological order within each signal
+    store.append(signals.iloc[96:].iloc[::-1])
+    with pytest.raises(ValueError):
+        store.append(signals.loc[['b']])
+
+    store = SignalStore(tmp_path / 'store')
+    assert store.ids == ['a', 'b', 'd', 3] and len(store) == 4 and store.n_samples == 192
+    times, glucose = store.signal(3)
+    assert isinstance(glucose, np.memmap) and not glucose.flags.writeable
+    pd.testing.assert_frame_equal(store['d'], signals.loc[['d']])
+    pd.testing.assert_frame_equal(store.to_frame(), signals.loc[['a', 'b', 'd', 3]])
+    pd.testing.assert_frame_equal(store.to_frame(['d', 'a']), signals.loc[['a', 'd']])
+
+
+@pytest.mark.parametrize('windowing', [False, True])
+def test_transform_from_store(signals, tmp_path, windowing):
+    store = SignalStore(tmp_path / 'store')
+    store.append(signals)
+    extraction = ExtractGlucoStats(['time_stats', 'mean', 'g_risks'], windowing, 'number', 2, batch_size=2)
+    expected = extraction.transform(signals)
+    expected_time_ranges = extraction.signals_time_ranges
+
+    batch = store.batches(2)[1]
+    assert len(pickle.dumps(batch)) < 1000
+    pd.testing.assert_frame_equal(extraction.transform(store), expected)
+    pd.testing.assert_frame_equal(extraction.signals_time_ranges, expected_time_ranges)
+    stats = pd.concat([stats for stats, _ in extraction.transform_batches(store.batches(2, ids=['b', 'd']))])
+    pd.testing.assert_frame_equal(stats, expected.loc[[index for index in expected.index
+                                                       if str(index).split('|')[0] in ['b', 'd']]],
+                                  check_like=True, check_dtype=False)
+
+
+def test_interrupted_append(signals, tmp_path):
+    store = SignalStore(tmp_path / 'store')
+    store.append(signals.loc[['a']])
+    meta = (tmp_path / 'store' / 'meta.json').read_bytes()
+    store.append(signals.loc[['b']])
+    # The process dies after writing the samples and offsets of 'b' but before committing its id
+    (tmp_path / 'store' / 'meta.json').write_bytes(meta)
+
+    store = SignalStore(tmp_path / 'store')
+    assert store.ids == ['a'] and store.n_samples == 48
+    assert (tmp_path / 'store' / 'glucose.bin').stat().st_size == 48 * 8
+    store.append(signals.loc[['d']])
+    pd.testing.assert_frame_equal(SignalStore(tmp_path / 'store')['d'], signals.loc[['d']])
+
+
+def test_append_one_at_a_time(signals, tmp_path):
+    store = SignalStore(tmp_path / 'store')
+    for signal_id in ['a', 'b', 3, 'd']:
+        store.append(signals.loc[[signal_id]])
+    # Only the fixed metadata is rewritten by each append
+    assert json.loads((tmp_path / 'store' / 'meta.json').read_text())['n_signals'] == 4
+    assert (tmp_path / 'store' / 'offsets.bin').stat().st_size == 5 * 8
+    pd.testing.assert_frame_equal(store.to_frame(), signals)
+    store = SignalStore(tmp_path / 'store')
+    assert store.ids == ['a', 'b', 3, 'd'] and list(store.offsets) == [0, 48, 96, 144, 192]